@@ -4,9 +4,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.settings import settings
 from core.database import get_session
-from jwt_functions import get_current_user
+from core.unit_of_work import UnitOfWork, get_uow
+from jwt_functions import revoke_token
 from repositories.user_repo import UserRepo
-from schemas.exception_schemas import UserAlreadyExist, UserDidntExist
+from schemas.exception_schemas import UserAlreadyExist, UserDidntExist, HashingOverloaded
 from schemas.user_schemas import UserRegister, AuthResponse, UserLogin
 from services.user_service import UserService
 
@@ -14,25 +15,28 @@ router = APIRouter()
 
 
 @router.post('/reg', tags=['User_Auth'])
-async def register(user_data: UserRegister, session: AsyncSession = Depends(get_session)):
-    user_repo = UserRepo(session)
+async def register(user_data: UserRegister, uow: UnitOfWork = Depends(get_uow)):
+    user_repo = UserRepo(uow.session)
     user_service = UserService(user_repo)
     try:
-        async with session.begin():
-            reg_user = await user_service.register(user_data)
+        reg_user = await user_service.register(user_data)
+        await uow.commit()
         return {'detail': f'Зарегистрирован новый пользователь {reg_user.id}'}
-    except UserAlreadyExist:
-        raise HTTPException(status_code=409, detail='Пользователь уже существует')
+    except UserAlreadyExist as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except IntegrityError:
         raise HTTPException(status_code=409, detail="Почта уже зарегистрирована")
+    except HashingOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 @router.post('/login', tags=['User_Auth'], response_model=AuthResponse)
-async def login(user_data: UserLogin, response: Response, session: AsyncSession = Depends(get_session)):
-    user_repo = UserRepo(session)
+async def login(user_data: UserLogin, response: Response, uow: UnitOfWork = Depends(get_uow)):
+    user_repo = UserRepo(uow.session)
     user_service = UserService(user_repo)
     try:
         access_token, refresh_token = await user_service.login(user_data)
+        await uow.commit()
         response.set_cookie(
             key='access_token',
             value=access_token,
@@ -54,6 +58,8 @@ async def login(user_data: UserLogin, response: Response, session: AsyncSession
         return AuthResponse(access_token=access_token, refresh_token=refresh_token)
     except UserDidntExist:
         raise HTTPException(status_code=401, detail='Неверный email или пароль')
+    except HashingOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 @router.post('/refresh', tags=["User_Auth"])
@@ -79,7 +85,10 @@ async def refresh(response: Response, refresh_token: str | None = Cookie(default
 
 
 @router.post('/logout', tags=["User_Auth"])
-def logout(response: Response):
+async def logout(response: Response, access_token: str | None = Cookie(default=None),
+                 refresh_token: str | None = Cookie(default=None)):
+    await revoke_token(access_token)
+    await revoke_token(refresh_token)
     response.delete_cookie('access_token')
     response.delete_cookie('refresh_token')
     return {'detail': "Вы успешно вышли из аккаунта"}
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from core.unit_of_work import UnitOfWork, get_uow
+from jwt_functions import get_current_claims
+from repositories.booking_repo import BookingRepo
+from repositories.room_repo import CachedRoomRepo
+from schemas.booking_schemas import BookingCreate, BookingResponse
+from schemas.exception_schemas import RoomNotFound, BookingConflict, BookingValidationError, BookingNotFound
+from schemas.user_schemas import TokenUser
+from services.booking_service import BookingService
+
+bookings_router = APIRouter(prefix='/bookings')
+
+
+@bookings_router.post('', tags=['Bookings'], response_model=BookingResponse, status_code=201)
+async def create_booking(booking_data: BookingCreate, user: TokenUser = Depends(get_current_claims),
+                         uow: UnitOfWork = Depends(get_uow)):
+    booking_service = BookingService(BookingRepo(uow.session), CachedRoomRepo(uow.session))
+    try:
+        booking = await booking_service.create_booking(user.id, booking_data)
+        await uow.commit()
+    except RoomNotFound:
+        await uow.rollback()
+        raise HTTPException(status_code=404, detail='Комната не найдена')
+    except BookingValidationError as e:
+        await uow.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
+    except BookingConflict:
+        await uow.rollback()
+        raise HTTPException(status_code=409, detail='Выбранные даты уже заняты')
+    return booking
+
+
+@bookings_router.post('/{booking_id}/cancel', tags=['Bookings'], response_model=BookingResponse)
+async def cancel_booking(booking_id: int, user: TokenUser = Depends(get_current_claims),
+                         uow: UnitOfWork = Depends(get_uow)):
+    booking_service = BookingService(BookingRepo(uow.session), CachedRoomRepo(uow.session))
+    try:
+        booking = await booking_service.cancel_booking(booking_id, user.id)
+        await uow.commit()
+    except BookingNotFound:
+        await uow.rollback()
+        raise HTTPException(status_code=404, detail='Бронь не найдена или не может быть отменена')
+    return booking
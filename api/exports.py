@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from jwt_functions import get_current_owner
+from schemas.export_schemas import ExportParams
+from schemas.user_schemas import TokenUser
+from services.export_service import EXPORT_QUERIES, MEDIA_TYPES, export_chunks
+
+exports_router = APIRouter(prefix='/exports')
+
+
+@exports_router.get('/{kind}', tags=['Exports'])
+async def export(kind: str, params: ExportParams = Query(), user: TokenUser = Depends(get_current_owner)):
+    if kind not in EXPORT_QUERIES:
+        raise HTTPException(status_code=404, detail='Неизвестный тип выгрузки')
+    query = EXPORT_QUERIES[kind](owner_id=user.id, date_from=params.date_from, date_to=params.date_to)
+    return StreamingResponse(
+        export_chunks(query, params.format, kind),
+        media_type=MEDIA_TYPES[params.format],
+        headers={'Content-Disposition': f'attachment; filename="{kind}.{params.format.value}"'},
+    )
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_read_session
+from core.unit_of_work import UnitOfWork, get_uow
+from jwt_functions import get_current_owner
+from repositories.calendar_repo import CalendarRepo
+from repositories.rate_repo import RateRepo
+from repositories.stats_repo import RoomStatsRepo
+from schemas.exception_schemas import RoomNotFound
+from schemas.rate_schemas import SeasonUpdate, StayDiscountsUpdate, RatePlanOut, RatesApplied
+from schemas.stats_schemas import OwnerStats, OwnerStatsParams
+from schemas.user_schemas import TokenUser
+from services.rate_service import RatePlanService
+from services.stats_service import OwnerStatsService
+
+owners_router = APIRouter(prefix='/owners')
+
+
+@owners_router.get('/me/stats', tags=['Owners'], response_model=OwnerStats)
+async def get_owner_stats(params: OwnerStatsParams = Query(), user: TokenUser = Depends(get_current_owner),
+                          session: AsyncSession = Depends(get_read_session)):
+    stats_service = OwnerStatsService(RoomStatsRepo(session))
+    return await stats_service.get_owner_stats(user.id, params.date_from, params.date_to)
+
+
+@owners_router.get('/me/rate-plans', tags=['Owners'], response_model=list[RatePlanOut])
+async def get_rate_plans(room_id: int | None = Query(default=None), user: TokenUser = Depends(get_current_owner),
+                         session: AsyncSession = Depends(get_read_session)):
+    return await RateRepo(session).get_plans(user.id, room_id)
+
+
+@owners_router.put('/me/rate-plans/{name}', tags=['Owners'], response_model=RatesApplied)
+async def put_season(season: SeasonUpdate, name: str = Path(min_length=1, max_length=100),
+                     user: TokenUser = Depends(get_current_owner), uow: UnitOfWork = Depends(get_uow)):
+    """
+    Сезон name на набор комнат владельца: правило заменяется на всех комнатах сразу,
+    цены календаря пересчитываются одним запросом
+    """
+    rate_service = RatePlanService(RateRepo(uow.session), CalendarRepo(uow.session))
+    try:
+        applied = await rate_service.replace_season(user.id, name, season)
+        await uow.commit()
+    except RoomNotFound as e:
+        await uow.rollback()
+        raise HTTPException(status_code=404, detail=str(e))
+    return applied
+
+
+@owners_router.delete('/me/rate-plans/{name}', tags=['Owners'], response_model=RatesApplied)
+async def delete_season(name: str = Path(min_length=1, max_length=100),
+                        user: TokenUser = Depends(get_current_owner), uow: UnitOfWork = Depends(get_uow)):
+    rate_service = RatePlanService(RateRepo(uow.session), CalendarRepo(uow.session))
+    try:
+        applied = await rate_service.delete_season(user.id, name)
+        await uow.commit()
+    except RoomNotFound as e:
+        await uow.rollback()
+        raise HTTPException(status_code=404, detail=str(e))
+    return applied
+
+
+@owners_router.put('/me/stay-discounts', tags=['Owners'], response_model=RatesApplied)
+async def put_stay_discounts(data: StayDiscountsUpdate, user: TokenUser = Depends(get_current_owner),
+                             uow: UnitOfWork = Depends(get_uow)):
+    rate_service = RatePlanService(RateRepo(uow.session), CalendarRepo(uow.session))
+    try:
+        applied = await rate_service.replace_discounts(user.id, data.room_ids, data.discounts)
+        await uow.commit()
+    except RoomNotFound as e:
+        await uow.rollback()
+        raise HTTPException(status_code=404, detail=str(e))
+    return applied
@@ -0,0 +1,202 @@
+import base64
+import binascii
+from itertools import islice, dropwhile
+from decimal import Decimal, InvalidOperation
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_read_session
+from core.unit_of_work import UnitOfWork, get_uow
+from jwt_functions import get_current_claims, get_current_owner
+from repositories.calendar_repo import CalendarRepo
+from repositories.room_repo import RoomRepo
+from schemas.room_schemas import (RoomSearchParams, RoomSearchPage, RoomCard, RoomDetail, NearbySearchParams,
+                                  RoomBatchCreate, RoomBatchUpdate, RoomBatchDelete, RoomBatchResponse)
+from schemas.exception_schemas import CalendarFeedError
+from schemas.user_schemas import TokenUser
+from services.availability_index import availability_index
+from services.geo_index import geo_index
+from services.ical_service import CalendarSyncService, is_not_modified
+from services.pricing import quote_stays
+from services.room_service import RoomService
+from sql_enums import RoomStatus
+
+rooms_router = APIRouter(prefix='/rooms')
+MAX_FEED_SIZE = 1024 * 1024
+NEARBY_BATCH_FACTOR = 4
+NEARBY_MAX_BATCHES = 4
+NEARBY_MAX_BATCH_SIZE = 5000
+
+
+def encode_cursor(key: Decimal, room_id: int) -> str:
+    """
+    Курсор страницы: ключ сортировки (base_price или ранг текстового поиска) и id последней карточки
+    """
+    return base64.urlsafe_b64encode(f'{key}:{room_id}'.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[Decimal, int]:
+    try:
+        key, room_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return Decimal(key), int(room_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, InvalidOperation):
+        raise ValueError('Некорректный курсор')
+
+
+@rooms_router.get('/search', tags=['Rooms'], response_model=RoomSearchPage)
+async def search_rooms(params: RoomSearchParams = Query(), session: AsyncSession = Depends(get_read_session)):
+    try:
+        after = decode_cursor(params.cursor) if params.cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    room_ids = None
+    if params.check_in and availability_index.prefilter_enabled:
+        room_ids = availability_index.free_rooms(params.check_in, params.check_out, params.city)
+        if not room_ids:
+            return RoomSearchPage(items=[])
+
+    rows = await RoomRepo(session).search_rooms(params, after, room_ids)
+    items = [RoomCard.model_validate(row) for row in rows]
+    if params.check_in and items:
+        quotes = await quote_stays(session, [(item.id, params.check_in, params.check_out) for item in items])
+        for item, quote in zip(items, quotes):
+            item.total_price = quote.total
+
+    next_cursor = None
+    if len(items) == params.limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(Decimal(repr(last.rank)) if params.q else last.base_price, last.id)
+    return RoomSearchPage(items=items, next_cursor=next_cursor)
+
+
+@rooms_router.get('/nearby', tags=['Rooms'], response_model=RoomSearchPage)
+async def search_rooms_nearby(params: NearbySearchParams = Query(),
+                              session: AsyncSession = Depends(get_read_session)):
+    """
+    Поиск комнат на карте: ближайшие к точке комнаты в радиусе radius_km, от ближней к дальней.
+    Кандидаты берутся из индекса координат пачками и дофильтровываются запросом к базе,
+    пока не наберётся limit карточек. Пачки растут в NEARBY_BATCH_FACTOR раз, запросов к базе не больше
+    NEARBY_MAX_BATCHES: при редких фильтрах страница может оказаться неполной, продолжение - по next_cursor
+    (расстояние и id последней просмотренной комнаты). Свободные даты проверяет запрос, индекс доступности
+    лишь заранее отсеивает занятые комнаты, когда ему можно верить
+    """
+    try:
+        after = decode_cursor(params.cursor) if params.cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    hits = geo_index.iter_nearest(params.latitude, params.longitude, params.radius_km)
+    if after is not None:
+        after = (float(after[0]), after[1])
+        hits = dropwhile(lambda hit: hit <= after, hits)
+    if params.check_in and availability_index.prefilter_enabled:
+        hits = (hit for hit in hits if availability_index.is_free(hit[1], params.check_in, params.check_out))
+
+    room_repo = RoomRepo(session)
+    items: list[RoomCard] = []
+    last_hit, exhausted = None, False
+    batch_size = params.limit * NEARBY_BATCH_FACTOR
+    for _ in range(NEARBY_MAX_BATCHES):
+        batch = list(islice(hits, min(batch_size, NEARBY_MAX_BATCH_SIZE)))
+        if not batch:
+            exhausted = True
+            break
+        cards = {row.id: row for row in await room_repo.get_room_cards([room_id for _, room_id in batch], params)}
+        for distance, room_id in batch:
+            last_hit = distance, room_id
+            if room_id in cards:
+                item = RoomCard.model_validate(cards[room_id])
+                item.distance_km = round(distance, 3)
+                items.append(item)
+                if len(items) == params.limit:
+                    break
+        if len(items) == params.limit:
+            break
+        batch_size *= NEARBY_BATCH_FACTOR
+
+    next_cursor = None
+    if not exhausted and last_hit is not None:
+        next_cursor = encode_cursor(Decimal(repr(last_hit[0])), last_hit[1])
+
+    if params.check_in and items:
+        quotes = await quote_stays(session, [(item.id, params.check_in, params.check_out) for item in items])
+        for item, quote in zip(items, quotes):
+            item.total_price = quote.total
+    return RoomSearchPage(items=items, next_cursor=next_cursor)
+
+
+@rooms_router.post('/batch', tags=['Rooms'], response_model=RoomBatchResponse)
+async def create_rooms(data: RoomBatchCreate, user: TokenUser = Depends(get_current_owner),
+                       uow: UnitOfWork = Depends(get_uow)):
+    """
+    Пакетное создание комнат вместе с календарями. Результат по каждому элементу в порядке запроса:
+    некорректные элементы не создаются и не мешают остальным
+    """
+    room_service = RoomService(RoomRepo(uow.session), CalendarRepo(uow.session))
+    response = await room_service.create_rooms(user.id, data.rooms)
+    await uow.commit()
+    return response
+
+
+@rooms_router.patch('/batch', tags=['Rooms'], response_model=RoomBatchResponse)
+async def update_rooms(data: RoomBatchUpdate, user: TokenUser = Depends(get_current_owner),
+                       uow: UnitOfWork = Depends(get_uow)):
+    room_service = RoomService(RoomRepo(uow.session), CalendarRepo(uow.session))
+    response = await room_service.update_rooms(user.id, data.rooms)
+    await uow.commit()
+    return response
+
+
+@rooms_router.post('/batch/delete', tags=['Rooms'], response_model=RoomBatchResponse)
+async def delete_rooms(data: RoomBatchDelete, user: TokenUser = Depends(get_current_owner),
+                       uow: UnitOfWork = Depends(get_uow)):
+    room_service = RoomService(RoomRepo(uow.session), CalendarRepo(uow.session))
+    response = await room_service.delete_rooms(user.id, data.room_ids)
+    await uow.commit()
+    return response
+
+
+@rooms_router.get('/{room_id}', tags=['Rooms'], response_model=RoomDetail)
+async def get_room(room_id: int, days: int = Query(default=30, ge=1, le=365),
+                   session: AsyncSession = Depends(get_read_session)):
+    room = await RoomRepo(session).get_room_detail(room_id, days)
+    if room is None or room.status != RoomStatus.ACTIVE:
+        raise HTTPException(status_code=404, detail='Комната не найдена')
+    return room
+
+
+@rooms_router.get('/{room_id}/calendar.ics', tags=['Rooms'])
+async def get_room_calendar_feed(room_id: int, request: Request, session: AsyncSession = Depends(get_read_session)):
+    sync_service = CalendarSyncService(CalendarRepo(session))
+    version = await sync_service.feed_version(room_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail='Календарь комнаты не найден')
+    etag, last_modified = version
+    headers = {'ETag': etag, 'Last-Modified': sync_service.http_date(last_modified), 'Cache-Control': 'no-cache'}
+    if is_not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    feed = await sync_service.render_feed(room_id, last_modified)
+    return Response(feed, media_type='text/calendar; charset=utf-8', headers=headers)
+
+
+@rooms_router.put('/{room_id}/calendar.ics', tags=['Rooms'])
+async def import_room_calendar_feed(room_id: int, request: Request, user: TokenUser = Depends(get_current_claims),
+                                    uow: UnitOfWork = Depends(get_uow)):
+    room = await RoomRepo(uow.session).get_room_by_id(room_id)
+    if room is None:
+        raise HTTPException(status_code=404, detail='Комната не найдена')
+    if room.owner_id != user.id:
+        raise HTTPException(status_code=403, detail='Календарь может изменять только владелец комнаты')
+    body = await request.body()
+    if len(body) > MAX_FEED_SIZE:
+        raise HTTPException(status_code=413, detail='Слишком большой файл календаря')
+    try:
+        blocked, unblocked = await CalendarSyncService(CalendarRepo(uow.session)).import_feed(
+            room_id, body.decode('utf-8')
+        )
+        await uow.commit()
+    except (CalendarFeedError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {'blocked': blocked, 'unblocked': unblocked}
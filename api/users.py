@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends
 from jwt_functions import get_current_user
+from schemas.user_schemas import UserProfile
 
 users_router = APIRouter(prefix='/users')
 
 
-@users_router.get('/me')
+@users_router.get('/me', response_model=UserProfile)
 async def get_users_profile(user=Depends(get_current_user)):
     return user
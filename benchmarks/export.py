@@ -0,0 +1,74 @@
+"""
+Замер потоковой выгрузки: скорость (MB/s) и пиковый RSS процесса для выгрузок разного размера.
+Размеры прогоняются по возрастанию - если выгрузка потоковая, пиковый RSS почти не растёт
+от 100 тыс. до миллиона строк. Для миллиона строк календаря достаточно засеять ~2000 комнат.
+
+    python -m benchmarks.export --rows 100000 1000000 --output bench-export.json
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import resource
+import time
+
+from benchmarks.run import git_commit
+from core.database import engine
+from schemas.export_schemas import ExportFormat
+from services.export_service import EXPORT_QUERIES, export_chunks
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def measure_export(kind: str, export_format: ExportFormat, rows: int) -> dict:
+    query = EXPORT_QUERIES[kind]().limit(rows)
+    rss_before = peak_rss_mb()
+    size = lines = 0
+    started = time.perf_counter()
+    async for chunk in export_chunks(query, export_format, kind):
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    elapsed = time.perf_counter() - started
+    exported = lines - (export_format == ExportFormat.CSV)
+    return {
+        'kind': kind,
+        'format': export_format.value,
+        'rows': exported,
+        'mb': round(size / 2 ** 20, 2),
+        'elapsed_s': round(elapsed, 3),
+        'mb_per_s': round(size / 2 ** 20 / elapsed, 2) if elapsed else 0.0,
+        'rows_per_s': round(exported / elapsed) if elapsed else 0,
+        'peak_rss_before_mb': round(rss_before, 1),
+        'peak_rss_after_mb': round(peak_rss_mb(), 1),
+    }
+
+
+async def main(args) -> None:
+    results = []
+    for export_format in map(ExportFormat, args.formats):
+        for rows in sorted(args.rows):
+            result = await measure_export(args.kind, export_format, rows)
+            results.append(result)
+            print(f"{result['format']:<7}{result['rows']:>10} строк  {result['mb']:>8} MB  "
+                  f"{result['mb_per_s']:>7} MB/s  peak RSS {result['peak_rss_after_mb']} MB")
+    await engine.dispose()
+
+    report = {
+        'commit': git_commit(),
+        'created_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Замер потоковой выгрузки')
+    parser.add_argument('--kind', choices=tuple(EXPORT_QUERIES), default='calendar')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--formats', nargs='+', choices=[item.value for item in ExportFormat],
+                        default=[item.value for item in ExportFormat])
+    parser.add_argument('--output', default='bench-export.json')
+    asyncio.run(main(parser.parse_args()))
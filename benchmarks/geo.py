@@ -0,0 +1,79 @@
+"""
+Замер индекса координат без базы: комнаты раскладываются вокруг городов из benchmarks.seed,
+затем замеряются запросы карты - все комнаты в радиусе и ближайшие N.
+
+    python -m benchmarks.geo --rooms 100000 --output bench-geo.json
+"""
+import argparse
+import datetime as dt
+import json
+import random
+import time
+
+from benchmarks.run import git_commit, percentile
+from benchmarks.seed import CITY_COORDINATES, CITY_SPREAD_DEG
+from services.geo_index import GeoIndex
+
+
+def random_point(rng: random.Random) -> tuple[float, float]:
+    lat, lon = rng.choice(list(CITY_COORDINATES.values()))
+    return lat + (rng.random() - 0.5) * CITY_SPREAD_DEG, lon + (rng.random() - 0.5) * CITY_SPREAD_DEG
+
+
+def measure(name: str, query, points: list[tuple[float, float]]) -> dict:
+    timings, found = [], 0
+    for lat, lon in points:
+        started = time.perf_counter()
+        found += len(query(lat, lon))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'query': name,
+        'queries': len(points),
+        'avg_found': round(found / len(points), 1),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+    }
+
+
+def main(args) -> None:
+    rng = random.Random(args.seed)
+    index = GeoIndex(args.cell_deg)
+    started = time.perf_counter()
+    for room_id in range(1, args.rooms + 1):
+        index.add_room(room_id, *random_point(rng))
+    build_s = time.perf_counter() - started
+    print(f'Индекс на {len(index)} комнат построен за {build_s:.2f} с')
+
+    points = [random_point(rng) for _ in range(args.queries)]
+    results = [
+        measure(f'within_{args.radius_km}km', lambda lat, lon: index.within(lat, lon, args.radius_km), points),
+        measure(f'nearest_{args.nearest}', lambda lat, lon: index.nearest(lat, lon, args.nearest, 100), points),
+    ]
+    for result in results:
+        print(f"{result['query']:<14} найдено в среднем {result['avg_found']:>8}  "
+              f"p50 {result['p50_ms']:>7} мс  p95 {result['p95_ms']:>7} мс  p99 {result['p99_ms']:>7} мс")
+
+    report = {
+        'commit': git_commit(),
+        'created_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'rooms': args.rooms,
+        'cell_deg': args.cell_deg,
+        'build_s': round(build_s, 3),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Замер индекса координат комнат')
+    parser.add_argument('--rooms', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--radius-km', type=float, default=3)
+    parser.add_argument('--nearest', type=int, default=50)
+    parser.add_argument('--cell-deg', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench-geo.json')
+    main(parser.parse_args())
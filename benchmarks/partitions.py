@@ -0,0 +1,176 @@
+"""
+Сравнение календаря одной таблицей (прежняя схема: уникальный индекс (date, property_id))
+и помесячными секциями (services.partition_service) на истории в несколько лет.
+Обе таблицы строятся в отдельной схеме bench_partitions и удаляются после замера.
+Для каждого запроса сохраняется EXPLAIN (ANALYZE, BUFFERS) и перцентили задержки.
+
+    python -m benchmarks.partitions --rooms 2000 --years 4 --output bench-partitions.json
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import random
+import time
+
+from sqlalchemy import text
+
+from benchmarks.run import git_commit, percentile
+from core.database import engine
+from core.settings import settings
+from services.partition_service import add_months
+
+SCHEMA = 'bench_partitions'
+COLUMNS = """
+    id SERIAL,
+    property_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    price NUMERIC(10, 2) NOT NULL,
+    is_available BOOLEAN NOT NULL,
+    is_blocked BOOLEAN NOT NULL,
+    booking_id INTEGER
+"""
+
+QUERIES = {
+    # календарь одной комнаты на ближайший месяц (страница комнаты, проверка брони)
+    'room_month': """
+        SELECT date, price FROM {table}
+        WHERE property_id = :room_id AND date >= :date_from AND date < :date_to
+          AND is_available AND NOT is_blocked
+        ORDER BY date
+    """,
+    # комнаты, свободные на все ночи периода (поиск)
+    'free_rooms': """
+        SELECT property_id FROM {table}
+        WHERE date >= :date_from AND date < :date_to
+        GROUP BY property_id
+        HAVING bool_and(is_available AND NOT is_blocked)
+    """,
+}
+
+
+async def build(conn, rooms: int, first: dt.date, last: dt.date) -> None:
+    await conn.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+    await conn.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+
+    await conn.execute(text(f'CREATE TABLE {SCHEMA}.flat ({COLUMNS}, PRIMARY KEY (id))'))
+    await conn.execute(text(f'CREATE UNIQUE INDEX flat_date_room ON {SCHEMA}.flat (date, property_id)'))
+    await conn.execute(text(f'CREATE INDEX flat_room ON {SCHEMA}.flat (property_id)'))
+    await conn.execute(text(f'CREATE INDEX flat_date ON {SCHEMA}.flat (date)'))
+
+    await conn.execute(text(
+        f'CREATE TABLE {SCHEMA}.partitioned ({COLUMNS}, PRIMARY KEY (id, date)) PARTITION BY RANGE (date)'
+    ))
+    await conn.execute(text(f'CREATE UNIQUE INDEX part_room_date ON {SCHEMA}.partitioned (property_id, date)'))
+    await conn.execute(text(f'CREATE INDEX part_booking ON {SCHEMA}.partitioned (booking_id)'))
+    month = first.replace(day=1)
+    while month <= last:
+        await conn.execute(text(
+            f"CREATE TABLE {SCHEMA}.partitioned_p{month:%Y_%m} PARTITION OF {SCHEMA}.partitioned "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+        month = add_months(month, 1)
+
+    for table in ('flat', 'partitioned'):
+        await conn.execute(text(f"""
+            INSERT INTO {SCHEMA}.{table} (property_id, date, price, is_available, is_blocked, booking_id)
+            SELECT room_id, day::date, 1000 + room_id % 50 * 100,
+                   day >= CURRENT_DATE AND random() > 0.3, random() < 0.02,
+                   CASE WHEN day < CURRENT_DATE THEN room_id END
+            FROM generate_series(1, :rooms) AS room_id,
+                 generate_series(CAST(:first AS date), CAST(:last AS date), interval '1 day') AS day
+        """), {'rooms': rooms, 'first': first, 'last': last})
+        await conn.execute(text(f'ANALYZE {SCHEMA}.{table}'))
+
+
+def plan_summary(plan: dict) -> dict:
+    scanned = set()
+    stack = [plan['Plan']]
+    while stack:
+        node = stack.pop()
+        if 'Relation Name' in node:
+            scanned.add(node['Relation Name'])
+        stack.extend(node.get('Plans', []))
+    return {
+        'relations_scanned': len(scanned),
+        'shared_hit_blocks': plan['Plan'].get('Shared Hit Blocks', 0),
+        'shared_read_blocks': plan['Plan'].get('Shared Read Blocks', 0),
+        'execution_ms': plan.get('Execution Time'),
+    }
+
+
+async def measure(conn, table: str, name: str, rooms: int, iterations: int, days: int) -> dict:
+    sql = text(QUERIES[name].format(table=f'{SCHEMA}.{table}'))
+    today = dt.date.today()
+
+    def params() -> dict:
+        date_from = today + dt.timedelta(days=random.randrange(settings.CALENDAR_WINDOW_DAYS - days))
+        return {'room_id': random.randint(1, rooms), 'date_from': date_from,
+                'date_to': date_from + dt.timedelta(days=days)}
+
+    plan = (await conn.execute(text(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql.text}'), params())).scalar()[0]
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        (await conn.execute(sql, params())).all()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'table': table,
+        'query': name,
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'plan': plan_summary(plan),
+        'explain': plan,
+    }
+
+
+async def main(args) -> None:
+    today = dt.date.today()
+    first = add_months(today.replace(day=1), -12 * args.years)
+    last = today + dt.timedelta(days=settings.CALENDAR_WINDOW_DAYS)
+    random.seed(args.seed)
+
+    async with engine.begin() as conn:
+        started = time.perf_counter()
+        await build(conn, args.rooms, first, last)
+        print(f'Таблицы заполнены за {time.perf_counter() - started:.1f} с: {args.rooms} комнат, {first} - {last}')
+
+    results = []
+    async with engine.connect() as conn:
+        for name, days in (('room_month', 30), ('free_rooms', args.nights)):
+            for table in ('flat', 'partitioned'):
+                result = await measure(conn, table, name, args.rooms, args.iterations, days)
+                results.append(result)
+                print(f"{name:<11}{table:<12} p50 {result['p50_ms']:>8} мс  p95 {result['p95_ms']:>8} мс  "
+                      f"таблиц в плане {result['plan']['relations_scanned']}  "
+                      f"буферов {result['plan']['shared_hit_blocks'] + result['plan']['shared_read_blocks']}")
+
+    if not args.keep:
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP SCHEMA {SCHEMA} CASCADE'))
+    await engine.dispose()
+
+    report = {
+        'commit': git_commit(),
+        'created_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'rooms': args.rooms,
+        'date_from': first.isoformat(),
+        'date_to': last.isoformat(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Календарь одной таблицей против помесячных секций')
+    parser.add_argument('--rooms', type=int, default=2000)
+    parser.add_argument('--years', type=int, default=4, help='Лет истории до текущей даты')
+    parser.add_argument('--nights', type=int, default=7, help='Длина периода для поиска свободных комнат')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help='Не удалять схему после замера')
+    parser.add_argument('--output', default='bench-partitions.json')
+    asyncio.run(main(parser.parse_args()))
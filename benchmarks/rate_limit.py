@@ -0,0 +1,97 @@
+"""
+Замер накладных расходов ограничителя частоты на запрос к /api/auth/login без базы и сети:
+тот же поток ASGI сообщений проходит через пустое приложение с middleware и без него.
+Отдельно замеряется TokenBuckets.take на заполненной до max_keys таблице, когда каждый запрос
+приходит с новым ключом (перебор почт или адресов) и вытесняет старую запись.
+
+    python -m benchmarks.rate_limit --requests 200000 --output bench-rate-limit.json
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import time
+
+from benchmarks.run import git_commit
+from core.rate_limit import RateLimitMiddleware, InMemoryRateLimitBackend, TokenBuckets
+
+PATH = '/api/auth/login'
+
+
+async def empty_app(scope, receive, send):
+    await receive()
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def drive(app, requests: int, ips: int, emails: int) -> tuple[float, int]:
+    """
+    Прогнать requests запросов через app
+    :return: (секунд всего, количество ответов 429)
+    """
+    rejected = 0
+
+    async def send(message):
+        nonlocal rejected
+        if message['type'] == 'http.response.start' and message['status'] == 429:
+            rejected += 1
+
+    started = time.perf_counter()
+    for i in range(requests):
+        body = json.dumps({'email': f'user{i % emails}@example.com', 'password': 'password'}).encode()
+        scope = {'type': 'http', 'method': 'POST', 'path': PATH, 'headers': [],
+                 'client': (f'10.0.{i % ips // 256}.{i % ips % 256}', 50000)}
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        await app(scope, receive, send)
+    return time.perf_counter() - started, rejected
+
+
+def take_at_capacity(max_keys: int, takes: int) -> float:
+    """
+    take с новым ключом на заполненной таблице корзин
+    :return: микросекунд на вызов
+    """
+    buckets = TokenBuckets(max_keys)
+    for i in range(max_keys):
+        buckets.take(f'auth_email:warm{i}@example.com', 5, 5 / 60, now=0.0)
+    started = time.perf_counter()
+    for i in range(takes):
+        buckets.take(f'auth_email:new{i}@example.com', 5, 5 / 60, now=1.0)
+    return (time.perf_counter() - started) / takes * 1e6
+
+
+async def main(args) -> None:
+    baseline, _ = await drive(empty_app, args.requests, args.ips, args.emails)
+    results = []
+    for name, backend in (('in_process', None), ('shared_fake', InMemoryRateLimitBackend())):
+        elapsed, rejected = await drive(RateLimitMiddleware(empty_app, backend=backend),
+                                        args.requests, args.ips, args.emails)
+        overhead_us = (elapsed - baseline) / args.requests * 1e6
+        results.append({'backend': name, 'requests': args.requests, 'rejected': rejected,
+                        'overhead_us_per_request': round(overhead_us, 2)})
+        print(f'{name:<12} накладные расходы {overhead_us:.2f} мкс/запрос, отклонено {rejected}')
+
+    at_capacity_us = take_at_capacity(args.max_keys, args.requests)
+    print(f'{"at_capacity":<12} take с новым ключом при {args.max_keys} корзинах {at_capacity_us:.2f} мкс')
+
+    report = {
+        'commit': git_commit(),
+        'created_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'results': results,
+        'at_capacity': {'max_keys': args.max_keys, 'takes': args.requests, 'us_per_take': round(at_capacity_us, 2)},
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Накладные расходы ограничителя частоты')
+    parser.add_argument('--requests', type=int, default=200_000)
+    parser.add_argument('--ips', type=int, default=10_000)
+    parser.add_argument('--emails', type=int, default=50_000)
+    parser.add_argument('--max-keys', type=int, default=100_000)
+    parser.add_argument('--output', default='bench-rate-limit.json')
+    asyncio.run(main(parser.parse_args()))
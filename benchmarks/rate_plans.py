@@ -0,0 +1,130 @@
+"""
+Замер сезонных правил цены на базе после benchmarks.seed: сезон ставится и снимается на всех комнатах
+владельца с наибольшим числом комнат через штатный RatePlanService, считаются время и число SQL-запросов.
+Затем замеряется расчёт стоимости quote_stays с пустым и заполненным кэшем цен.
+
+    python -m benchmarks.rate_plans --output bench-rate-plans.json
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import random
+import time
+from decimal import Decimal
+
+from sqlalchemy import select, func, event
+
+from benchmarks.run import git_commit, percentile
+from core.database import engine, async_session_maker
+from core.unit_of_work import UnitOfWork
+from models import Room
+from repositories.calendar_repo import CalendarRepo
+from repositories.rate_repo import RateRepo
+from schemas.rate_schemas import SeasonUpdate
+from services.pricing import quote_stays, price_cache
+from services.rate_service import RatePlanService
+
+SEASON_NAME = 'bench-season'
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+async def timed_change(name: str, change, counter: StatementCounter) -> dict:
+    async with async_session_maker() as session:
+        uow = UnitOfWork(session)
+        service = RatePlanService(RateRepo(session), CalendarRepo(session))
+        counter.count = 0
+        started = time.perf_counter()
+        applied = await change(service)
+        await uow.commit()
+        elapsed = time.perf_counter() - started
+    return {'change': name, 'rooms': applied.rooms, 'days_changed': applied.days_changed,
+            'statements': counter.count, 'seconds': round(elapsed, 3)}
+
+
+async def measure_quotes(name: str, stays, iterations: int, clear: bool) -> dict:
+    timings = []
+    async with async_session_maker() as session:
+        for _ in range(iterations):
+            if clear:
+                price_cache.clear()
+            started = time.perf_counter()
+            await quote_stays(session, stays)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {'quotes': name, 'stays': len(stays),
+            'p50_ms': round(percentile(timings, 50), 3), 'p95_ms': round(percentile(timings, 95), 3)}
+
+
+async def main(args) -> None:
+    async with async_session_maker() as session:
+        owner_id, room_count = (await session.execute(
+            select(Room.owner_id, func.count()).group_by(Room.owner_id).order_by(func.count().desc()).limit(1)
+        )).one()
+        room_ids = list(await session.scalars(select(Room.id).where(Room.owner_id == owner_id).order_by(Room.id)))
+    print(f'Владелец {owner_id}: {room_count} комнат')
+
+    today = dt.date.today()
+    season = SeasonUpdate(
+        room_ids=room_ids[:1000], date_from=today + dt.timedelta(days=30), date_to=today + dt.timedelta(days=120),
+        weekdays=[5, 6, 7], multiplier=Decimal('1.3'),
+    )
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, 'before_cursor_execute', counter)
+    results = [
+        await timed_change('put_season', lambda service: service.replace_season(owner_id, SEASON_NAME, season),
+                           counter),
+        await timed_change('replace_season', lambda service: service.replace_season(owner_id, SEASON_NAME, season),
+                           counter),
+    ]
+    event.remove(engine.sync_engine, 'before_cursor_execute', counter)
+
+    rng = random.Random(args.seed)
+    stays = []
+    for room_id in rng.sample(room_ids, min(args.stays, len(room_ids))):
+        check_in = today + dt.timedelta(days=rng.randint(1, 150))
+        stays.append((room_id, check_in, check_in + dt.timedelta(days=rng.randint(1, 14))))
+    quotes = [
+        await measure_quotes('cold_cache', stays, args.iterations, clear=True),
+        await measure_quotes('warm_cache', stays, args.iterations, clear=False),
+    ]
+
+    if not args.keep:
+        async with async_session_maker() as session:
+            await RatePlanService(RateRepo(session), CalendarRepo(session)).delete_season(owner_id, SEASON_NAME)
+            await session.commit()
+    await engine.dispose()
+
+    for result in results:
+        print(f"{result['change']:<16} комнат {result['rooms']:>5}  дней {result['days_changed']:>7}  "
+              f"запросов {result['statements']:>3}  {result['seconds']} с")
+    for result in quotes:
+        print(f"{result['quotes']:<16} проживаний {result['stays']:>4}  "
+              f"p50 {result['p50_ms']:>8} мс  p95 {result['p95_ms']:>8} мс")
+
+    report = {
+        'commit': git_commit(),
+        'created_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'owner_rooms': room_count,
+        'changes': results,
+        'quotes': quotes,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Замер сезонных правил цены и кэша цен')
+    parser.add_argument('--stays', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help='Не удалять сезон после замера')
+    parser.add_argument('--output', default='bench-rate-plans.json')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""
+Замер пакетного управления комнатами через штатный RoomService: создание пакета комнат с календарями,
+изменение цены всех комнат пакета (с пересчётом календаря) и удаление. Каждый шаг - одна транзакция,
+как в API; считаются время и число SQL-запросов.
+
+    python -m benchmarks.room_batch --rooms 1000 --output bench-room-batch.json
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import time
+
+from sqlalchemy import text, event
+
+from benchmarks.rate_plans import StatementCounter
+from benchmarks.run import git_commit
+from benchmarks.seed import CITIES
+from core.database import engine, async_session_maker, Base
+from core.unit_of_work import UnitOfWork
+from repositories.calendar_repo import CalendarRepo
+from repositories.room_repo import RoomRepo
+from services.room_service import RoomService
+from sql_enums import UserType, RoomType, RoomStatus, Currency
+
+BENCH_OWNER_EMAIL = 'bench-room-batch@example.com'
+
+
+def room_item(n: int) -> dict:
+    return {
+        'title': f'Апартаменты пакета {n}', 'description': 'Синтетическая комната для замера пакетного импорта',
+        'country': 'Россия', 'city': CITIES[n % len(CITIES)], 'address': f'Пакетная улица дом {n}',
+        'property_type': list(RoomType)[n % len(RoomType)].value,
+        'guests_cnt': 1 + n % 6, 'bedrooms': 1 + n % 3, 'beds': 1 + n % 4, 'bathrooms': 1 + n % 2,
+        'base_price': str(2000 + n % 50 * 100), 'currency': Currency.RUB.value, 'cleaning_fee': '1000',
+        'security_deposit': '5000', 'weekend_multiplier': '1.25', 'min_stay': 1, 'max_stay': 30,
+        'is_available': True, 'status': RoomStatus.ACTIVE.value,
+    }
+
+
+async def timed_step(name: str, step, counter: StatementCounter) -> tuple[dict, object]:
+    async with async_session_maker() as session:
+        uow = UnitOfWork(session)
+        service = RoomService(RoomRepo(session), CalendarRepo(session))
+        counter.count = 0
+        started = time.perf_counter()
+        response = await step(service)
+        await uow.commit()
+        elapsed = time.perf_counter() - started
+    return {'step': name, 'succeeded': response.succeeded, 'failed': response.failed,
+            'statements': counter.count, 'seconds': round(elapsed, 3)}, response
+
+
+async def main(args) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session_maker() as session:
+        owner_id = await session.scalar(text("""
+            INSERT INTO users (first_name, second_name, password, email, user_type, is_verified, verification_lvl)
+            VALUES ('Bench', 'Batch', '-', :email, CAST(:owner AS usertype), true, 1)
+            ON CONFLICT (email) DO UPDATE SET first_name = EXCLUDED.first_name
+            RETURNING id
+        """), {'email': BENCH_OWNER_EMAIL, 'owner': UserType.OWNER.name})
+        await session.commit()
+
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, 'before_cursor_execute', counter)
+    items = [room_item(n) for n in range(args.rooms)]
+    create, created = await timed_step('create', lambda service: service.create_rooms(owner_id, items), counter)
+    room_ids = [result.id for result in created.results if result.ok]
+    update, _ = await timed_step(
+        'update_price',
+        lambda service: service.update_rooms(owner_id, [{'id': room_id, 'base_price': '4500'} for room_id in room_ids]),
+        counter,
+    )
+    remove, _ = await timed_step('delete', lambda service: service.delete_rooms(owner_id, room_ids), counter)
+    event.remove(engine.sync_engine, 'before_cursor_execute', counter)
+    await engine.dispose()
+
+    results = [create, update, remove]
+    for result in results:
+        print(f"{result['step']:<14} успешно {result['succeeded']:>5}  ошибок {result['failed']:>3}  "
+              f"запросов {result['statements']:>3}  {result['seconds']} с")
+    report = {
+        'commit': git_commit(),
+        'created_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'rooms': args.rooms,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Замер пакетного создания, изменения и удаления комнат')
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--output', default='bench-room-batch.json')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,323 @@
+"""
+Нагрузочные тесты основных сценариев API: регистрация, вход, обновление токена, профиль,
+поиск комнат и создание бронирований. По умолчанию приложение поднимается в этом же процессе
+(httpx ASGITransport), с --base-url запросы идут на уже запущенный сервер.
+Нужна локальная база Postgres, заполненная benchmarks.seed - SQLite не подходит,
+т.к. бронирование и календари опираются на FOR UPDATE SKIP LOCKED, generate_series и ON CONFLICT.
+Все запросы идут с одного адреса, поэтому ограничитель частоты auth эндпоинтов по умолчанию отключается.
+Результаты пишутся в JSON, --compare выводит разницу с прошлым прогоном.
+
+    python -m benchmarks.seed
+    python -m benchmarks.run --requests 1000 --concurrency 50 --output bench.json
+    python -m benchmarks.run --output bench-new.json --compare bench.json
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import math
+import random
+import subprocess
+import time
+from collections import Counter
+from typing import Awaitable, Callable
+
+import httpx
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+
+from benchmarks.seed import BENCH_PASSWORD, BENCH_EMAIL, CITIES, CITY_COORDINATES
+from core.database import async_session_maker, engine
+from core.settings import settings
+from models import AvailabilityCalendar, Booking, Room, User
+from sql_enums import ACTIVE_BOOKING_STATUSES, UserType
+
+SCENARIOS = ('reg', 'login', 'refresh', 'users_me', 'room_search', 'room_nearby', 'booking_create',
+             'booking_hot_room', 'login_storm')
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Перцентиль методом ближайшего ранга
+    :param values: отсортированные значения
+    :param q: 0..100
+    :return: float
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+async def measure(client: httpx.AsyncClient, request: Request, total: int, concurrency: int,
+                  ok: tuple[int, ...] = (200, 201)) -> dict:
+    """
+    Выполнить total запросов не более чем concurrency одновременно и посчитать пропускную способность
+    и перцентили задержки. Ответы со статусом не из ok считаются ошибками.
+    :param client:
+    :param request: функция (client, номер запроса) -> Response
+    :param total:
+    :param concurrency:
+    :param ok:
+    :return: dict со сводкой
+    """
+    latencies: list[float] = []
+    statuses: Counter[str] = Counter()
+    numbers = iter(range(total))
+
+    async def worker():
+        for i in numbers:
+            started = time.perf_counter()
+            try:
+                response = await request(client, i)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'errors': sum(count for status, count in statuses.items() if not status.isdigit() or int(status) not in ok),
+        'statuses': dict(statuses),
+    }
+
+
+class Fixtures:
+    """
+    Данные из засеянной базы, на которых строятся запросы сценариев
+    """
+
+    def __init__(self, guests: list[str], room_ids: list[int], tokens: list[tuple[str, str]]):
+        self.guests = guests
+        self.room_ids = room_ids
+        self.tokens = tokens
+
+    @classmethod
+    async def load(cls, client: httpx.AsyncClient, sessions: int) -> "Fixtures":
+        async with async_session_maker() as session:
+            guests = list(await session.scalars(
+                select(User.email)
+                .where(User.email.like(BENCH_EMAIL.format('%')), User.user_type == UserType.GUEST)
+                .order_by(User.id)
+            ))
+            room_ids = list(await session.scalars(select(Room.id).order_by(Room.id)))
+        if not guests or not room_ids:
+            raise SystemExit('База пуста, сначала выполните python -m benchmarks.seed')
+
+        tokens = []
+        for email in guests[:sessions]:
+            response = await client.post('/api/auth/login', json={'email': email, 'password': BENCH_PASSWORD})
+            response.raise_for_status()
+            tokens.append((response.json()['access_token'], response.json()['refresh_token']))
+        client.cookies.clear()
+        return cls(guests, room_ids, tokens)
+
+    def access(self, i: int) -> dict[str, str]:
+        return {'Cookie': f'access_token={self.tokens[i % len(self.tokens)][0]}'}
+
+    def refresh(self, i: int) -> dict[str, str]:
+        return {'Cookie': f'refresh_token={self.tokens[i % len(self.tokens)][1]}'}
+
+
+def stay(i: int, horizon: int = 300) -> tuple[dt.date, dt.date]:
+    check_in = dt.date.today() + dt.timedelta(days=1 + i * 7919 % horizon)
+    return check_in, check_in + dt.timedelta(days=1 + i % 5)
+
+
+async def find_free_stay(nights: int) -> tuple[int, dt.date]:
+    """
+    Комната и дата заезда, у которых свободны все ночи - для гонки бронирований одной комнаты
+    """
+    calendar = AvailabilityCalendar
+    free_day = calendar.is_available & ~calendar.is_blocked & calendar.booking_id.is_(None)
+    async with async_session_maker() as session:
+        for _ in range(100):
+            room_id = await session.scalar(select(Room.id).order_by(func.random()).limit(1))
+            check_in = dt.date.today() + dt.timedelta(days=random.randint(310, 500))
+            free = await session.scalar(
+                select(func.count()).select_from(calendar).where(
+                    calendar.property_id == room_id, free_day,
+                    calendar.date >= check_in, calendar.date < check_in + dt.timedelta(days=nights),
+                )
+            )
+            if free == nights:
+                return room_id, check_in
+    raise SystemExit('Не удалось найти свободную комнату для гонки бронирований')
+
+
+async def count_double_bookings(room_id: int) -> int:
+    """
+    Число пар активных бронирований комнаты с пересекающимися датами
+    """
+    first, second = aliased(Booking), aliased(Booking)
+    async with async_session_maker() as session:
+        return await session.scalar(
+            select(func.count())
+            .select_from(first)
+            .join(second, (first.property_id == second.property_id) & (first.id < second.id)
+                  & (first.check_in < second.check_out) & (second.check_in < first.check_out))
+            .where(first.property_id == room_id, first.status.in_(ACTIVE_BOOKING_STATUSES),
+                   second.status.in_(ACTIVE_BOOKING_STATUSES))
+        )
+
+
+async def run_scenarios(client: httpx.AsyncClient, args) -> dict[str, dict]:
+    fixtures = await Fixtures.load(client, sessions=min(args.concurrency, 100))
+    run_id = int(time.time()) % 1_000_000
+
+    async def reg(c: httpx.AsyncClient, i: int):
+        return await c.post('/api/auth/reg', json={
+            'first_name': 'Bench', 'second_name': 'Runner', 'password': BENCH_PASSWORD, 'user_type': 'guest',
+            'email': f'run{run_id}-{i}@example.com', 'phone': f'+8{run_id:06d}{i:07d}',
+        })
+
+    async def login(c: httpx.AsyncClient, i: int):
+        email = fixtures.guests[i % len(fixtures.guests)]
+        return await c.post('/api/auth/login', json={'email': email, 'password': BENCH_PASSWORD})
+
+    async def refresh(c: httpx.AsyncClient, i: int):
+        return await c.post('/api/auth/refresh', headers=fixtures.refresh(i))
+
+    async def users_me(c: httpx.AsyncClient, i: int):
+        return await c.get('/api/users/me', headers=fixtures.access(i))
+
+    async def room_search(c: httpx.AsyncClient, i: int):
+        check_in, check_out = stay(i)
+        return await c.get('/api/rooms/search', params={
+            'city': CITIES[i % len(CITIES)], 'guests_cnt': 2,
+            'check_in': check_in.isoformat(), 'check_out': check_out.isoformat(),
+        })
+
+    async def room_nearby(c: httpx.AsyncClient, i: int):
+        lat, lon = CITY_COORDINATES[CITIES[i % len(CITIES)]]
+        return await c.get('/api/rooms/nearby', params={
+            'latitude': lat + (i % 7 - 3) * 0.01, 'longitude': lon + (i % 5 - 2) * 0.01, 'radius_km': 3,
+        })
+
+    async def booking_create(c: httpx.AsyncClient, i: int):
+        check_in, check_out = stay(i + run_id)
+        return await c.post('/api/bookings', headers=fixtures.access(i), json={
+            'room_id': random.choice(fixtures.room_ids), 'guest_cnt': 1,
+            'check_in': check_in.isoformat(), 'check_out': check_out.isoformat(),
+        })
+
+    results = {}
+    requests = {'reg': reg, 'login': login, 'refresh': refresh, 'users_me': users_me, 'room_search': room_search,
+                'room_nearby': room_nearby}
+    for name, request in requests.items():
+        if name in args.scenarios:
+            results[name] = await measure(client, request, args.requests, args.concurrency)
+            client.cookies.clear()
+
+    if 'booking_create' in args.scenarios:
+        results['booking_create'] = await measure(client, booking_create, args.requests, args.concurrency,
+                                                  ok=(201, 409))
+
+    if 'booking_hot_room' in args.scenarios:
+        nights = 3
+        room_id, check_in = await find_free_stay(nights)
+
+        async def hot_booking(c: httpx.AsyncClient, i: int):
+            return await c.post('/api/bookings', headers=fixtures.access(i), json={
+                'room_id': room_id, 'guest_cnt': 1, 'check_in': check_in.isoformat(),
+                'check_out': (check_in + dt.timedelta(days=nights)).isoformat(),
+            })
+
+        summary = await measure(client, hot_booking, args.concurrency, args.concurrency, ok=(201, 409))
+        summary['successful'] = summary['statuses'].get('201', 0)
+        summary['double_bookings'] = await count_double_bookings(room_id)
+        results['booking_hot_room'] = summary
+
+    if 'login_storm' in args.scenarios:
+        storm, search = await asyncio.gather(
+            measure(client, login, args.requests, args.concurrency),
+            measure(client, room_search, args.requests, max(args.concurrency // 5, 1)),
+        )
+        client.cookies.clear()
+        results['login_storm'] = storm
+        results['room_search_during_login_storm'] = search
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: dict, current: dict) -> None:
+    print(f"{'scenario':<32}{'metric':<16}{'before':>10}{'after':>10}{'change':>10}")
+    for name, summary in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if before is None:
+            continue
+        for metric in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            old, new = before[metric], summary[metric]
+            change = f'{(new - old) / old * 100:+.1f}%' if old else '-'
+            print(f'{name:<32}{metric:<16}{old:>10}{new:>10}{change:>10}')
+
+
+async def main(args) -> None:
+    settings.RATE_LIMIT_ENABLED = args.rate_limit
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+        results = await run_scenarios(client, args)
+        await client.aclose()
+    else:
+        from main import app, on_startup, on_shutdown
+
+        await on_startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark',
+                                   timeout=args.timeout)
+        try:
+            results = await run_scenarios(client, args)
+        finally:
+            await client.aclose()
+            await on_shutdown()
+    await engine.dispose()
+
+    report = {
+        'commit': git_commit(),
+        'created_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'config': {'requests': args.requests, 'concurrency': args.concurrency,
+                   'target': args.base_url or 'in-process'},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    for name, summary in results.items():
+        print(f"{name:<32}{summary['throughput_rps']:>10} rps  p50 {summary['p50_ms']} ms  "
+              f"p95 {summary['p95_ms']} ms  p99 {summary['p99_ms']} ms  errors {summary['errors']}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(json.load(file), report)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Нагрузочные тесты API бронирования')
+    parser.add_argument('--requests', type=int, default=500, help='Запросов на сценарий')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--base-url', help='Адрес запущенного сервера вместо приложения в процессе')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--rate-limit', action='store_true',
+                        help='Не отключать ограничитель частоты (при --base-url задаётся RATE_LIMIT_ENABLED сервера)')
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+    asyncio.run(main(parser.parse_args()))
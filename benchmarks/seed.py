@@ -0,0 +1,127 @@
+"""
+Наполнение локальной базы Postgres данными для нагрузочных тестов.
+Пользователи и комнаты вставляются одним INSERT ... SELECT generate_series, календари строятся
+штатным roll_calendars_forward, брони создаются через BookingRepo, как в API.
+
+    python -m benchmarks.seed --users 10000 --rooms 5000 --bookings 20000
+"""
+import argparse
+import asyncio
+import datetime as dt
+import random
+import time
+
+from sqlalchemy import text, select
+
+from core.database import engine, async_session_maker, Base
+from core.hashing import pwd_context
+from models import Room, User
+from repositories.booking_repo import BookingRepo
+from services.calendar_service import roll_calendars_forward
+from services.geocoder import import_places
+from services.partition_service import maintain_partitions
+from sql_enums import UserType, RoomType, RoomStatus, Currency
+
+BENCH_PASSWORD = 'benchmark-password'
+BENCH_EMAIL = 'bench{}@example.com'
+CITY_COORDINATES = {
+    'Москва': (55.7558, 37.6173), 'Санкт-Петербург': (59.9343, 30.3351), 'Казань': (55.7963, 49.1088),
+    'Сочи': (43.5855, 39.7231), 'Калининград': (54.7104, 20.4522), 'Екатеринбург': (56.8389, 60.6057),
+    'Новосибирск': (55.0084, 82.9357), 'Berlin': (52.5200, 13.4050), 'Paris': (48.8566, 2.3522),
+    'Rome': (41.9028, 12.4964),
+}
+CITIES = list(CITY_COORDINATES)
+CITY_SPREAD_DEG = 0.15
+
+
+async def seed_users(count: int) -> None:
+    password = pwd_context.hash(BENCH_PASSWORD.encode('utf-8'))
+    async with async_session_maker() as session:
+        await session.execute(text("""
+            INSERT INTO users (first_name, second_name, password, email, phone, user_type, is_verified, verification_lvl)
+            SELECT 'Bench', 'User' || n, :password, 'bench' || n || '@example.com', '+7900' || lpad(n::text, 8, '0'),
+                   CASE WHEN n % 10 = 0 THEN CAST(:owner AS usertype) ELSE CAST(:guest AS usertype) END, true, 1
+            FROM generate_series(1, :count) AS n
+            ON CONFLICT DO NOTHING
+        """), {'password': password, 'count': count, 'owner': UserType.OWNER.name, 'guest': UserType.GUEST.name})
+        await session.commit()
+
+
+async def seed_rooms(count: int) -> None:
+    async with async_session_maker() as session:
+        owners = list(await session.scalars(
+            select(User.id).where(User.email.like(BENCH_EMAIL.format('%')), User.user_type == UserType.OWNER)
+        ))
+        room_types = [room_type.name for room_type in RoomType]
+        await session.execute(text("""
+            INSERT INTO rooms (owner_id, title, description, country, city, address, latitude, longitude,
+                               property_type, guests_cnt, bedrooms, beds, bathrooms, base_price, currency, cleaning_fee,
+                               security_deposit, weekend_multiplier, min_stay, max_stay, is_available, status)
+            SELECT (CAST(:owners AS integer[]))[1 + n % cardinality(CAST(:owners AS integer[]))],
+                   'Апартаменты №' || n, 'Уютные апартаменты для нагрузочного теста №' || n,
+                   'Россия', (CAST(:cities AS text[]))[1 + n % cardinality(CAST(:cities AS text[]))],
+                   'Тестовая улица дом ' || n,
+                   (CAST(:lats AS float8[]))[1 + n % cardinality(CAST(:lats AS float8[]))] + (random() - 0.5) * :spread,
+                   (CAST(:lons AS float8[]))[1 + n % cardinality(CAST(:lons AS float8[]))] + (random() - 0.5) * :spread,
+                   CAST((CAST(:room_types AS text[]))[1 + n % cardinality(CAST(:room_types AS text[]))] AS roomtype),
+                   1 + n % 6, 1 + n % 3, 1 + n % 4, 1 + n % 2,
+                   round((1500 + random() * 15000)::numeric, 2), CAST(:currency AS currency), 1000, 5000, 1.25,
+                   1, 30, true, CAST(:status AS roomstatus)
+            FROM generate_series(1, :count) AS n
+        """), {'owners': owners, 'cities': CITIES, 'room_types': room_types, 'count': count,
+               'lats': [lat for lat, _ in CITY_COORDINATES.values()],
+               'lons': [lon for _, lon in CITY_COORDINATES.values()], 'spread': CITY_SPREAD_DEG,
+               'currency': Currency.RUB.name, 'status': RoomStatus.ACTIVE.name})
+        await import_places(session, [('Россия', city, lat, lon) for city, (lat, lon) in CITY_COORDINATES.items()])
+        await session.commit()
+
+
+async def seed_bookings(count: int, concurrency: int = 8) -> int:
+    async with async_session_maker() as session:
+        room_ids = list(await session.scalars(select(Room.id)))
+        guest_ids = list(await session.scalars(
+            select(User.id).where(User.email.like(BENCH_EMAIL.format('%')), User.user_type == UserType.GUEST)
+        ))
+    created = 0
+    queue = list(range(count))
+
+    async def worker():
+        nonlocal created
+        while queue:
+            queue.pop()
+            check_in = dt.date.today() + dt.timedelta(days=random.randint(1, 300))
+            check_out = check_in + dt.timedelta(days=random.randint(1, 7))
+            async with async_session_maker() as session:
+                room = await session.get(Room, random.choice(room_ids))
+                booking = await BookingRepo(session).create_booking(
+                    room, random.choice(guest_ids), 1, check_in, check_out, hold=dt.timedelta(days=365)
+                )
+                await session.commit()
+            created += booking is not None
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return created
+
+
+async def main(args) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await maintain_partitions()
+    for name, step in (
+        ('users', lambda: seed_users(args.users)),
+        ('rooms', lambda: seed_rooms(args.rooms)),
+        ('calendars', roll_calendars_forward),
+        ('bookings', lambda: seed_bookings(args.bookings)),
+    ):
+        started = time.perf_counter()
+        result = await step()
+        print(f'{name}: {time.perf_counter() - started:.1f} s' + (f' ({result})' if result is not None else ''))
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Наполнение базы для нагрузочных тестов')
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--rooms', type=int, default=5_000)
+    parser.add_argument('--bookings', type=int, default=20_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,178 @@
+"""
+Замер полнотекстового поиска комнат на синтетических объявлениях (по умолчанию миллион).
+Объявления вставляются в rooms со страной Benchland и удаляются после замера (--keep оставляет).
+Запросы строятся штатным RoomRepo.search_query; для сравнения замеряется ILIKE '%...%'.
+Для каждого запроса сохраняется EXPLAIN (ANALYZE, BUFFERS) и перцентили задержки.
+
+    python -m benchmarks.text_search --listings 1000000 --output bench-text-search.json
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import time
+
+from sqlalchemy import text, select, delete, or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from benchmarks.run import git_commit, percentile
+from benchmarks.seed import CITIES
+from core.database import engine, async_session_maker, Base
+from models import Room
+from repositories.room_repo import RoomRepo, ROOM_CARD_COLUMNS
+from schemas.room_schemas import RoomSearchParams
+from sql_enums import UserType, RoomType, RoomStatus, Currency
+
+BENCH_COUNTRY = 'Benchland'
+BENCH_OWNER_EMAIL = 'bench-text-search@example.com'
+BATCH_SIZE = 100_000
+TITLE_WORDS = [
+    'Уютная', 'Светлая', 'Просторная', 'Современная', 'Тихая', 'студия', 'квартира', 'апартаменты', 'лофт',
+    'комната', 'мансарда', 'у моря', 'в центре', 'у парка', 'с видом', 'с балконом',
+    'Cozy', 'Bright', 'Spacious', 'Modern', 'Quiet', 'studio', 'apartment', 'loft', 'room', 'cottage',
+    'near the sea', 'downtown', 'by the park', 'with a view', 'with balcony',
+]
+DESCRIPTION_WORDS = TITLE_WORDS + [
+    'кухня', 'посудомоечная машина', 'кондиционер', 'парковка', 'рядом', 'метро', 'рестораны', 'магазины',
+    'пляж', 'камин', 'терраса', 'детская кроватка', 'рабочее место', 'быстрый интернет', 'ремонт',
+    'kitchen', 'dishwasher', 'air conditioning', 'parking', 'close to', 'subway', 'restaurants', 'shops',
+    'beach', 'fireplace', 'terrace', 'crib', 'workspace', 'fast wifi', 'renovated', 'and', 'и',
+]
+QUERIES = {
+    'word_ru': {'q': 'студия'},
+    'prefix_ru': {'q': 'апарт'},
+    'words_en': {'q': 'cozy loft'},
+    'typo_ru': {'q': 'апартамнты'},
+    'mixed_with_filters': {'q': 'камин terrace', 'property_type': list(RoomType)[0], 'guests_cnt': 3},
+    'rare_words': {'q': 'мансарда fireplace crib'},
+}
+
+
+class Explain(Executable, ClauseElement):
+    """
+    EXPLAIN для запроса SQLAlchemy с обычной передачей параметров
+    """
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, 'postgresql')
+def visit_explain(element, compiler, **kw):
+    return 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+async def seed_listings(count: int) -> None:
+    async with async_session_maker() as session:
+        owner_id = await session.scalar(text("""
+            INSERT INTO users (first_name, second_name, password, email, user_type, is_verified, verification_lvl)
+            VALUES ('Bench', 'Text', '-', :email, CAST(:owner AS usertype), true, 1)
+            ON CONFLICT (email) DO UPDATE SET first_name = EXCLUDED.first_name
+            RETURNING id
+        """), {'email': BENCH_OWNER_EMAIL, 'owner': UserType.OWNER.name})
+        room_types = [room_type.name for room_type in RoomType]
+        for start in range(0, count, BATCH_SIZE):
+            await session.execute(text("""
+                INSERT INTO rooms (owner_id, title, description, country, city, address, property_type,
+                                   guests_cnt, bedrooms, beds, bathrooms, base_price, currency, cleaning_fee,
+                                   security_deposit, weekend_multiplier, min_stay, max_stay, is_available, status)
+                SELECT :owner_id,
+                       array_to_string(ARRAY(
+                           SELECT (CAST(:title_words AS text[]))[1 + floor(random() * :title_count)::int]
+                           FROM generate_series(1, 2 + n % 3) WHERE n > 0
+                       ), ' '),
+                       array_to_string(ARRAY(
+                           SELECT (CAST(:description_words AS text[]))[1 + floor(random() * :description_count)::int]
+                           FROM generate_series(1, 20 + n % 30) WHERE n > 0
+                       ), ' '),
+                       :country, (CAST(:cities AS text[]))[1 + n % cardinality(CAST(:cities AS text[]))],
+                       'Синтетическая улица дом ' || n,
+                       CAST((CAST(:room_types AS text[]))[1 + n % cardinality(CAST(:room_types AS text[]))] AS roomtype),
+                       1 + n % 6, 1 + n % 3, 1 + n % 4, 1 + n % 2,
+                       round((1500 + random() * 15000)::numeric, 2), CAST(:currency AS currency), 1000, 5000, 1.25,
+                       1, 30, true, CAST(:status AS roomstatus)
+                FROM generate_series(CAST(:first AS integer), :last) AS n
+            """), {'owner_id': owner_id, 'title_words': TITLE_WORDS, 'title_count': len(TITLE_WORDS),
+                   'description_words': DESCRIPTION_WORDS, 'description_count': len(DESCRIPTION_WORDS),
+                   'country': BENCH_COUNTRY, 'cities': CITIES, 'room_types': room_types,
+                   'currency': Currency.RUB.name, 'status': RoomStatus.ACTIVE.name,
+                   'first': start + 1, 'last': min(start + BATCH_SIZE, count)})
+            await session.commit()
+    async with engine.connect() as conn:
+        await conn.execute(text('ANALYZE rooms'))
+
+
+def ilike_query(q: str):
+    pattern = f'%{q}%'
+    return (
+        select(*ROOM_CARD_COLUMNS)
+        .where(Room.status == RoomStatus.ACTIVE, or_(Room.title.ilike(pattern), Room.description.ilike(pattern)))
+        .order_by(Room.base_price, Room.id)
+        .limit(20)
+    )
+
+
+async def measure(name: str, query, iterations: int) -> dict:
+    async with engine.connect() as conn:
+        plan = (await conn.execute(Explain(query))).scalar()[0]
+        timings, found = [], 0
+        for _ in range(iterations):
+            started = time.perf_counter()
+            found = len((await conn.execute(query)).all())
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'query': name,
+        'found': found,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'plan_root': plan['Plan']['Node Type'],
+        'shared_blocks': plan['Plan'].get('Shared Hit Blocks', 0) + plan['Plan'].get('Shared Read Blocks', 0),
+        'explain': plan,
+    }
+
+
+async def main(args) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    if not args.skip_seed:
+        started = time.perf_counter()
+        await seed_listings(args.listings)
+        print(f'Вставлено объявлений: {args.listings} за {time.perf_counter() - started:.1f} с')
+
+    repo = RoomRepo(None)
+    runs = [(name, repo.search_query(RoomSearchParams(**params))) for name, params in QUERIES.items()]
+    runs.append(('ilike_baseline', ilike_query(QUERIES['word_ru']['q'])))
+    results = []
+    for name, query in runs:
+        result = await measure(name, query, args.iterations)
+        results.append(result)
+        print(f"{name:<20} найдено {result['found']:>3}  p50 {result['p50_ms']:>9} мс  "
+              f"p95 {result['p95_ms']:>9} мс  {result['plan_root']}")
+
+    if not args.keep:
+        async with async_session_maker() as session:
+            await session.execute(delete(Room).where(Room.country == BENCH_COUNTRY))
+            await session.commit()
+    await engine.dispose()
+
+    report = {
+        'commit': git_commit(),
+        'created_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'listings': args.listings,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Замер полнотекстового поиска комнат')
+    parser.add_argument('--listings', type=int, default=1_000_000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--skip-seed', action='store_true', help='Использовать объявления прошлого прогона (--keep)')
+    parser.add_argument('--keep', action='store_true', help='Не удалять объявления после замера')
+    parser.add_argument('--output', default='bench-text-search.json')
+    asyncio.run(main(parser.parse_args()))
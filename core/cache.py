@@ -0,0 +1,260 @@
+import datetime as dt
+import enum
+import json
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Collection, Protocol
+
+from sqlalchemy import inspect, Date, DateTime, Enum, Numeric, Time
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from core.metrics import registry
+from core.settings import settings
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+MISSING = object()
+caches: list['ReadThroughCache'] = []
+
+
+class CacheBackend(Protocol):
+    """
+    Общее для нескольких процессов хранилище кэша (например, Redis)
+    """
+
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+
+class InMemoryBackend:
+    """
+    Локальная замена общего хранилища для тестов и одиночного процесса
+    """
+
+    def __init__(self):
+        self._data: dict[str, tuple[float, bytes]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        if redis_asyncio is None:
+            raise RuntimeError('Для CACHE_URL необходим установленный пакет redis')
+        self.client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self.client.set(key, value, ex=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*keys)
+
+
+class TTLCache:
+    """
+    Локальный кэш процесса с ограничением по времени жизни записи и вытеснением давно не использованных (LRU)
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return MISSING
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float | None = None) -> None:
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ReadThroughCache:
+    """
+    Кэш чтения: локальный TTLCache и, если задан, общий backend.
+    При промахе значение загружается через loader и кладётся в оба уровня.
+    Пока значения лежат в общем хранилище, локальный уровень живёт не дольше local_ttl,
+    чтобы инвалидация из других процессов доходила быстро.
+    В общее хранилище значения пишутся в JSON, поэтому кэшировать можно только JSON-совместимые
+    значения (снимки ORM-объектов из snapshot).
+    """
+
+    def __init__(self, name: str, ttl: int, maxsize: int, backend: CacheBackend | None = None,
+                 local_ttl: int | None = None):
+        self.name = name
+        self.ttl = ttl
+        self.backend = backend
+        self.local = TTLCache(maxsize, local_ttl or (min(ttl, 5) if backend else ttl))
+        self.hits = 0
+        self.misses = 0
+        caches.append(self)
+
+    def _key(self, key) -> str:
+        return f'{self.name}:{key}'
+
+    async def get(self, key, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+        if self.backend is not None:
+            value = self._decode(await self.backend.get(self._key(key)))
+            if value is not MISSING:
+                self.hits += 1
+                self.local.set(key, value)
+                return value
+
+        self.misses += 1
+        value = await loader()
+        if value is not None:
+            await self.set(key, value)
+        return value
+
+    async def set(self, key, value) -> None:
+        self.local.set(key, value)
+        if self.backend is not None:
+            await self.backend.set(self._key(key), json.dumps(value, ensure_ascii=False).encode(), self.ttl)
+
+    @staticmethod
+    def _decode(raw: bytes | None) -> Any:
+        """
+        Значение из общего хранилища. Нечитаемая запись (например, в старом формате) считается промахом
+        :param raw:
+        :return: значение или MISSING
+        """
+        if raw is None:
+            return MISSING
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return MISSING
+
+    async def invalidate(self, *keys) -> None:
+        for key in keys:
+            self.local.delete(key)
+        if self.backend is not None:
+            await self.backend.delete(*map(self._key, keys))
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.local.evictions,
+            'size': len(self.local),
+        }
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, (dt.date, dt.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _load_value(column_type, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(column_type, Enum) and column_type.enum_class is not None:
+        return column_type.enum_class[value]
+    if isinstance(column_type, DateTime):
+        return dt.datetime.fromisoformat(value)
+    if isinstance(column_type, Date):
+        return dt.date.fromisoformat(value)
+    if isinstance(column_type, Time):
+        return dt.time.fromisoformat(value)
+    if isinstance(column_type, Numeric) and column_type.asdecimal:
+        return Decimal(value)
+    return value
+
+
+def snapshot(instance, exclude: Collection[str] = ()) -> dict[str, Any]:
+    """
+    Значения колонок ORM-объекта для хранения в кэше в JSON-совместимом виде. Отложенные (deferred) колонки
+    и колонки из exclude (пароли и другие секреты) в снимок не попадают
+    :param instance:
+    :param exclude: имена атрибутов, которые нельзя класть в кэш
+    :return: dict
+    """
+    return {attr.key: _dump_value(getattr(instance, attr.key)) for attr in inspect(instance).mapper.column_attrs
+            if not attr.deferred and attr.key not in exclude}
+
+
+async def restore(session: AsyncSession, model, data: dict[str, Any]):
+    """
+    Восстановление ORM-объекта из снимка и присоединение к сессии без запроса в базу.
+    Колонки, которых нет в снимке, остаются незагруженными: если объект уже есть в сессии,
+    их значения сохраняются, иначе они загрузятся обычным запросом
+    :param session:
+    :param model:
+    :param data: снимок из snapshot
+    :return: ORM-объект
+    """
+    attrs = inspect(model).column_attrs
+    instance = model(**{key: _load_value(attrs[key].columns[0].type, value) for key, value in data.items()})
+    make_transient_to_detached(instance)
+    return await session.merge(instance, load=False)
+
+
+def build_backend() -> CacheBackend | None:
+    if not settings.CACHE_URL:
+        return None
+    if settings.CACHE_URL == 'memory://':
+        return InMemoryBackend()
+    return RedisBackend(settings.CACHE_URL)
+
+
+cache_backend = build_backend()
+registry.gauge(
+    'cache_stats', 'Попадания, промахи, вытеснения и размер кэшей', labels=('cache', 'kind'),
+    callback=lambda: {(cache.name, kind): value for cache in caches for kind, value in cache.stats().items()},
+)
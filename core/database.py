@@ -1,14 +1,88 @@
-from contextlib import asynccontextmanager
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncAttrs, AsyncSession
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncAttrs, AsyncSession, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, declared_attr
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy import Integer, func
-from core.settings import get_db_url
+from core.metrics import registry
+from core.settings import get_db_url, settings
 from datetime import datetime
+from uuid import uuid4
+
+POOL_CHECKOUT_WAIT = registry.histogram(
+    'db_pool_checkout_wait_seconds', 'Время ожидания соединения из пула', labels=('pool',),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+POOL_CHECKOUT_TIMEOUTS = registry.counter(
+    'db_pool_checkout_timeouts_total', 'Количество таймаутов ожидания соединения', labels=('pool',)
+)
+
+
+def timed_pool_class(pool_name: str) -> type[AsyncAdaptedQueuePool]:
+    """
+    Класс пула, замеряющий время ожидания свободного соединения
+    """
+
+    class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                POOL_CHECKOUT_TIMEOUTS.inc(pool=pool_name)
+                raise
+            finally:
+                POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, pool=pool_name)
+
+    return TimedAsyncQueuePool
+
+
+def build_engine(url: str, pool_name: str) -> AsyncEngine:
+    """
+    Создание движка с параметрами пула и кэша подготовленных выражений из настроек
+    """
+    connect_args = {'statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE}
+    if settings.DB_PGBOUNCER_COMPAT:
+        connect_args['prepared_statement_name_func'] = lambda: f'__asyncpg_{uuid4()}__'
+    return create_async_engine(
+        f'{url}?prepared_statement_cache_size={settings.DB_PREPARED_STATEMENT_CACHE_SIZE}',
+        echo=settings.DB_ECHO,
+        poolclass=timed_pool_class(pool_name),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
 
 DATABASE_URL = get_db_url()
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = build_engine(DATABASE_URL, 'primary')
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+if settings.DB_REPLICA_HOST:
+    read_engine = build_engine(get_db_url(settings.DB_REPLICA_HOST, settings.DB_REPLICA_PORT), 'replica')
+else:
+    read_engine = engine
+read_session_maker = async_sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession)
+
+
+def pool_usage() -> dict[tuple, float]:
+    engines = {'primary': engine, 'replica': read_engine} if read_engine is not engine else {'primary': engine}
+    usage = {}
+    for name, db_engine in engines.items():
+        pool = db_engine.pool
+        capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        usage[(name, 'checked_out')] = pool.checkedout()
+        usage[(name, 'capacity')] = capacity
+        usage[(name, 'saturation')] = pool.checkedout() / capacity if capacity else 0
+    return usage
+
+
+registry.gauge('db_pool_usage', 'Использование пула соединений', labels=('pool', 'kind'), callback=pool_usage)
+
 
 class Base(AsyncAttrs, DeclarativeBase):
     """
@@ -27,3 +101,11 @@ class Base(AsyncAttrs, DeclarativeBase):
 async def get_session() -> AsyncSession:
     async with async_session_maker() as session:
         yield session
+
+
+async def get_read_session() -> AsyncSession:
+    """
+    Сессия для GET-эндпоинтов, работающая с репликой, если она настроена
+    """
+    async with read_session_maker() as session:
+        yield session
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from passlib.context import CryptContext
+
+from core.metrics import registry
+from core.settings import settings
+from schemas.exception_schemas import HashingOverloaded
+
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+
+PASSWORD_HASH_SECONDS = registry.histogram(
+    'password_hash_duration_seconds', 'Время операций с хэшем пароля', labels=('operation', 'stage'),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+class PasswordHasher:
+    """
+    Хэширование паролей в отдельном ограниченном пуле потоков, чтобы bcrypt не блокировал цикл событий.
+    bcrypt отпускает GIL, поэтому потоки выполняются параллельно.
+    Если в очереди больше max_pending задач, новые отклоняются с HashingOverloaded.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.hash_time_total = 0.0
+
+    def _timed(self, queued_at: float, func: Callable, *args) -> Any:
+        started = time.perf_counter()
+        wait = started - queued_at
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+        PASSWORD_HASH_SECONDS.observe(wait, operation=func.__name__, stage='queue')
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.hash_time_total += elapsed
+            PASSWORD_HASH_SECONDS.observe(elapsed, operation=func.__name__, stage='compute')
+
+    async def _run(self, func: Callable, *args) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingOverloaded('Сервис перегружен, повторите попытку позже')
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, time.perf_counter(), func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str | bytes) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str | bytes, password_hash: str) -> tuple[bool, str | None]:
+        """
+        Проверка пароля. Если схема или параметры хэша устарели, вторым элементом возвращается новый хэш
+        :param password:
+        :param password_hash:
+        :return: (совпадает ли пароль, новый хэш или None)
+        """
+        return await self._run(pwd_context.verify_and_update, password, password_hash)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'workers': self.workers,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'queue_wait_seconds_total': self.queue_wait_total,
+            'queue_wait_seconds_max': self.queue_wait_max,
+            'hash_seconds_total': self.hash_time_total,
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+registry.gauge(
+    'password_hasher_stats', 'Состояние пула хэширования паролей', labels=('kind',),
+    callback=lambda: {(key,): value for key, value in password_hasher.stats().items()},
+)
@@ -0,0 +1,110 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.metrics import registry
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP запроса', labels=('method', 'route')
+)
+REQUESTS = registry.counter('http_requests_total', 'Количество HTTP запросов', labels=('method', 'route', 'status'))
+QUERIES_PER_REQUEST = registry.histogram(
+    'http_request_db_queries', 'Количество SQL запросов на HTTP запрос', labels=('route',),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+QUERY_LATENCY = registry.histogram(
+    'db_query_duration_seconds', 'Время выполнения SQL запроса', labels=('route', 'operation')
+)
+SLOW_QUERIES = registry.counter('db_slow_queries_total', 'Количество медленных SQL запросов', labels=('route',))
+N_PLUS_ONE = registry.counter(
+    'http_request_query_limit_exceeded_total', 'Запросы, превысившие лимит SQL запросов (признак N+1)',
+    labels=('route',),
+)
+
+
+class RequestStats:
+    """
+    Статистика обрабатываемого HTTP запроса, доступная SQL хукам через contextvar
+    """
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get('route')
+        return getattr(route, 'path', 'unmatched')
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar('current_request', default=None)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: время обработки и код ответа по шаблону маршрута,
+    количество SQL запросов на запрос и предупреждение о вероятной проблеме N+1
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            route, method = stats.route, scope['method']
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method=method, route=route)
+            REQUESTS.inc(method=method, route=route, status=status)
+            QUERIES_PER_REQUEST.observe(stats.queries, route=route)
+            if stats.queries > settings.QUERY_COUNT_WARNING:
+                N_PLUS_ONE.inc(route=route)
+                logger.warning('%s %s выполнил %d SQL запросов (%.1f мс в базе), возможна проблема N+1',
+                               method, route, stats.queries, stats.db_time * 1000)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = current_request.get()
+    route = stats.route if stats else 'background'
+    if stats:
+        stats.queries += 1
+        stats.db_time += elapsed
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+    QUERY_LATENCY.observe(elapsed, route=route, operation=operation)
+    if elapsed * 1000 > settings.SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(route=route)
+        logger.warning('Медленный SQL запрос (%.1f мс) в %s: %s', elapsed * 1000, route, statement[:500])
+
+
+def install_query_hooks(*engines: AsyncEngine) -> None:
+    for engine in {id(engine): engine for engine in engines}.values():
+        event.listen(engine.sync_engine, 'before_cursor_execute', _before_execute)
+        event.listen(engine.sync_engine, 'after_cursor_execute', _after_execute)
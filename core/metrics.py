@@ -0,0 +1,136 @@
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self.values: dict[tuple, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.values[tuple(labels.get(name, '') for name in self.label_names)] += amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, _labels(self.label_names, key), value
+
+
+class Gauge(Counter):
+    """
+    Значение, вычисляемое при каждом сборе метрик функцией callback или задаваемое через set
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (),
+                 callback: Callable[[], float | dict[tuple, float]] | None = None):
+        super().__init__(name, description, labels)
+        self.callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        self.values[tuple(labels.get(name, '') for name in self.label_names)] = value
+
+    def samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            values = value if isinstance(value, dict) else {(): value}
+        else:
+            values = self.values
+        for key, value in values.items():
+            yield self.name, _labels(self.label_names, key), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self.buckets = buckets + (math.inf,)
+        self.counts: dict[tuple, list[int]] = {}
+        self.sums: dict[tuple, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        counts = self.counts.get(key)
+        if counts is None:
+            counts = self.counts[key] = [0] * len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self.sums[key] += value
+
+    def samples(self):
+        for key, counts in self.counts.items():
+            total = 0
+            for bound, count in zip(self.buckets, counts):
+                total += count
+                le = '+Inf' if bound == math.inf else repr(bound)
+                yield f'{self.name}_bucket', _labels(self.label_names + ('le',), key + (le,)), total
+            yield f'{self.name}_sum', _labels(self.label_names, key), self.sums[key]
+            yield f'{self.name}_count', _labels(self.label_names, key), total
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик приложения с выводом в текстовом формате Prometheus
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Iterable[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, description, labels, callback))
+
+    def histogram(self, name: str, description: str, labels: Iterable[str] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """
+    Замер времени выполнения блока кода в гистограмму
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
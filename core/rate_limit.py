@@ -0,0 +1,250 @@
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Protocol
+
+from core.metrics import registry
+from core.settings import settings
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+RATE_LIMIT_REJECTIONS = registry.counter(
+    'rate_limit_rejections_total', 'Запросы, отклонённые ограничителем частоты', labels=('rule',)
+)
+
+
+class TokenBuckets:
+    """
+    Корзины токенов в памяти процесса: ключ -> (токены, время пополнения, время полного восстановления).
+    Записи хранятся в порядке последнего обращения (LRU): при переполнении таблицы удаляется самая давняя
+    за O(1), без обхода всей таблицы. Полная корзина равносильна отсутствующей, поэтому заодно с начала
+    таблицы снимается не больше EXPIRED_SWEEP восстановившихся корзин - очистка распределена по вызовам.
+    """
+    EXPIRED_SWEEP = 2
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+
+    def take(self, key: str, capacity: float, rate: float, now: float | None = None) -> float:
+        """
+        Взять один токен из корзины key
+        :param key:
+        :param capacity: размер корзины
+        :param rate: пополнение, токенов в секунду
+        :param now: текущее время (time.monotonic)
+        :return: 0, если токен выдан, иначе через сколько секунд он появится
+        """
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        self._buckets.move_to_end(key)
+        self._evict(now)
+        return retry_after
+
+    def _evict(self, now: float) -> None:
+        for _ in range(self.EXPIRED_SWEEP):
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now:
+                break
+            del self._buckets[key]
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimitBackend(Protocol):
+    """
+    Общее для нескольких процессов хранилище корзин (например, Redis)
+    """
+
+    async def take(self, key: str, capacity: float, rate: float) -> float: ...
+
+
+class InMemoryRateLimitBackend:
+    """
+    Локальная замена общего хранилища для тестов и одиночного процесса
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.buckets = TokenBuckets(max_keys)
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        return self.buckets.take(key, capacity, rate)
+
+
+TAKE_TOKEN_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local capacity, rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then tokens = tokens - 1 else retry_after = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitBackend:
+    def __init__(self, url: str):
+        if redis_asyncio is None:
+            raise RuntimeError('Для RATE_LIMIT_URL необходим установленный пакет redis')
+        self.client = redis_asyncio.from_url(url)
+        self.script = self.client.register_script(TAKE_TOKEN_SCRIPT)
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        return float(await self.script(keys=[f'ratelimit:{key}'], args=[capacity, rate]))
+
+
+def build_backend() -> RateLimitBackend | None:
+    if not settings.RATE_LIMIT_URL:
+        return None
+    if settings.RATE_LIMIT_URL == 'memory://':
+        return InMemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+    return RedisRateLimitBackend(settings.RATE_LIMIT_URL)
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """
+    Правило ограничения: корзина на ключ, извлекаемый из запроса функцией key
+    (None - правило к запросу не применяется)
+    """
+    name: str
+    paths: frozenset[str]
+    key: Callable[[dict, dict | None], str | None]
+    capacity: float
+    per_minute: float
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60
+
+
+def client_ip(scope: dict, body: dict | None) -> str | None:
+    """
+    Адрес клиента - адрес TCP-соединения. X-Forwarded-For читается, только если перед приложением
+    стоят RATE_LIMIT_TRUSTED_PROXIES доверенных прокси: каждый из них дописывает адрес справа,
+    поэтому клиентом считается запись на столько позиций от правого края. Левые записи
+    задаёт сам клиент, им верить нельзя
+    :param scope:
+    :param body:
+    :return: адрес или None
+    """
+    proxies = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if proxies > 0:
+        forwarded = [
+            address.strip()
+            for name, value in scope['headers'] if name == b'x-forwarded-for'
+            for address in value.decode('latin-1').split(',')
+        ]
+        if len(forwarded) >= proxies and forwarded[-proxies]:
+            return forwarded[-proxies]
+    client = scope.get('client')
+    return client[0] if client else None
+
+
+def body_email(scope: dict, body: dict | None) -> str | None:
+    email = body.get('email') if isinstance(body, dict) else None
+    return email.strip().casefold() if isinstance(email, str) else None
+
+
+AUTH_PATHS = frozenset({'/api/auth/login', '/api/auth/reg'})
+MAX_PARSED_BODY = 64 * 1024
+
+
+def default_rules() -> list[RateLimitRule]:
+    return [
+        RateLimitRule('auth_ip', AUTH_PATHS, client_ip,
+                      settings.RATE_LIMIT_IP_CAPACITY, settings.RATE_LIMIT_IP_PER_MINUTE),
+        RateLimitRule('auth_email', AUTH_PATHS, body_email,
+                      settings.RATE_LIMIT_EMAIL_CAPACITY, settings.RATE_LIMIT_EMAIL_PER_MINUTE),
+    ]
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware ограничения частоты запросов по корзинам токенов.
+    Для путей из правил тело запроса читается заранее (JSON нужен для ключа по email) и затем
+    передаётся приложению без изменений. Лишние попытки получают 429 до запросов в базу и хеширования пароля.
+    """
+
+    def __init__(self, app, rules: list[RateLimitRule] | None = None, backend: RateLimitBackend | None = None):
+        self.app = app
+        self.rules = default_rules() if rules is None else rules
+        self.paths = frozenset().union(*(rule.paths for rule in self.rules))
+        self.backend = backend
+        self.buckets = TokenBuckets(settings.RATE_LIMIT_MAX_KEYS)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        messages, raw = [], b''
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message['type'] != 'http.request':
+                break
+            raw += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        try:
+            body = json.loads(raw) if raw and len(raw) <= MAX_PARSED_BODY else None
+        except ValueError:
+            body = None
+
+        for rule in self.rules:
+            if scope['path'] not in rule.paths:
+                continue
+            key = rule.key(scope, body)
+            if key is None:
+                continue
+            bucket_key = f'{rule.name}:{key}'
+            if self.backend is not None:
+                retry_after = await self.backend.take(bucket_key, rule.capacity, rule.rate)
+            else:
+                retry_after = self.buckets.take(bucket_key, rule.capacity, rule.rate)
+            if retry_after:
+                RATE_LIMIT_REJECTIONS.inc(rule=rule.name)
+                await self._reject(send, retry_after)
+                return
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+    @staticmethod
+    async def _reject(send, retry_after: float) -> None:
+        body = json.dumps({'detail': 'Слишком много попыток, повторите позже'}, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 429,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(max(int(retry_after + 0.999), 1)).encode()),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
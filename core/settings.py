@@ -1,4 +1,6 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
+import math
 import os
 
 
@@ -15,15 +17,85 @@ class Settings(BaseSettings):
     REFRESH_TOKEN_LIFETIME: int
     SECRET_KEY: str
     ALGORITHM: str
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    DB_PGBOUNCER_COMPAT: bool = False
+    DB_REPLICA_HOST: str | None = None
+    DB_REPLICA_PORT: str | None = None
+    SLOW_QUERY_MS: int = 200
+    QUERY_COUNT_WARNING: int = 20
+    BOOKING_HOLD_MINUTES: int = 15
+    HOLD_SWEEP_INTERVAL_SECONDS: int = 30
+    HOLD_SWEEP_BATCH_SIZE: int = 500
+    OUTBOX_SINK_URL: str | None = None
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_CONCURRENCY: int = 10
+    OUTBOX_SEND_TIMEOUT_SECONDS: float = 10
+    OUTBOX_LEASE_SECONDS: int = 180
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE_SECONDS: int = 5
+    OUTBOX_RETRY_MAX_SECONDS: int = 3600
+    OUTBOX_RETENTION_HOURS: int = 72
+    WEB_CONCURRENCY: int = 1
+    AVAILABILITY_SYNC_INTERVAL_SECONDS: int = 30
+    AVAILABILITY_SYNC_OVERLAP_SECONDS: int = 300
+    CALENDAR_WINDOW_DAYS: int = 548
+    CALENDAR_BATCH_SIZE: int = 1000
+    CALENDAR_ROLL_INTERVAL_HOURS: int = 24
+    CALENDAR_PARTITION_RETENTION_MONTHS: int = 13
+    CALENDAR_PARTITION_MONTHS_AHEAD: int = 2
+    CALENDAR_PARTITION_INTERVAL_HOURS: int = 24
+    STATS_RECONCILE_INTERVAL_HOURS: int = 6
+    STATS_RECONCILE_DAYS: int = 90
+    STATS_BATCH_SIZE: int = 500
+    EXPORT_BATCH_SIZE: int = 5000
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_URL: str | None = None
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_TRUSTED_PROXIES: int = 0
+    RATE_LIMIT_IP_CAPACITY: int = 20
+    RATE_LIMIT_IP_PER_MINUTE: int = 20
+    RATE_LIMIT_EMAIL_CAPACITY: int = 5
+    RATE_LIMIT_EMAIL_PER_MINUTE: int = 5
+    CACHE_URL: str | None = None
+    CACHE_MAX_ENTRIES: int = 10000
+    USER_CACHE_TTL: int = 60
+    TOKEN_VERSION_CACHE_TTL: int = 30
+    ROOM_CACHE_TTL: int = 300
+    PRICE_CACHE_TTL: int = 60
+    PRICE_CACHE_MAX_ROOMS: int = 10000
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
 
     model_config = SettingsConfigDict(
         env_file=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.env')
     )
 
+    @model_validator(mode="after")
+    def validate_outbox_lease(self):
+        """
+        Аренда события outbox должна пережить отправку всей пачки: пачка уходит волнами по OUTBOX_CONCURRENCY
+        событий, каждая волна - не дольше OUTBOX_SEND_TIMEOUT_SECONDS
+        :return:
+        """
+        waves = math.ceil(self.OUTBOX_BATCH_SIZE / self.OUTBOX_CONCURRENCY)
+        required = waves * self.OUTBOX_SEND_TIMEOUT_SECONDS
+        if self.OUTBOX_LEASE_SECONDS < required:
+            raise ValueError(f'OUTBOX_LEASE_SECONDS должен быть не меньше {math.ceil(required)} секунд '
+                             f'(OUTBOX_BATCH_SIZE / OUTBOX_CONCURRENCY * OUTBOX_SEND_TIMEOUT_SECONDS)')
+        return self
+
 
 settings = Settings()
 
 
-def get_db_url():
+def get_db_url(host: str | None = None, port: str | None = None):
     return (f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@"
-            f"{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
+            f"{host or settings.DB_HOST}:{port or settings.DB_PORT}/{settings.DB_NAME}")
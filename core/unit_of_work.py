@@ -0,0 +1,49 @@
+import inspect
+from typing import Any, Callable
+
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_session
+
+AFTER_COMMIT = 'after_commit'
+
+
+def on_commit(session: AsyncSession, callback: Callable[[], Any]) -> None:
+    """
+    Отложить действие (инвалидация кэша, обновление индексов в памяти) до успешного commit транзакции сессии.
+    Callback может быть как обычной, так и async функцией.
+    """
+    session.info.setdefault(AFTER_COMMIT, []).append(callback)
+
+
+class UnitOfWork:
+    """
+    Единица работы на запрос: репозитории только выполняют flush,
+    эндпоинт один раз вызывает commit в конце, после которого выполняются отложенные действия.
+    Незакоммиченная транзакция откатывается при выходе из зависимости.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def commit(self) -> None:
+        await self.session.commit()
+        callbacks = self.session.info.pop(AFTER_COMMIT, [])
+        for callback in callbacks:
+            result = callback()
+            if inspect.isawaitable(result):
+                await result
+
+    async def rollback(self) -> None:
+        self.session.info.pop(AFTER_COMMIT, None)
+        await self.session.rollback()
+
+
+async def get_uow(session: AsyncSession = Depends(get_session)) -> UnitOfWork:
+    uow = UnitOfWork(session)
+    try:
+        yield uow
+    finally:
+        if session.in_transaction():
+            await uow.rollback()
@@ -1,29 +1,97 @@
 import datetime
+import hashlib
+import math
+import time
+import uuid
 from typing import Any
 
-from fastapi import Cookie, Depends
+from fastapi import Cookie, Depends, HTTPException
 from jwt import InvalidTokenError
 from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.cache import TTLCache, MISSING, CacheBackend, cache_backend
 from core.database import get_session
+from core.metrics import registry, timed
 from core.settings import settings
 from jose import jwt, ExpiredSignatureError, JWTError
 from datetime import datetime as dt
 
-from repositories.user_repo import UserRepo
+from repositories.user_repo import CachedUserRepo, UserRepo
 from schemas.exception_schemas import UserNotFound
+from schemas.user_schemas import TokenUser
+from sql_enums import UserType
+
+
+class TokenRevocationStore:
+    """
+    Отзыв токенов.
+    Версия токенов пользователя хранится в users.token_version и увеличивается при смене пароля -
+    все ранее выданные токены становятся невалидными. Версия читается через кэш (UserRepo.get_token_version),
+    поэтому проверка не добавляет запрос в базу на каждый вызов API.
+    Отдельные токены (logout) попадают в denylist по jti до истечения их exp: в памяти процесса
+    и, если задан CACHE_URL, в общем хранилище, чтобы отзыв видели все процессы.
+    """
+
+    def __init__(self, backend: CacheBackend | None = None):
+        self.backend = backend
+        self._denied: dict[str, float] = {}
+
+    @staticmethod
+    def _key(jti: str) -> str:
+        return f'revoked_tokens:{jti}'
+
+    async def revoke(self, jti: str, exp: float) -> None:
+        now = time.time()
+        if len(self._denied) > 10000:
+            self._denied = {key: until for key, until in self._denied.items() if until > now}
+        self._denied[jti] = exp
+        if self.backend is not None and exp > now:
+            await self.backend.set(self._key(jti), b'1', math.ceil(exp - now))
+
+    async def is_denied(self, payload: dict[str, Any]) -> bool:
+        jti = payload.get('jti')
+        if jti is None:
+            return False
+        if self._denied.get(jti, 0) > time.time():
+            return True
+        return self.backend is not None and await self.backend.get(self._key(jti)) is not None
+
+    async def is_revoked(self, payload: dict[str, Any], session: AsyncSession) -> bool:
+        """
+        Токен отозван через logout или выдан до смены пароля
+        :param payload:
+        :param session: сессия для чтения версии токенов при промахе кэша
+        :return: bool
+        """
+        if await self.is_denied(payload):
+            return True
+        return payload.get('ver', 0) < await UserRepo(session).get_token_version(int(payload['sub']))
+
+
+JWT_SECONDS = registry.histogram(
+    'jwt_operation_duration_seconds', 'Время кодирования и декодирования JWT', labels=('operation',),
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+
+token_store = TokenRevocationStore(cache_backend)
+decoded_tokens = TTLCache(maxsize=settings.CACHE_MAX_ENTRIES, ttl=settings.ACCESS_TOKEN_LIFETIME * 60)
 
 
 def create_token(data: dict, token_type: str,
                  expires_delta: datetime.timedelta | None = None):
     to_encode = data.copy()
-    to_encode.update({'token_type': token_type})
+    to_encode.update({
+        'token_type': token_type,
+        'jti': uuid.uuid4().hex,
+    })
+    to_encode.setdefault('ver', 0)
     expire = datetime.datetime.utcnow() + (expires_delta or datetime.timedelta(
         minutes=settings.ACCESS_TOKEN_LIFETIME if token_type == 'access_token' else settings.REFRESH_TOKEN_LIFETIME
     ))
     to_encode.update({'exp': expire})
-    return jwt.encode(to_encode, settings.SECRET_KEY, settings.ALGORITHM)
+    with timed(JWT_SECONDS, operation='encode'):
+        return jwt.encode(to_encode, settings.SECRET_KEY, settings.ALGORITHM)
 
 
 def create_access_token(data: dict, expires_delta: datetime.timedelta | None = None):
@@ -41,7 +109,8 @@ def decode_access_token(token: str) -> dict[str, Any]:
     Бросает исключение, если токен просрочен или некорректный.
     """
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        with timed(JWT_SECONDS, operation='decode'):
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         exp = payload.get("exp")
         if exp is None:
             raise InvalidTokenError("Токен не содержит exp")
@@ -58,7 +127,8 @@ def decode_access_token(token: str) -> dict[str, Any]:
 
 def decode_refresh_token(token: str) -> dict[str, Any]:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        with timed(JWT_SECONDS, operation='decode'):
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         if payload.get('token_type') != 'refresh_token':
             raise ValueError("Неверный тип токена")
         exp = payload.get('exp')
@@ -71,8 +141,68 @@ def decode_refresh_token(token: str) -> dict[str, Any]:
         raise ValueError("Неверный refresh токен")
 
 
+async def revoke_token(token: str | None) -> None:
+    """
+    Отзыв токена (logout). Невалидные и просроченные токены игнорируются.
+    """
+    if not token:
+        return
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return
+    if payload.get('jti'):
+        await token_store.revoke(payload['jti'], payload['exp'])
+    decoded_tokens.delete(hashlib.sha256(token.encode()).digest())
+
+
+async def get_current_claims(access_token: str = Cookie(None),
+                             session: AsyncSession = Depends(get_session)) -> TokenUser:
+    """
+    Авторизация только по подписанным claims access токена, без запроса пользователя в базу.
+    Расшифрованные токены кэшируются по хэшу до истечения exp, отзыв проверяется на каждом запросе
+    по кэшированной версии токенов пользователя.
+    :param access_token:
+    :param session: сессия для чтения версии токенов при промахе кэша
+    :return: TokenUser
+    """
+    if not access_token:
+        raise UserNotFound('Токен отсутствует')
+    key = hashlib.sha256(access_token.encode()).digest()
+    payload = decoded_tokens.get(key)
+    if payload is MISSING:
+        try:
+            payload = decode_access_token(access_token)
+        except (JWTError, InvalidTokenError):
+            raise UserNotFound('Невалидный токен')
+        if payload.get('token_type') != 'access_token':
+            raise UserNotFound('Неверный тип токена')
+        decoded_tokens.set(key, payload, ttl=payload['exp'] - time.time())
+    elif payload['exp'] < time.time():
+        decoded_tokens.delete(key)
+        raise UserNotFound('Токен просрочен')
+
+    if await token_store.is_revoked(payload, session):
+        raise UserNotFound('Токен отозван')
+    try:
+        return TokenUser(id=int(payload['sub']), role=payload['role'])
+    except (KeyError, ValueError, ValidationError):
+        raise UserNotFound('Неверный токен')
+
+
+async def get_current_owner(user: TokenUser = Depends(get_current_claims)) -> TokenUser:
+    """
+    get_current_claims для разделов владельца: остальным ролям отвечает 403
+    :param user:
+    :return: TokenUser
+    """
+    if user.role not in (UserType.OWNER, UserType.OWNER_GUEST):
+        raise HTTPException(status_code=403, detail='Раздел доступен только владельцам')
+    return user
+
+
 async def get_current_user(access_token: str = Cookie(None), session: AsyncSession = Depends(get_session)):
-    user_repo = UserRepo(session)
+    user_repo = CachedUserRepo(session)
     if not access_token:
         raise UserNotFound('Токен отсутствует')
     try:
@@ -80,6 +210,8 @@ async def get_current_user(access_token: str = Cookie(None), session: AsyncSessi
         user_id: int = int(payload.get('sub'))
         if not user_id:
             raise UserNotFound('Неверный токен')
+        if await token_store.is_revoked(payload, session):
+            raise UserNotFound('Токен отозван')
         user = await user_repo.get_user_by_id(user_id)
         if not user:
             raise UserNotFound("Пользователь не найден")
@@ -1,7 +1,25 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from authx import AuthXConfig, AuthX
 from api.auth import router
-from core.database import engine, Base
+from api.bookings import bookings_router
+from api.exports import exports_router
+from api.owners import owners_router
+from api.rooms import rooms_router
+from api.users import users_router
+from core.database import engine, read_engine, Base, async_session_maker
+from core.instrumentation import MetricsMiddleware, install_query_hooks
+from core.rate_limit import RateLimitMiddleware, build_backend
+from core.metrics import registry
+from schemas.exception_schemas import UserNotFound
+from services.availability_index import start_availability_index, availability_sync_task
+from services.booking_service import hold_sweeper_task
+from services.calendar_service import calendar_roll_task
+from services.geo_index import geo_index
+from services.geocoder import geocoder
+from services.outbox_service import outbox_dispatch_task, outbox_purge_task
+from services.partition_service import calendar_partition_task, maintain_partitions
+from services.stats_service import stats_reconcile_task
 
 config = AuthXConfig()
 config.JWT_SECRET_KEY = 'SECRET_KEY'
@@ -10,11 +28,51 @@ config.JWT_TOKEN_LOCATION = ["cookies"]
 security = AuthX(config=config)
 
 app = FastAPI()
+app.add_middleware(RateLimitMiddleware, backend=build_backend())
+app.add_middleware(MetricsMiddleware)
+install_query_hooks(engine, read_engine)
 
 app.include_router(router, prefix='/api/auth')
+app.include_router(bookings_router, prefix='/api')
+app.include_router(rooms_router, prefix='/api')
+app.include_router(users_router, prefix='/api')
+app.include_router(owners_router, prefix='/api')
+app.include_router(exports_router, prefix='/api')
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
+
+
+@app.exception_handler(UserNotFound)
+async def user_not_found_handler(request: Request, exc: UserNotFound):
+    return JSONResponse(status_code=401, content={'detail': str(exc)})
 
 
 @app.on_event("startup")
 async def on_startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await maintain_partitions()
+    async with async_session_maker() as session:
+        await start_availability_index(session)
+        await geo_index.load(session)
+        await geocoder.load(session)
+    calendar_partition_task.start()
+    calendar_roll_task.start()
+    hold_sweeper_task.start()
+    stats_reconcile_task.start()
+    outbox_dispatch_task.start()
+    outbox_purge_task.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await availability_sync_task.stop()
+    await calendar_partition_task.stop()
+    await calendar_roll_task.stop()
+    await hold_sweeper_task.stop()
+    await stats_reconcile_task.stop()
+    await outbox_dispatch_task.stop()
+    await outbox_purge_task.stop()
@@ -1,12 +1,23 @@
 from datetime import datetime
 import datetime as dt
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, Enum, Index, Numeric, String
+from sqlalchemy import ForeignKey, Enum, Index, Numeric, String, Sequence, Computed, DDL, event, func, text
+from sqlalchemy.dialects.postgresql import TSVECTOR, JSONB
 from core.database import Base
 from sql_enums import PaymentStatus, UserType, BookingStatus, RoomStatus, RoomType, Currency
 from decimal import Decimal
 
 
+# Поисковый вектор комнаты: заголовок важнее описания, каждая часть разбирается русским и английским
+# словарями, чтобы находились словоформы на обоих языках
+ROOM_SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', title), 'A') || setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('russian', description), 'B') || setweight(to_tsvector('english', description), 'B')"
+)
+
+event.listen(Base.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+
+
 class User(Base):
     first_name: Mapped[str]
     second_name: Mapped[str]
@@ -16,14 +27,18 @@ class User(Base):
     user_type: Mapped[UserType] = mapped_column(Enum(UserType), index=True)
     is_verified: Mapped[bool] = mapped_column(default=False)
     verification_lvl: Mapped[int] = mapped_column(default=0)
+    # Версия токенов: увеличивается при смене пароля, токены с меньшей версией недействительны
+    token_version: Mapped[int] = mapped_column(default=0, server_default='0')
     guest_bookings: Mapped[list["Booking"]] = relationship(
         back_populates='guest',
-        foreign_keys='Booking.guest_id'
+        foreign_keys='Booking.guest_id',
+        lazy='raise_on_sql'
     )
 
     cancelled_bookings: Mapped[list["Booking"]] = relationship(
         back_populates='cancelled_by_user',
-        foreign_keys='Booking.cancelled_by'
+        foreign_keys='Booking.cancelled_by',
+        lazy='raise_on_sql'
     )
 
 
@@ -31,10 +46,14 @@ class Room(Base):
     owner_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), index=True)
     title: Mapped[str] = mapped_column(String(100))
     description: Mapped[str] = mapped_column(String(1000))
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, Computed(ROOM_SEARCH_VECTOR, persisted=True),
+                                               deferred=True)
 
     country: Mapped[str] = mapped_column(String(100))
     city: Mapped[str] = mapped_column(String(100))
     address: Mapped[str] = mapped_column(String(250))
+    latitude: Mapped[float | None]
+    longitude: Mapped[float | None]
 
     property_type: Mapped[RoomType] = mapped_column(Enum(RoomType), index=True)
 
@@ -56,12 +75,21 @@ class Room(Base):
     status: Mapped[RoomStatus] = mapped_column(Enum(RoomStatus), index=True, default=RoomStatus.ACTIVE)
     last_booked_at: Mapped[datetime | None] = mapped_column(index=True)
 
-    bookings: Mapped[list["Booking"]] = relationship(back_populates="property")
-    availability: Mapped[list["AvailabilityCalendar"]] = relationship(back_populates="room")
+    owner: Mapped["User"] = relationship(foreign_keys=[owner_id], lazy='raise_on_sql')
+    bookings: Mapped[list["Booking"]] = relationship(back_populates="property", lazy='raise_on_sql')
+    availability: Mapped[list["AvailabilityCalendar"]] = relationship(
+        back_populates="room",
+        order_by='AvailabilityCalendar.date',
+        lazy='raise_on_sql'
+    )
+
+
+booking_number_seq = Sequence('booking_number_seq', start=100000)
 
 
 class Booking(Base):
-    booking_number: Mapped[int] = mapped_column(unique=True, index=True)
+    booking_number: Mapped[int] = mapped_column(booking_number_seq, server_default=booking_number_seq.next_value(),
+                                                unique=True, index=True)
     property_id: Mapped[int] = mapped_column(ForeignKey('rooms.id', ondelete='CASCADE'), index=True)
     guest_id: Mapped[int] = mapped_column(ForeignKey('users.id'), index=True)
     guest_cnt: Mapped[int]
@@ -86,32 +114,215 @@ class Booking(Base):
 
     guest: Mapped["User"] = relationship(
         back_populates="guest_bookings",
-        foreign_keys=[guest_id]
+        foreign_keys=[guest_id],
+        lazy='raise_on_sql'
     )
 
     cancelled_by_user: Mapped["User"] = relationship(
         back_populates="cancelled_bookings",
-        foreign_keys=[cancelled_by]
+        foreign_keys=[cancelled_by],
+        lazy='raise_on_sql'
     )
-    property: Mapped[list["Room"]] = relationship(back_populates='bookings')
-    dates: Mapped[list["AvailabilityCalendar"]] = relationship(back_populates="booking")
+    property: Mapped[list["Room"]] = relationship(back_populates='bookings', lazy='raise_on_sql')
+    dates: Mapped[list["AvailabilityCalendar"]] = relationship(back_populates="booking", lazy='raise_on_sql')
 
 
 class AvailabilityCalendar(Base):
-    property_id: Mapped[int] = mapped_column(ForeignKey('rooms.id', ondelete='CASCADE'), index=True)
-    date: Mapped[dt.date] = mapped_column(index=True)
+    """
+    Календарь комнаты по дням. Таблица секционирована по месяцам (RANGE по date), поэтому date входит
+    в первичный ключ. Секции создаёт и отключает services.partition_service.
+    """
+    __table_args__ = {'postgresql_partition_by': 'RANGE (date)'}
+
+    property_id: Mapped[int] = mapped_column(ForeignKey('rooms.id', ondelete='CASCADE'))
+    date: Mapped[dt.date] = mapped_column(primary_key=True)
     price: Mapped[Decimal] = mapped_column(Numeric(10, 2))
-    booking_id: Mapped[int | None] = mapped_column(ForeignKey('bookings.id'), nullable=True)
+    booking_id: Mapped[int | None] = mapped_column(ForeignKey('bookings.id'), nullable=True, index=True)
     is_available: Mapped[bool] = mapped_column(default=True)
     is_blocked: Mapped[bool] = mapped_column(default=False)
     is_checked_out: Mapped[bool] = mapped_column(default=True)
-    room: Mapped["Room"] = relationship(back_populates="availability")
-    booking: Mapped["Booking"] = relationship(back_populates="dates")
+    room: Mapped["Room"] = relationship(back_populates="availability", lazy='raise_on_sql')
+    booking: Mapped["Booking"] = relationship(back_populates="dates", lazy='raise_on_sql')
+
+
+class RatePlan(Base):
+    """
+    Правило цены комнаты (сезон): на днях [date_from, date_to) с днём недели из маски weekdays
+    (бит isodow - 1) цена ночи равна price или базовой цене дня, умноженной на multiplier.
+    Из пересекающихся правил действует правило с большим priority. Правила компилируются
+    в AvailabilityCalendar.price, поэтому бронирование и расчёт стоимости читают готовые цены.
+    """
+    property_id: Mapped[int] = mapped_column(ForeignKey('rooms.id', ondelete='CASCADE'))
+    name: Mapped[str] = mapped_column(String(100))
+    date_from: Mapped[dt.date]
+    date_to: Mapped[dt.date]
+    weekdays: Mapped[int] = mapped_column(default=127)
+    price: Mapped[Decimal | None] = mapped_column(Numeric(10, 2))
+    multiplier: Mapped[Decimal | None] = mapped_column(Numeric(6, 4))
+    priority: Mapped[int] = mapped_column(default=0)
+
+
+class StayDiscount(Base):
+    """
+    Скидка за длительность проживания: percent процентов от стоимости ночей при брони от min_nights ночей.
+    Из подходящих скидок применяется наибольшая.
+    """
+    property_id: Mapped[int] = mapped_column(ForeignKey('rooms.id', ondelete='CASCADE'))
+    min_nights: Mapped[int]
+    percent: Mapped[Decimal] = mapped_column(Numeric(5, 2))
+
+
+class RoomDailyStat(Base):
+    """
+    Сводка по комнате за день для кабинета владельца. Обновляется инкрементально при изменении
+    брони и сверяется с бронированиями фоновой задачей.
+    """
+    owner_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'))
+    property_id: Mapped[int] = mapped_column(ForeignKey('rooms.id', ondelete='CASCADE'))
+    date: Mapped[dt.date]
+    booked_nights: Mapped[int] = mapped_column(default=0)
+    revenue: Mapped[Decimal] = mapped_column(Numeric(12, 2), default=0)
+    check_ins: Mapped[int] = mapped_column(default=0)
+    cancellations: Mapped[int] = mapped_column(default=0)
+
+
+class GeoPlace(Base):
+    """
+    Локальный справочник координат населённых пунктов для геокодирования комнат.
+    country и city хранятся в нормализованном виде (strip + casefold).
+    """
+    country: Mapped[str] = mapped_column(String(100))
+    city: Mapped[str] = mapped_column(String(100))
+    latitude: Mapped[float]
+    longitude: Mapped[float]
+
+
+class OutboxEvent(Base):
+    """
+    Исходящее событие (transactional outbox). Записывается в той же транзакции, что и изменение брони,
+    и доставляется во внешний приёмник фоновым services.outbox_service. available_at - время следующей
+    попытки, sent_at - время доставки, failed_at - время отказа после исчерпания попыток.
+    """
+    event_type: Mapped[str] = mapped_column(String(50))
+    aggregate_id: Mapped[int]
+    payload: Mapped[dict] = mapped_column(JSONB)
+    attempts: Mapped[int] = mapped_column(default=0)
+    available_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    sent_at: Mapped[datetime | None]
+    failed_at: Mapped[datetime | None]
+    last_error: Mapped[str | None] = mapped_column(String(500))
 
 
 Index(
     'ix_unique_room_date',
-    AvailabilityCalendar.date,
     AvailabilityCalendar.property_id,
+    AvailabilityCalendar.date,
+    unique=True
+)
+
+
+Index(
+    'ix_calendar_updated_at',
+    AvailabilityCalendar.updated_at
+)
+
+Index(
+    'ix_room_updated_at',
+    Room.updated_at
+)
+
+
+Index(
+    'ix_booking_hold_expiry',
+    Booking.payment_status,
+    Booking.expires_at
+)
+
+Index(
+    'ix_room_search_city',
+    Room.city,
+    Room.status,
+    Room.is_available,
+    Room.base_price,
+    Room.id
+)
+
+Index(
+    'ix_room_search_vector',
+    Room.search_vector,
+    postgresql_using='gin'
+)
+
+Index(
+    'ix_room_title_trgm',
+    Room.title,
+    postgresql_using='gin',
+    postgresql_ops={'title': 'gin_trgm_ops'}
+)
+
+Index(
+    'ix_room_search_country',
+    Room.country,
+    Room.status,
+    Room.is_available,
+    Room.base_price,
+    Room.id
+)
+
+Index(
+    'ix_unique_room_stat_date',
+    RoomDailyStat.property_id,
+    RoomDailyStat.date,
+    unique=True
+)
+
+Index(
+    'ix_room_stat_owner_date',
+    RoomDailyStat.owner_id,
+    RoomDailyStat.date
+)
+
+Index(
+    'ix_unique_geo_place',
+    GeoPlace.country,
+    GeoPlace.city,
     unique=True
 )
+
+Index(
+    'ix_rate_plan_room_dates',
+    RatePlan.property_id,
+    RatePlan.date_from,
+    RatePlan.date_to
+)
+
+Index(
+    'ix_rate_plan_name',
+    RatePlan.name
+)
+
+Index(
+    'ix_unique_stay_discount',
+    StayDiscount.property_id,
+    StayDiscount.min_nights,
+    unique=True
+)
+
+Index(
+    'ix_outbox_pending',
+    OutboxEvent.available_at,
+    OutboxEvent.id,
+    postgresql_where=text('sent_at IS NULL AND failed_at IS NULL')
+)
+
+Index(
+    'ix_outbox_aggregate',
+    OutboxEvent.aggregate_id,
+    OutboxEvent.id,
+    postgresql_where=text('sent_at IS NULL AND failed_at IS NULL')
+)
+
+Index(
+    'ix_outbox_sent_at',
+    OutboxEvent.sent_at
+)
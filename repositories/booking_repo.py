@@ -0,0 +1,240 @@
+import datetime as dt
+
+from sqlalchemy import select, update, insert, func, literal, false, or_, cast, Date, Select
+
+from models import Booking, AvailabilityCalendar, Room, StayDiscount
+from repositories.outbox_repo import OutboxRepo
+from repositories.stats_repo import RoomStatsRepo
+from sql_enums import BookingStatus, PaymentStatus, ACTIVE_BOOKING_STATUSES, BookingEvent
+
+
+BOOKING_EXPORT_COLUMNS = (
+    Booking.id, Booking.booking_number, Booking.property_id, Booking.guest_id, Booking.guest_cnt, Booking.status,
+    Booking.check_in, Booking.check_out, Booking.price_per_night, Booking.total_amount, Booking.currency,
+    Booking.payment_status, Booking.cancelled, Booking.cancelled_by, Booking.created_at,
+)
+
+
+class BookingRepo:
+    """
+    Репозиторий бронирований и привязанных к ним дней календаря.
+    Сводки владельцев (RoomDailyStat) и исходящие события (OutboxEvent) записываются в той же транзакции, что и брони.
+    """
+    model = Booking
+
+    def __init__(self, session):
+        self.session = session
+        self.stats = RoomStatsRepo(session)
+        self.outbox = OutboxRepo(session)
+
+    async def create_booking(self, room: Room, guest_id: int, guest_cnt: int,
+                             check_in: dt.date, check_out: dt.date, hold: dt.timedelta) -> Booking | None:
+        """
+        Захват ночей и создание бронирования одним запросом.
+        Сумма считается по ценам захваченных дней календаря за вычетом скидки за длительность (StayDiscount).
+        Свободные дни выбираются с FOR UPDATE SKIP LOCKED: при гонке за одни и те же ночи запрос не ждёт
+        чужую транзакцию, а видит меньше дней, чем ночей. Прошедшие дни не считаются свободными.
+        Если свободных дней меньше, чем ночей, id брони не выделяется и бронирование не создаётся.
+        :param room:
+        :param guest_id:
+        :param guest_cnt:
+        :param check_in:
+        :param check_out:
+        :param hold: время удержания неоплаченной брони
+        :return: Booking obj или None, если даты уже заняты
+        """
+        calendar = AvailabilityCalendar
+        columns = Booking.__table__.c
+        nights = (check_out - check_in).days
+
+        free_days = (
+            select(calendar.id)
+            .where(
+                calendar.property_id == room.id,
+                calendar.date >= check_in,
+                calendar.date >= func.current_date(),
+                calendar.date < check_out,
+                calendar.is_available,
+                ~calendar.is_blocked,
+                calendar.booking_id.is_(None),
+            )
+            .with_for_update(skip_locked=True)
+            .cte('free_days')
+        )
+        booking_id = (
+            select(func.nextval(func.pg_get_serial_sequence(Booking.__tablename__, 'id')).label('id'))
+            .where(select(func.count()).select_from(free_days).scalar_subquery() == nights)
+            .cte('new_booking_id')
+        )
+        claimed = (
+            update(calendar)
+            .where(
+                calendar.property_id == room.id,
+                calendar.date >= check_in,
+                calendar.date < check_out,
+                calendar.id.in_(select(free_days.c.id)),
+                select(booking_id.c.id).exists(),
+            )
+            .values(is_available=False, booking_id=select(booking_id.c.id).scalar_subquery())
+            .returning(calendar.price)
+            .cte('claimed')
+        )
+        nightly_total = func.sum(claimed.c.price)
+        discount_percent = func.coalesce(
+            select(func.max(StayDiscount.percent))
+            .where(StayDiscount.property_id == room.id, StayDiscount.min_nights <= nights)
+            .scalar_subquery(),
+            0,
+        )
+        discounted_total = nightly_total - func.round(nightly_total * discount_percent / 100, 2)
+        booking_row = (
+            select(
+                select(booking_id.c.id).scalar_subquery(),
+                literal(room.id),
+                literal(guest_id),
+                literal(guest_cnt),
+                literal(BookingStatus.CREATED, columns.status.type),
+                literal(dt.datetime.combine(check_in, dt.time.min), columns.check_in.type),
+                literal(dt.datetime.combine(check_out, dt.time.min), columns.check_out.type),
+                func.round(discounted_total / nights, 2),
+                discounted_total + room.cleaning_fee,
+                literal(room.currency.value),
+                literal(PaymentStatus.PENDING, columns.payment_status.type),
+                func.now() + hold,
+                false(),
+            )
+            .select_from(claimed)
+            .having(func.count() == nights)
+        )
+        booking = await self.session.scalars(
+            insert(self.model)
+            .from_select(
+                ['id', 'property_id', 'guest_id', 'guest_cnt', 'status', 'check_in', 'check_out',
+                 'price_per_night', 'total_amount', 'currency', 'payment_status', 'expires_at', 'cancelled'],
+                booking_row,
+            )
+            .returning(self.model)
+        )
+        booking = booking.one_or_none()
+        if booking is not None:
+            await self.stats.apply_bookings([booking.id], 1)
+            await self.outbox.add_booking_events(BookingEvent.CREATED, [booking.id])
+        return booking
+
+    async def cancel_booking(self, booking_id: int, user_id: int) -> Booking | None:
+        """
+        Отмена активной брони до даты заезда гостем или владельцем комнаты с освобождением её дней календаря
+        :param booking_id:
+        :param user_id: id гостя или владельца комнаты
+        :return: Booking obj или None, если бронь не найдена или не может быть отменена этим пользователем
+        """
+        calendar = AvailabilityCalendar
+        target = (
+            select(self.model.id, self.model.property_id, self.model.check_in, self.model.check_out)
+            .join(Room, Room.id == self.model.property_id)
+            .where(
+                self.model.id == booking_id,
+                self.model.status.in_(ACTIVE_BOOKING_STATUSES),
+                self.model.check_in > func.now(),
+                or_(self.model.guest_id == user_id, Room.owner_id == user_id),
+            )
+            .with_for_update(of=self.model)
+            .cte('target')
+        )
+        released_days = (
+            update(calendar)
+            .where(
+                calendar.booking_id == target.c.id,
+                calendar.property_id == target.c.property_id,
+                calendar.date >= cast(target.c.check_in, Date),
+                calendar.date < cast(target.c.check_out, Date),
+            )
+            .values(is_available=True, booking_id=None)
+            .returning(calendar.id)
+            .cte('released_days')
+        )
+        booking = await self.session.scalars(
+            update(self.model)
+            .where(self.model.id == target.c.id)
+            .values(status=BookingStatus.CANCELLED, cancelled=True, cancelled_by=user_id)
+            .returning(self.model)
+            .add_cte(released_days)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        booking = booking.one_or_none()
+        if booking is not None:
+            await self.stats.apply_bookings([booking.id], -1, cancelled=True)
+            await self.outbox.add_booking_events(BookingEvent.CANCELLED, [booking.id])
+        return booking
+
+    async def release_expired(self, limit: int):
+        """
+        Снятие просроченных неоплаченных броней пачкой не больше limit и освобождение их дней календаря.
+        Брони выбираются с SKIP LOCKED, поэтому несколько экземпляров приложения могут чистить их параллельно.
+        :param limit:
+        :return: строки (id, property_id, check_in, check_out, lag) с отставанием от expires_at в секундах
+        """
+        calendar = AvailabilityCalendar
+        expired = (
+            select(self.model.id, self.model.property_id, self.model.check_in, self.model.check_out,
+                   self.model.expires_at)
+            .where(
+                self.model.payment_status == PaymentStatus.PENDING,
+                self.model.expires_at < func.now(),
+                self.model.status == BookingStatus.CREATED,
+            )
+            .order_by(self.model.expires_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte('expired')
+        )
+        released_days = (
+            update(calendar)
+            .where(
+                calendar.booking_id == expired.c.id,
+                calendar.property_id == expired.c.property_id,
+                calendar.date >= cast(expired.c.check_in, Date),
+                calendar.date < cast(expired.c.check_out, Date),
+            )
+            .values(is_available=True, booking_id=None)
+            .returning(calendar.id)
+            .cte('released_days')
+        )
+        released = await self.session.execute(
+            update(self.model)
+            .where(self.model.id == expired.c.id)
+            .values(status=BookingStatus.EXPIRED, payment_status=PaymentStatus.FAILED)
+            .returning(
+                self.model.id,
+                self.model.property_id,
+                self.model.check_in,
+                self.model.check_out,
+                func.extract('epoch', func.now() - expired.c.expires_at),
+            )
+            .add_cte(released_days)
+            .execution_options(synchronize_session=False)
+        )
+        released = released.all()
+        await self.stats.apply_bookings([row[0] for row in released], -1)
+        await self.outbox.add_booking_events(BookingEvent.EXPIRED, [row[0] for row in released])
+        return released
+
+    @staticmethod
+    def export_query(owner_id: int | None = None, date_from: dt.date | None = None,
+                     date_to: dt.date | None = None) -> Select:
+        """
+        Запрос выгрузки бронирований (опционально комнат владельца и с заездом в [date_from, date_to)).
+        Возвращает только колонки, без ORM-объектов, в порядке id - для потокового чтения курсором.
+        :param owner_id:
+        :param date_from:
+        :param date_to:
+        :return: Select
+        """
+        query = select(*BOOKING_EXPORT_COLUMNS).order_by(Booking.id)
+        if owner_id is not None:
+            query = query.join(Room, Room.id == Booking.property_id).where(Room.owner_id == owner_id)
+        if date_from is not None:
+            query = query.where(Booking.check_in >= dt.datetime.combine(date_from, dt.time.min))
+        if date_to is not None:
+            query = query.where(Booking.check_in < dt.datetime.combine(date_to, dt.time.min))
+        return query
@@ -0,0 +1,234 @@
+import datetime as dt
+from collections import defaultdict
+
+from sqlalchemy import (select, update, func, case, cast, extract, true, false, exists, values, column, literal, any_,
+                        bindparam, Date, DateTime, Integer, Select)
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from sqlalchemy.orm import aliased
+
+from models import AvailabilityCalendar, Room, RatePlan
+
+WEEKEND_DAYS = (6, 7)
+CALENDAR_EXPORT_COLUMNS = (
+    AvailabilityCalendar.property_id, AvailabilityCalendar.date, AvailabilityCalendar.price,
+    AvailabilityCalendar.is_available, AvailabilityCalendar.is_blocked, AvailabilityCalendar.booking_id,
+)
+
+
+def default_price(day, base_price, weekend_multiplier):
+    """
+    Цена дня по тарифу комнаты: base_price, в выходные умноженная на weekend_multiplier
+    """
+    return case(
+        (extract('isodow', day).in_(WEEKEND_DAYS), func.round(base_price * weekend_multiplier, 2)),
+        else_=base_price,
+    )
+
+
+def plan_price(room_id, day, base_price, weekend_multiplier):
+    """
+    Цена дня с учётом правил цены (RatePlan): правило с наибольшим priority среди действующих в этот день,
+    при отсутствии правил - цена по тарифу. Выражение коррелирует с внешним запросом по room_id и day.
+    """
+    default = default_price(day, base_price, weekend_multiplier)
+    weekday_bit = literal(1).op('<<')(cast(extract('isodow', day), Integer) - 1)
+    plan = (
+        select(func.coalesce(RatePlan.price, func.round(default * RatePlan.multiplier, 2)))
+        .where(
+            RatePlan.property_id == room_id,
+            RatePlan.date_from <= day,
+            RatePlan.date_to > day,
+            RatePlan.weekdays.op('&')(weekday_bit) != 0,
+        )
+        .order_by(RatePlan.priority.desc(), RatePlan.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return func.coalesce(plan, default)
+
+
+class CalendarRepo:
+    """
+    Репозиторий календаря доступности комнат
+    """
+    model = AvailabilityCalendar
+
+    def __init__(self, session):
+        self.session = session
+
+    async def extend_calendars(self, room_ids: list[int], until: dt.date) -> dict[int, list[dt.date]]:
+        """
+        Достраивает календари комнат до даты until включительно одним INSERT ... SELECT.
+        Для каждой комнаты генерация начинается с дня после последней существующей даты (но не раньше сегодня),
+        цена дня - по правилам цены комнаты или по тарифу (plan_price).
+        :param room_ids:
+        :param until:
+        :return: словарь {id комнаты: список добавленных дат}
+        """
+        calendar = self.model
+        today = dt.date.today()
+        last_dates = (
+            select(calendar.property_id, func.max(calendar.date).label('last_date'))
+            .where(calendar.property_id.in_(room_ids))
+            .group_by(calendar.property_id)
+            .subquery()
+        )
+        first_day = func.greatest(func.coalesce(last_dates.c.last_date + 1, today), today)
+        days = (
+            select(
+                Room.id.label('property_id'),
+                Room.base_price,
+                Room.weekend_multiplier,
+                cast(func.generate_series(first_day, until, dt.timedelta(days=1)), Date).label('day'),
+            )
+            .outerjoin(last_dates, last_dates.c.property_id == Room.id)
+            .where(Room.id.in_(room_ids))
+            .subquery()
+        )
+        price = plan_price(days.c.property_id, days.c.day, days.c.base_price, days.c.weekend_multiplier)
+        inserted = await self.session.execute(
+            insert(calendar)
+            .from_select(
+                ['property_id', 'date', 'price', 'is_available', 'is_blocked', 'is_checked_out'],
+                select(days.c.property_id, days.c.day, price, true(), false(), true()),
+            )
+            .on_conflict_do_nothing(index_elements=['date', 'property_id'])
+            .returning(calendar.property_id, calendar.date)
+        )
+        new_dates = defaultdict(list)
+        for room_id, day in inserted:
+            new_dates[room_id].append(day)
+        return new_dates
+
+    async def apply_rate_plans(self, room_ids: list[int], date_from: dt.date, date_to: dt.date) -> dict[int, int]:
+        """
+        Перекомпиляция цен календаря комнат на [date_from, date_to) по правилам цены одним UPDATE ... FROM.
+        Новые цены считаются в подзапросе один раз на день, меняются только отличающиеся цены свободных
+        дней - цена проданной ночи уже зафиксирована в брони.
+        :param room_ids:
+        :param date_from:
+        :param date_to:
+        :return: {id комнаты: количество дней с изменённой ценой}
+        """
+        calendar = self.model
+        day = aliased(AvailabilityCalendar)
+        date_from = max(date_from, dt.date.today())
+        new_prices = (
+            select(day.id, day.date, plan_price(day.property_id, day.date, Room.base_price,
+                                                Room.weekend_multiplier).label('price'))
+            .join(Room, Room.id == day.property_id)
+            .where(
+                day.property_id == any_(bindparam('room_ids', room_ids, type_=ARRAY(Integer))),
+                day.date >= date_from,
+                day.date < date_to,
+                day.booking_id.is_(None),
+            )
+            .subquery('new_prices')
+        )
+        changed = await self.session.execute(
+            update(calendar)
+            .where(
+                calendar.id == new_prices.c.id,
+                calendar.date == new_prices.c.date,
+                calendar.date >= date_from,
+                calendar.date < date_to,
+                calendar.price != new_prices.c.price,
+            )
+            .values(price=new_prices.c.price)
+            .returning(calendar.property_id)
+        )
+        days_changed = defaultdict(int)
+        for room_id, in changed:
+            days_changed[room_id] += 1
+        return days_changed
+
+    @staticmethod
+    def export_query(owner_id: int | None = None, date_from: dt.date | None = None,
+                     date_to: dt.date | None = None) -> Select:
+        """
+        Запрос выгрузки календарей (опционально комнат владельца и за [date_from, date_to)).
+        Порядок (property_id, date) совпадает с уникальным индексом секций, поэтому сортировки в базе нет.
+        :param owner_id:
+        :param date_from:
+        :param date_to:
+        :return: Select
+        """
+        calendar = AvailabilityCalendar
+        query = select(*CALENDAR_EXPORT_COLUMNS).order_by(calendar.property_id, calendar.date)
+        if owner_id is not None:
+            query = query.join(Room, Room.id == calendar.property_id).where(Room.owner_id == owner_id)
+        if date_from is not None:
+            query = query.where(calendar.date >= date_from)
+        if date_to is not None:
+            query = query.where(calendar.date < date_to)
+        return query
+
+    async def feed_version(self, room_id: int, date_from: dt.date):
+        """
+        Версия календаря комнаты начиная с date_from для условных запросов (ETag/Last-Modified).
+        updated_at хранится без зоны во времени сессии (now()), поэтому переводится в UTC на стороне базы
+        :param room_id:
+        :param date_from:
+        :return: (время последнего изменения в UTC без зоны, количество дней)
+        """
+        calendar = self.model
+        updated_at_utc = func.timezone('UTC', cast(calendar.updated_at, DateTime(timezone=True)))
+        version = await self.session.execute(
+            select(func.max(updated_at_utc), func.count())
+            .where(calendar.property_id == room_id, calendar.date >= date_from)
+        )
+        return version.one()
+
+    async def busy_ranges(self, room_id: int, date_from: dt.date):
+        """
+        Непрерывные диапазоны недоступных дней (бронь или блокировка) начиная с date_from.
+        Соседние дни склеиваются через date - row_number() (gaps and islands) на стороне базы.
+        :param room_id:
+        :param date_from:
+        :return: строки (start, end, booked), end не включается
+        """
+        calendar = self.model
+        busy = (
+            select(
+                calendar.date,
+                calendar.booking_id,
+                (calendar.date - cast(func.row_number().over(order_by=calendar.date), Integer)).label('grp'),
+            )
+            .where(
+                calendar.property_id == room_id,
+                calendar.date >= date_from,
+                ~(calendar.is_available & ~calendar.is_blocked & calendar.booking_id.is_(None)),
+            )
+            .subquery()
+        )
+        ranges = await self.session.execute(
+            select(func.min(busy.c.date), func.max(busy.c.date) + 1, func.bool_or(busy.c.booking_id.is_not(None)))
+            .group_by(busy.c.grp)
+            .order_by(func.min(busy.c.date))
+        )
+        return ranges.all()
+
+    async def apply_blocked_ranges(self, room_id: int, ranges: list[tuple[dt.date, dt.date]], date_from: dt.date):
+        """
+        Синхронизация блокировок комнаты с внешним календарём одним UPDATE:
+        с date_from is_blocked = true ровно для дней, попадающих в ranges, остальные блокировки снимаются.
+        Изменяются только дни, у которых флаг действительно меняется, поэтому достаточно его инвертировать.
+        :param room_id:
+        :param ranges: список (start, end), end не включается
+        :param date_from:
+        :return: изменённые строки (date, is_blocked, is_free)
+        """
+        calendar = self.model
+        if ranges:
+            external = values(column('start', Date), column('end', Date), name='external').data(ranges)
+            blocked = exists().where(calendar.date >= external.c.start, calendar.date < external.c.end)
+        else:
+            blocked = false()
+        changed = await self.session.execute(
+            update(calendar)
+            .where(calendar.property_id == room_id, calendar.date >= date_from, calendar.is_blocked != blocked)
+            .values(is_blocked=~calendar.is_blocked)
+            .returning(calendar.date, calendar.is_blocked, calendar.is_available & calendar.booking_id.is_(None))
+            .execution_options(synchronize_session=False)
+        )
+        return changed.all()
@@ -0,0 +1,156 @@
+import datetime as dt
+from typing import Sequence
+
+from sqlalchemy import (select, insert, update, delete, func, literal, any_, bindparam, values, column, case, Integer,
+                        String)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import aliased
+
+from models import OutboxEvent, Booking
+from sql_enums import BookingEvent
+
+BOOKING_PAYLOAD = func.jsonb_build_object(
+    'booking_id', Booking.id,
+    'booking_number', Booking.booking_number,
+    'property_id', Booking.property_id,
+    'guest_id', Booking.guest_id,
+    'guest_cnt', Booking.guest_cnt,
+    'status', Booking.status,
+    'payment_status', Booking.payment_status,
+    'check_in', Booking.check_in,
+    'check_out', Booking.check_out,
+    'total_amount', Booking.total_amount,
+    'currency', Booking.currency,
+    'cancelled_by', Booking.cancelled_by,
+)
+
+
+class OutboxRepo:
+    """
+    Репозиторий исходящих событий. События пишутся в транзакции вызывающего кода,
+    доставкой занимается services.outbox_service.
+    """
+    model = OutboxEvent
+
+    def __init__(self, session):
+        self.session = session
+
+    async def add_booking_events(self, event: BookingEvent, booking_ids: Sequence[int]) -> None:
+        """
+        События по броням одним INSERT ... SELECT: снимок брони берётся из строки bookings
+        в текущей транзакции
+        :param event:
+        :param booking_ids:
+        :return: None
+        """
+        if not booking_ids:
+            return
+        await self.session.execute(
+            insert(self.model).from_select(
+                ['event_type', 'aggregate_id', 'payload'],
+                select(literal(event.value), Booking.id, BOOKING_PAYLOAD)
+                .where(Booking.id == any_(bindparam('booking_ids', list(booking_ids), type_=ARRAY(Integer))))
+                .order_by(Booking.id),
+            )
+        )
+
+    async def claim(self, limit: int, lease: dt.timedelta):
+        """
+        Захват пачки событий, готовых к отправке. Строки выбираются с FOR UPDATE SKIP LOCKED,
+        attempts увеличивается, а available_at сдвигается на lease: пока событие отправляется,
+        его не возьмёт другой экземпляр, а если процесс упадёт, событие вернётся в очередь.
+        Событие не берётся, пока не доставлено более раннее событие той же брони,
+        поэтому события одной брони доставляются по порядку.
+        :param limit:
+        :param lease:
+        :return: строки (id, event_type, aggregate_id, payload, attempts, created_at)
+        """
+        outbox = self.model
+        earlier = aliased(OutboxEvent)
+        ready = (
+            select(outbox.id)
+            .where(
+                outbox.sent_at.is_(None),
+                outbox.failed_at.is_(None),
+                outbox.available_at <= func.now(),
+                ~select(earlier.id).where(
+                    earlier.aggregate_id == outbox.aggregate_id,
+                    earlier.id < outbox.id,
+                    earlier.sent_at.is_(None),
+                    earlier.failed_at.is_(None),
+                ).exists(),
+            )
+            .order_by(outbox.available_at, outbox.id)
+            .limit(limit)
+            .with_for_update(of=outbox, skip_locked=True)
+            .cte('ready')
+        )
+        claimed = await self.session.execute(
+            update(outbox)
+            .where(outbox.id == ready.c.id)
+            .values(attempts=outbox.attempts + 1, available_at=func.now() + lease)
+            .returning(outbox.id, outbox.event_type, outbox.aggregate_id, outbox.payload, outbox.attempts,
+                       outbox.created_at)
+            .execution_options(synchronize_session=False)
+        )
+        return sorted(claimed.all(), key=lambda row: row.id)
+
+    async def mark_sent(self, claimed: list[tuple[int, int]]) -> int:
+        """
+        Отметка доставки одним UPDATE ... FROM (VALUES ...). Событие отмечается, только если аренда
+        ещё наша: attempts не изменился с захвата. Если аренда истекла и событие захватил другой экземпляр,
+        строка не меняется
+        :param claimed: список (id события, attempts при захвате)
+        :return: количество отмеченных событий
+        """
+        if not claimed:
+            return 0
+        outbox = self.model
+        sent = values(column('id', Integer), column('attempts', Integer), name='sent').data(claimed)
+        marked = await self.session.execute(
+            update(outbox)
+            .where(outbox.id == sent.c.id, outbox.attempts == sent.c.attempts, outbox.sent_at.is_(None))
+            .values(sent_at=func.now(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+        return marked.rowcount
+
+    async def mark_failed(self, failures: list[tuple[int, int, str, int | None]]) -> int:
+        """
+        Ошибки доставки одним UPDATE ... FROM (VALUES ...): событие откладывается на delay секунд
+        или, если delay не задан, помечается окончательно неотправленным. Как и в mark_sent,
+        меняются только события, аренда которых ещё наша
+        :param failures: список (id события, attempts при захвате, текст ошибки, delay)
+        :return: количество изменённых событий
+        """
+        if not failures:
+            return 0
+        outbox = self.model
+        errors = values(
+            column('id', Integer), column('attempts', Integer), column('error', String), column('delay', Integer),
+            name='errors',
+        ).data(failures)
+        marked = await self.session.execute(
+            update(outbox)
+            .where(outbox.id == errors.c.id, outbox.attempts == errors.c.attempts, outbox.sent_at.is_(None))
+            .values(
+                last_error=errors.c.error,
+                available_at=func.coalesce(func.now() + errors.c.delay * literal(dt.timedelta(seconds=1)),
+                                           outbox.available_at),
+                failed_at=case((errors.c.delay.is_(None), func.now())),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return marked.rowcount
+
+    async def purge_sent(self, older_than: dt.timedelta, limit: int) -> int:
+        """
+        Удаление доставленных событий старше older_than, не больше limit за запрос
+        :param older_than:
+        :param limit:
+        :return: количество удалённых событий
+        """
+        outbox = self.model
+        stale = select(outbox.id).where(outbox.sent_at < func.now() - older_than).limit(limit)
+        deleted = await self.session.scalars(delete(outbox).where(outbox.id.in_(stale)).returning(outbox.id))
+        return len(deleted.all())
@@ -0,0 +1,111 @@
+import datetime as dt
+
+from sqlalchemy import select, delete, insert, func, literal, true, any_, bindparam, values, column, Integer, Numeric
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from models import RatePlan, StayDiscount, Room
+from schemas.rate_schemas import SeasonUpdate, StayDiscountItem, weekdays_mask
+
+
+class RateRepo:
+    """
+    Репозиторий правил цены и скидок за длительность. Все изменения делаются пачкой на набор комнат владельца:
+    комнаты других владельцев в запросы не попадают.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    @staticmethod
+    def _owned_rooms(owner_id: int, room_ids: list[int]):
+        return select(Room.id).where(
+            Room.owner_id == owner_id,
+            Room.id == any_(bindparam('room_ids', room_ids, type_=ARRAY(Integer))),
+        )
+
+    async def owned_room_ids(self, owner_id: int, room_ids: list[int]) -> set[int]:
+        return set(await self.session.scalars(self._owned_rooms(owner_id, room_ids)))
+
+    async def get_plans(self, owner_id: int, room_id: int | None = None) -> list[RatePlan]:
+        query = (
+            select(RatePlan)
+            .join(Room, Room.id == RatePlan.property_id)
+            .where(Room.owner_id == owner_id)
+            .order_by(RatePlan.property_id, RatePlan.date_from, RatePlan.id)
+        )
+        if room_id is not None:
+            query = query.where(RatePlan.property_id == room_id)
+        return list(await self.session.scalars(query))
+
+    async def delete_season(self, owner_id: int, name: str) -> list[tuple[int, dt.date, dt.date]]:
+        """
+        Удаление сезона name со всех комнат владельца одним DELETE
+        :param owner_id:
+        :param name:
+        :return: список (id комнаты, date_from, date_to) удалённых правил
+        """
+        deleted = await self.session.execute(
+            delete(RatePlan)
+            .where(
+                RatePlan.name == name,
+                RatePlan.property_id.in_(select(Room.id).where(Room.owner_id == owner_id)),
+            )
+            .returning(RatePlan.property_id, RatePlan.date_from, RatePlan.date_to)
+        )
+        return [tuple(row) for row in deleted]
+
+    async def insert_season(self, owner_id: int, name: str, season: SeasonUpdate) -> list[int]:
+        """
+        Сезон на все комнаты season.room_ids владельца одним INSERT ... SELECT
+        :param owner_id:
+        :param name:
+        :param season:
+        :return: id комнат, получивших правило
+        """
+        rooms = self._owned_rooms(owner_id, season.room_ids).subquery()
+        inserted = await self.session.scalars(
+            insert(RatePlan)
+            .from_select(
+                ['property_id', 'name', 'date_from', 'date_to', 'weekdays', 'price', 'multiplier', 'priority'],
+                select(
+                    rooms.c.id,
+                    literal(name),
+                    literal(season.date_from),
+                    literal(season.date_to),
+                    literal(weekdays_mask(season.weekdays)),
+                    literal(season.price, RatePlan.price.type),
+                    literal(season.multiplier, RatePlan.multiplier.type),
+                    literal(season.priority),
+                ),
+            )
+            .returning(RatePlan.property_id)
+        )
+        return list(inserted)
+
+    async def replace_discounts(self, owner_id: int, room_ids: list[int],
+                                discounts: list[StayDiscountItem]) -> list[int]:
+        """
+        Замена скидок за длительность на комнатах владельца: DELETE и один INSERT ... SELECT
+        (комнаты x список скидок)
+        :param owner_id:
+        :param room_ids:
+        :param discounts:
+        :return: id комнат владельца из room_ids
+        """
+        owned = sorted(await self.owned_room_ids(owner_id, room_ids))
+        if not owned:
+            return []
+        owned_ids = bindparam('owned_ids', owned, type_=ARRAY(Integer))
+        await self.session.execute(delete(StayDiscount).where(StayDiscount.property_id == any_(owned_ids)))
+        if discounts:
+            rooms = select(func.unnest(owned_ids).label('id')).subquery('rooms')
+            items = values(column('min_nights', Integer), column('percent', Numeric(5, 2)), name='items').data(
+                [(item.min_nights, item.percent) for item in discounts]
+            )
+            await self.session.execute(
+                insert(StayDiscount).from_select(
+                    ['property_id', 'min_nights', 'percent'],
+                    select(rooms.c.id, items.c.min_nights, items.c.percent).select_from(rooms).join(items, true()),
+                )
+            )
+        return owned
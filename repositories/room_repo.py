@@ -1,32 +1,341 @@
-from sqlalchemy import select, delete
-from models import Room
-from schemas.room_schemas import RoomCreate, RoomUpdate
+import datetime as dt
+import re
+from decimal import Decimal
+
+from sqlalchemy import (select, delete, insert, update, tuple_, any_, bindparam, values, column, Integer, Float, func,
+                        or_, and_, cast, literal, case, Boolean)
+from sqlalchemy.dialects.postgresql import ARRAY, TSQUERY
+from sqlalchemy.orm import joinedload, selectinload, raiseload, load_only
+
+from core.cache import ReadThroughCache, cache_backend, snapshot, restore
+from core.settings import settings
+from core.unit_of_work import on_commit
+from models import Room, User, AvailabilityCalendar, Booking
+from schemas.room_schemas import RoomCreate, RoomUpdate, RoomSearchParams, RoomFilters, RoomBatchUpdateItem
+from sql_enums import RoomStatus, ACTIVE_BOOKING_STATUSES
+
+ROOM_CARD_COLUMNS = (
+    Room.id, Room.title, Room.country, Room.city, Room.property_type,
+    Room.guests_cnt, Room.bedrooms, Room.beds, Room.base_price, Room.currency, Room.latitude, Room.longitude,
+)
+ROOM_INDEX_COLUMNS = (Room.id, Room.city, Room.status, Room.is_available, Room.latitude, Room.longitude)
+
+SEARCH_WORD = re.compile(r'[^\W_]+')
+MAX_SEARCH_WORDS = 8
+
+room_cache = ReadThroughCache('rooms', ttl=settings.ROOM_CACHE_TTL, maxsize=settings.CACHE_MAX_ENTRIES,
+                              backend=cache_backend)
+
+
+def prefix_tsquery(text: str) -> str | None:
+    """
+    Запрос to_tsquery из слов строки поиска: все слова длиннее одного символа обязательны, каждое - как префикс,
+    чтобы находились недописанные слова. В запрос попадают только буквы и цифры, поэтому
+    пользовательский ввод не может нарушить синтаксис tsquery
+    :param text:
+    :return: строка tsquery или None, если слов нет
+    """
+    words = [word for word in SEARCH_WORD.findall(text.casefold()) if len(word) > 1][:MAX_SEARCH_WORDS]
+    return ' & '.join(f'{word}:*' for word in words) or None
+
+
+def text_search(text: str) -> tuple:
+    """
+    Условие и ранг полнотекстового поиска по комнатам. Совпадение - префиксы слов в поисковом векторе
+    (русская и английская морфология, индекс ix_room_search_vector) или похожесть строки на слова заголовка
+    по триграммам (опечатки, индекс ix_room_title_trgm, порог pg_trgm.word_similarity_threshold)
+    :param text:
+    :return: (условие WHERE, выражение ранга)
+    """
+    query = literal(text)
+    similar = query.bool_op('<%')(Room.title)
+    rank = func.word_similarity(query, Room.title)
+    words = prefix_tsquery(text)
+    if words is None:
+        return similar, cast(rank, Float)
+    tsquery = func.to_tsquery('russian', words).op('||', return_type=TSQUERY)(func.to_tsquery('english', words))
+    return (
+        or_(Room.search_vector.bool_op('@@')(tsquery), similar),
+        cast(func.ts_rank_cd(Room.search_vector, tsquery) + rank, Float),
+    )
 
 
 class RoomRepo:
+    """
+    Репозиторий комнат. Связи моделей объявлены с lazy='raise_on_sql', поэтому всё, что нужно
+    странице, загружается явно через пресеты опций загрузки ниже.
+    """
     model = Room
 
     def __init__(self, session):
         self.session = session
 
+    @staticmethod
+    def detail_options(date_from: dt.date, date_to: dt.date) -> tuple:
+        """
+        Пресет для страницы комнаты: владелец в том же запросе (JOIN), дни календаря
+        [date_from, date_to) вторым запросом (SELECT ... IN), остальные связи запрещены
+        :param date_from:
+        :param date_to:
+        :return: tuple of loader options
+        """
+        calendar = AvailabilityCalendar
+        return (
+            joinedload(Room.owner, innerjoin=True).load_only(
+                User.first_name, User.second_name, User.is_verified, User.verification_lvl, raiseload=True
+            ),
+            selectinload(Room.availability.and_(calendar.date >= date_from, calendar.date < date_to)).load_only(
+                calendar.date, calendar.price, calendar.is_available, calendar.is_blocked, raiseload=True
+            ),
+            raiseload('*'),
+        )
+
     async def create_room(self, user_id: int, room_data: RoomCreate) -> model:
-        new_instance = self.model(owner_id=user_id, **room_data.model_dump())
-        self.session.add(new_instance)
-        await self.session.commit()
-        await self.session.refresh(new_instance)
-        return new_instance
+        new_instance = await self.session.scalars(
+            insert(self.model).values(owner_id=user_id, **room_data.model_dump()).returning(self.model)
+        )
+        return new_instance.one()
 
     async def get_room_by_id(self, room_id: int) -> model:
-        room = self.session.execute(
+        room = await self.session.execute(
             select(Room).where(Room.id == room_id)
         )
         return room.scalar_one_or_none()
 
+    async def get_room_detail(self, room_id: int, days: int) -> Room | None:
+        """
+        Комната с владельцем и календарём на days дней вперёд - ровно два запроса
+        :param room_id:
+        :param days:
+        :return: Room obj или None
+        """
+        today = dt.date.today()
+        room = await self.session.execute(
+            select(Room)
+            .where(Room.id == room_id)
+            .options(*self.detail_options(today, today + dt.timedelta(days=days)))
+            .execution_options(populate_existing=True)
+        )
+        return room.unique().scalar_one_or_none()
+
+    @staticmethod
+    def free_for_stay(check_in: dt.date, check_out: dt.date):
+        """
+        Условие: все ночи [check_in, check_out) комнаты свободны по календарю (как при бронировании)
+        :param check_in:
+        :param check_out:
+        :return: условие WHERE
+        """
+        calendar = AvailabilityCalendar
+        free_days = (
+            select(func.count())
+            .where(
+                calendar.property_id == Room.id,
+                calendar.date >= check_in,
+                calendar.date >= func.current_date(),
+                calendar.date < check_out,
+                calendar.is_available,
+                ~calendar.is_blocked,
+                calendar.booking_id.is_(None),
+            )
+            .scalar_subquery()
+        )
+        return free_days == (check_out - check_in).days
+
+    @classmethod
+    def search_filters(cls, params: RoomFilters) -> list:
+        """
+        Условия выдачи, общие для поиска по городу и по карте: активные комнаты и фильтры params.
+        Свободные даты проверяются по календарю (free_for_stay) всегда: индекс доступности в памяти
+        процесса только сужает кандидатов и не видит брони других процессов
+        :param params:
+        :return: список условий WHERE
+        """
+        filters = [Room.status == RoomStatus.ACTIVE, Room.is_available]
+        if params.property_type:
+            filters.append(Room.property_type == params.property_type)
+        if params.guests_cnt:
+            filters.append(Room.guests_cnt >= params.guests_cnt)
+        if params.min_price is not None:
+            filters.append(Room.base_price >= params.min_price)
+        if params.max_price is not None:
+            filters.append(Room.base_price <= params.max_price)
+        if params.q:
+            filters.append(text_search(params.q)[0])
+        if params.check_in:
+            filters.append(cls.free_for_stay(params.check_in, params.check_out))
+        return filters
+
+    def search_query(self, params: RoomSearchParams, after: tuple[Decimal, int] | None = None,
+                     room_ids: list[int] | None = None):
+        """
+        Запрос поиска активных комнат для карточек выдачи.
+        Выбираются только колонки карточки, страницы листаются по ключу без OFFSET:
+        (base_price, id), а при текстовом запросе q - (rank по убыванию, id).
+        :param params: фильтры поиска
+        :param after: ключ последней карточки предыдущей страницы
+        :param room_ids: ограничение по id (свободные на даты комнаты)
+        :return: Select с колонками ROOM_CARD_COLUMNS и rank
+        """
+        if params.q:
+            rank = text_search(params.q)[1]
+            order_by = (rank.desc(), Room.id)
+        else:
+            rank = literal(None, Float)
+            order_by = (Room.base_price, Room.id)
+
+        query = select(*ROOM_CARD_COLUMNS, rank.label('rank')).where(*self.search_filters(params))
+        if params.city:
+            query = query.where(Room.city == params.city)
+        if params.country:
+            query = query.where(Room.country == params.country)
+        if room_ids is not None:
+            query = query.where(Room.id == any_(bindparam('room_ids', room_ids, type_=ARRAY(Integer))))
+        if after is not None and params.q:
+            query = query.where(or_(rank < float(after[0]), and_(rank == float(after[0]), Room.id > after[1])))
+        elif after is not None:
+            query = query.where(tuple_(Room.base_price, Room.id) > tuple_(*after))
+        return query.order_by(*order_by).limit(params.limit)
+
+    async def search_rooms(self, params: RoomSearchParams, after: tuple[Decimal, int] | None = None,
+                           room_ids: list[int] | None = None):
+        """
+        Поиск активных комнат, см. search_query
+        :return: список строк с колонками ROOM_CARD_COLUMNS и rank
+        """
+        rooms = await self.session.execute(self.search_query(params, after, room_ids))
+        return rooms.all()
+
+    async def get_room_cards(self, room_ids: list[int], params: RoomFilters):
+        """
+        Карточки комнат из room_ids, прошедших фильтры params, в произвольном порядке
+        :param room_ids:
+        :param params:
+        :return: список строк с колонками ROOM_CARD_COLUMNS
+        """
+        rooms = await self.session.execute(
+            select(*ROOM_CARD_COLUMNS).where(
+                Room.id == any_(bindparam('room_ids', room_ids, type_=ARRAY(Integer))),
+                *self.search_filters(params),
+            )
+        )
+        return rooms.all()
+
     async def update_room_info(self, room_id: int, room_data: RoomUpdate):
-        pass
+        changes = room_data.changes()
+        if changes:
+            await self.session.execute(update(Room).where(Room.id == room_id).values(**changes))
+        on_commit(self.session, lambda: room_cache.invalidate(room_id))
 
     async def delete_room(self, room_id: int):
         await self.session.execute(
             delete(Room).where(Room.id == room_id)
         )
-        await self.session.commit()
+        on_commit(self.session, lambda: room_cache.invalidate(room_id))
+
+    async def create_rooms(self, owner_id: int, rooms: list[RoomCreate]):
+        """
+        Пакетное создание комнат многострочным INSERT ... VALUES
+        :param owner_id:
+        :param rooms:
+        :return: строки ROOM_INDEX_COLUMNS в порядке rooms
+        """
+        if not rooms:
+            return []
+        created = await self.session.execute(
+            insert(self.model).returning(*ROOM_INDEX_COLUMNS, sort_by_parameter_order=True),
+            [{'owner_id': owner_id, **room.model_dump()} for room in rooms],
+        )
+        return created.all()
+
+    async def get_owned_rooms(self, owner_id: int, room_ids: list[int]) -> dict:
+        """
+        Комнаты владельца из room_ids с полями, нужными для проверки пакетных изменений
+        :param owner_id:
+        :param room_ids:
+        :return: {id: строка (id, country, city, min_stay, max_stay)}
+        """
+        rooms = await self.session.execute(
+            select(Room.id, Room.country, Room.city, Room.min_stay, Room.max_stay).where(
+                Room.owner_id == owner_id,
+                Room.id == any_(bindparam('room_ids', room_ids, type_=ARRAY(Integer))),
+            )
+        )
+        return {row.id: row for row in rooms}
+
+    async def update_rooms(self, owner_id: int, items: list[RoomBatchUpdateItem]):
+        """
+        Пакетное изменение комнат владельца одним UPDATE ... FROM (VALUES ...).
+        В VALUES попадают только поля, переданные хотя бы в одном элементе, и для каждого - признак <поле>_set:
+        поле меняется, только если оно передано в элементе, поэтому переданный null (координаты) очищает значение,
+        а непереданное поле остаётся прежним
+        :param owner_id:
+        :param items:
+        :return: строки ROOM_INDEX_COLUMNS изменённых комнат
+        """
+        fields = sorted({field for item in items for field in item.changes()} - {'id'})
+        if not fields:
+            return []
+        table = self.model.__table__
+        rows = []
+        for item in items:
+            item_changes = item.changes()
+            rows.append((item.id, *(item_changes.get(field) for field in fields),
+                         *(field in item_changes for field in fields)))
+        changes = values(
+            column('id', Integer),
+            *(column(field, table.c[field].type) for field in fields),
+            *(column(f'{field}_set', Boolean) for field in fields),
+            name='changes',
+        ).data(rows)
+        # Колонка VALUES из одних NULL получает тип text, поэтому значение приводится к типу поля
+        updated = await self.session.execute(
+            update(self.model)
+            .where(Room.id == changes.c.id, Room.owner_id == owner_id)
+            .values({field: case((changes.c[f'{field}_set'], cast(changes.c[field], table.c[field].type)),
+                                 else_=table.c[field])
+                     for field in fields})
+            .returning(*ROOM_INDEX_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        return updated.all()
+
+    async def delete_rooms(self, owner_id: int, room_ids: list[int]) -> list[int]:
+        """
+        Пакетное удаление комнат владельца одним DELETE. Комнаты с действующими бронями не удаляются
+        (бронь удалилась бы каскадно вместе с комнатой)
+        :param owner_id:
+        :param room_ids:
+        :return: id удалённых комнат
+        """
+        active_booking = select(Booking.id).where(
+            Booking.property_id == Room.id,
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+            Booking.check_out > func.now(),
+        ).exists()
+        deleted = await self.session.scalars(
+            delete(self.model)
+            .where(
+                Room.owner_id == owner_id,
+                Room.id == any_(bindparam('room_ids', room_ids, type_=ARRAY(Integer))),
+                ~active_booking,
+            )
+            .returning(Room.id)
+        )
+        return list(deleted)
+
+
+class CachedRoomRepo(RoomRepo):
+    """
+    RoomRepo с кэшированием комнаты по id
+    """
+
+    async def get_room_by_id(self, room_id: int) -> Room | None:
+        data = await room_cache.get(room_id, lambda: self._load_snapshot(room_id))
+        if data is None:
+            return None
+        return await restore(self.session, self.model, data)
+
+    async def _load_snapshot(self, room_id: int) -> dict | None:
+        room = await super().get_room_by_id(room_id)
+        return snapshot(room) if room else None
@@ -0,0 +1,205 @@
+import datetime as dt
+from typing import Sequence
+
+from sqlalchemy import (select, delete, func, cast, case, literal, exists, any_, bindparam, Date, Integer, tuple_,
+                        and_, or_, true)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+
+from models import Booking, Room, RoomDailyStat
+from sql_enums import ACTIVE_BOOKING_STATUSES
+
+METRICS = ('booked_nights', 'revenue', 'check_ins', 'cancellations')
+# Пространство ключей pg_advisory_xact_lock(STATS_LOCK, id комнаты): сверка и инкрементальные изменения
+# сводок одной комнаты не выполняются одновременно
+STATS_LOCK = 1001
+
+
+class RoomStatsRepo:
+    """
+    Репозиторий дневных сводок комнат (RoomDailyStat) для кабинета владельца
+    """
+    model = RoomDailyStat
+
+    def __init__(self, session):
+        self.session = session
+
+    @staticmethod
+    def _booking_days():
+        """
+        Ночи бронирований: bookings x LATERAL generate_series(check_in, check_out - 1 день)
+        :return: (подзапрос ночей для join, колонка даты ночи, признак первой ночи)
+        """
+        nights = func.generate_series(
+            Booking.check_in, Booking.check_out - dt.timedelta(days=1), dt.timedelta(days=1)
+        ).table_valued('night').render_derived(name='nights').lateral()
+        day = cast(nights.c.night, Date)
+        return nights, day, day == cast(Booking.check_in, Date)
+
+    def _upsert(self, rows, accumulate: bool):
+        statement = insert(self.model).from_select(['owner_id', 'property_id', 'date', *METRICS], rows)
+        columns = self.model.__table__.c
+        if accumulate:
+            values = {name: columns[name] + statement.excluded[name] for name in METRICS}
+            where = None
+        else:
+            values = {name: statement.excluded[name] for name in METRICS}
+            where = tuple_(*(columns[name] for name in METRICS)).is_distinct_from(
+                tuple_(*(statement.excluded[name] for name in METRICS))
+            )
+        values['updated_at'] = func.now()
+        return statement.on_conflict_do_update(index_elements=['property_id', 'date'], set_=values, where=where)
+
+    def _is_empty(self):
+        return and_(*(self.model.__table__.c[name] == 0 for name in METRICS))
+
+    async def apply_bookings(self, booking_ids: Sequence[int], sign: int, cancelled: bool = False) -> None:
+        """
+        Инкрементальное обновление сводок по ночам бронирований одним INSERT ... ON CONFLICT.
+        sign=1 - бронь стала активной, sign=-1 - перестала (просрочена или отменена).
+        Выручка считается по price_per_night брони, поэтому прибавление и вычитание симметричны
+        и не зависят от последующих изменений цен календаря.
+        Перед записью тем же запросом берутся блокировки STATS_LOCK комнат (до конца транзакции),
+        чтобы не пересечься со сверкой. Строки, обнулившиеся после вычитания, удаляются:
+        в сводках хранятся только дни с бронированиями или отменами, как и после сверки.
+        :param booking_ids:
+        :param sign: 1 или -1
+        :param cancelled: учитывать отмену в день заезда
+        :return: None
+        """
+        if not booking_ids:
+            return
+        in_bookings = Booking.id == any_(bindparam('booking_ids', list(booking_ids), type_=ARRAY(Integer)))
+        rooms = (
+            select(Booking.property_id).where(in_bookings).distinct().order_by(Booking.property_id)
+            .subquery('locked_rooms')
+        )
+        # Подзапрос без корреляции выполняется один раз до вставки строк
+        locked = select(func.count()).select_from(
+            select(func.pg_advisory_xact_lock(STATS_LOCK, rooms.c.property_id)).subquery('locks')
+        ).scalar_subquery()
+        nights, day, first_night = self._booking_days()
+        first_night = case((first_night, 1), else_=0)
+        rows = (
+            select(
+                Room.owner_id,
+                Booking.property_id,
+                day,
+                func.sum(literal(sign)),
+                func.sum(Booking.price_per_night * sign),
+                func.sum(first_night * sign),
+                func.sum(first_night if cancelled else literal(0)),
+            )
+            .select_from(Booking)
+            .join(Room, Room.id == Booking.property_id)
+            .join(nights, true())
+            .where(in_bookings, locked >= 0)
+            .group_by(Room.owner_id, Booking.property_id, day)
+        )
+        applied = await self.session.execute(
+            self._upsert(rows, accumulate=True).returning(self.model.id, self._is_empty())
+        )
+        empty = [row_id for row_id, is_empty in applied if is_empty]
+        if empty:
+            await self.session.execute(
+                delete(self.model)
+                .where(self.model.id == any_(bindparam('empty_ids', empty, type_=ARRAY(Integer))), self._is_empty())
+            )
+
+    async def reconcile(self, room_ids: Sequence[int], date_from: dt.date, date_to: dt.date) -> int:
+        """
+        Пересчёт сводок комнат за [date_from, date_to) по таблице бронирований:
+        расходящиеся строки перезаписываются, лишние удаляются. Используется и для первичного заполнения.
+        Сначала берутся блокировки STATS_LOCK комнат: незавершённые транзакции с инкрементальными изменениями
+        их сводок дожидаются commit, новые ждут конца сверки. Поэтому пересчёт видит все учтённые
+        в сводках бронирования и не затирает чужие изменения.
+        :param room_ids:
+        :param date_from:
+        :param date_to:
+        :return: количество исправленных строк
+        """
+        room_ids = sorted(set(room_ids))
+        if not room_ids:
+            return 0
+        locked_room = func.unnest(bindparam('room_ids', room_ids, type_=ARRAY(Integer))).column_valued('room_id')
+        await self.session.execute(select(func.pg_advisory_xact_lock(STATS_LOCK, locked_room)))
+
+        nights, day, first_night = self._booking_days()
+        active = Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+        in_rooms = Booking.property_id == any_(bindparam('room_ids', room_ids, type_=ARRAY(Integer)))
+        source = (
+            select(
+                Room.owner_id,
+                Booking.property_id,
+                day.label('date'),
+                func.count().filter(active).label('booked_nights'),
+                func.coalesce(func.sum(Booking.price_per_night).filter(active), 0).label('revenue'),
+                func.count().filter(active & first_night).label('check_ins'),
+                func.count().filter(Booking.cancelled & first_night).label('cancellations'),
+            )
+            .select_from(Booking)
+            .join(Room, Room.id == Booking.property_id)
+            .join(nights, true())
+            .where(
+                in_rooms,
+                Booking.check_out > dt.datetime.combine(date_from, dt.time.min),
+                Booking.check_in < dt.datetime.combine(date_to, dt.time.min),
+                active | Booking.cancelled,
+                day >= date_from,
+                day < date_to,
+            )
+            .group_by(Room.owner_id, Booking.property_id, day)
+            .having(or_(func.count().filter(active) > 0, func.count().filter(Booking.cancelled & first_night) > 0))
+            .cte('source')
+        )
+
+        stale = await self.session.execute(
+            delete(self.model)
+            .where(
+                self.model.property_id == any_(bindparam('room_ids', room_ids, type_=ARRAY(Integer))),
+                self.model.date >= date_from,
+                self.model.date < date_to,
+                ~exists().where(source.c.property_id == self.model.property_id, source.c.date == self.model.date),
+            )
+            .returning(self.model.id)
+        )
+        changed = await self.session.execute(
+            self._upsert(select(source), accumulate=False).returning(self.model.id)
+        )
+        return len(stale.all()) + len(changed.all())
+
+    async def owner_months(self, owner_id: int, date_from: dt.date, date_to: dt.date):
+        """
+        Помесячные суммы сводок владельца за [date_from, date_to)
+        :return: строки (month, booked_nights, revenue, check_ins, cancellations)
+        """
+        month = cast(func.date_trunc('month', self.model.date), Date).label('month')
+        rows = await self.session.execute(
+            select(
+                month,
+                func.sum(self.model.booked_nights),
+                func.sum(self.model.revenue),
+                func.sum(self.model.check_ins),
+                func.sum(self.model.cancellations),
+            )
+            .where(self.model.owner_id == owner_id, self.model.date >= date_from, self.model.date < date_to)
+            .group_by(month)
+            .order_by(month)
+        )
+        return rows.all()
+
+    async def owner_check_ins(self, owner_id: int, date_from: dt.date, date_to: dt.date):
+        """
+        Количество заездов по дням за [date_from, date_to)
+        :return: строки (date, check_ins)
+        """
+        rows = await self.session.execute(
+            select(self.model.date, func.sum(self.model.check_ins))
+            .where(self.model.owner_id == owner_id, self.model.date >= date_from, self.model.date < date_to,
+                   self.model.check_ins > 0)
+            .group_by(self.model.date)
+            .order_by(self.model.date)
+        )
+        return rows.all()
+
+    async def count_owner_rooms(self, owner_id: int) -> int:
+        return await self.session.scalar(select(func.count()).select_from(Room).where(Room.owner_id == owner_id))
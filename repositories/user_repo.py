@@ -1,7 +1,18 @@
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, insert, update, or_
+
+from core.cache import ReadThroughCache, cache_backend, snapshot, restore
+from core.settings import settings
+from core.unit_of_work import on_commit
 from schemas.user_schemas import UserRegister, UserUpdate
 from models import User
 
+user_cache = ReadThroughCache('users', ttl=settings.USER_CACHE_TTL, maxsize=settings.CACHE_MAX_ENTRIES,
+                              backend=cache_backend)
+token_version_cache = ReadThroughCache('token_versions', ttl=settings.TOKEN_VERSION_CACHE_TTL,
+                                       maxsize=settings.CACHE_MAX_ENTRIES, backend=cache_backend)
+# Колонки, которые не кладутся в кэш: кэш может быть общим для всех процессов (Redis)
+USER_CACHE_EXCLUDE = frozenset({'password', 'token_version'})
+
 
 class UserRepo:
     """
@@ -14,15 +25,15 @@ class UserRepo:
 
     async def create_user(self, user_data: UserRegister) -> User:
         """
-        Создание нового пользователя в базе данных
+        Создание нового пользователя в базе данных.
+        Все поля, включая серверные значения по умолчанию, возвращаются через RETURNING
         :param user_data:
         :return: User obj
         """
-        new_instance = self.model(**user_data.model_dump())
-        self.session.add(new_instance)
-        await self.session.commit()
-        await self.session.refresh(new_instance)
-        return new_instance
+        new_instance = await self.session.scalars(
+            insert(self.model).values(**user_data.model_dump()).returning(self.model)
+        )
+        return new_instance.one()
 
     async def get_user_by_email(self, email: str) -> User | None:
         """
@@ -46,6 +57,19 @@ class UserRepo:
         )
         return user.scalar_one_or_none()
 
+    async def get_token_version(self, us_id: int) -> int:
+        """
+        Текущая версия токенов пользователя. Значение кэшируется на TOKEN_VERSION_CACHE_TTL
+        и сбрасывается после commit смены пароля
+        :param us_id:
+        :return: версия, 0 для несуществующего пользователя
+        """
+        async def load() -> int | None:
+            return await self.session.scalar(select(self.model.token_version).where(self.model.id == us_id))
+
+        version = await token_version_cache.get(us_id, load)
+        return version or 0
+
     async def get_user_by_phone(self, phone: str) -> User | None:
         """
         Получение пользователя по номеру телефона
@@ -57,19 +81,65 @@ class UserRepo:
         )
         return user.scalar_one_or_none()
 
+    async def get_users_by_email_or_phone(self, email: str | None, phone: str | None,
+                                          exclude_id: int | None = None) -> list[User]:
+        """
+        Получение пользователей с указанной почтой или номером телефона одним запросом
+        :param email:
+        :param phone:
+        :param exclude_id: id пользователя, которого не нужно учитывать (при обновлении)
+        :return: list of User obj
+        """
+        conditions = []
+        if email:
+            conditions.append(self.model.email == email)
+        if phone:
+            conditions.append(self.model.phone == phone)
+        if not conditions:
+            return []
+        query = select(self.model).where(or_(*conditions))
+        if exclude_id is not None:
+            query = query.where(self.model.id != exclude_id)
+        users = await self.session.scalars(query)
+        return list(users)
+
     async def update(self, user: User, data: UserUpdate) -> User:
         """
-        Обновление указанных полей пользователя
+        Обновление указанных полей пользователя. При смене пароля в том же UPDATE увеличивается
+        версия токенов, так что ранее выданные токены отзываются вместе с commit
         :param user:
         :param data:
         :return: User obj
         """
         updated_data = data.model_dump(exclude_unset=True)
-        for key, value in updated_data.items():
-            setattr(user, key, value)
-        await self.session.commit()
-        await self.session.refresh(user)
-        return user
+        if not updated_data:
+            return user
+        password_changed = updated_data.get('password') is not None
+        if password_changed:
+            updated_data['token_version'] = self.model.token_version + 1
+        updated_user = await self.session.scalars(
+            update(self.model)
+            .where(self.model.id == user.id)
+            .values(**updated_data)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        on_commit(self.session, lambda: user_cache.invalidate(user.id))
+        if password_changed:
+            on_commit(self.session, lambda: token_version_cache.invalidate(user.id))
+        return updated_user.one()
+
+    async def update_password(self, user: User, password_hash: str) -> None:
+        """
+        Замена хэша пароля (перехэширование при входе)
+        :param user:
+        :param password_hash:
+        :return: None
+        """
+        await self.session.execute(
+            update(self.model).where(self.model.id == user.id).values(password=password_hash)
+        )
+        on_commit(self.session, lambda: user_cache.invalidate(user.id))
 
     async def delete_user(self, user: User) -> None:
         """
@@ -77,5 +147,26 @@ class UserRepo:
         :param user:
         :return: None
         """
+        user_id = user.id
         await self.session.delete(user)
-        await self.session.commit()
+        await self.session.flush()
+        on_commit(self.session, lambda: user_cache.invalidate(user_id))
+        on_commit(self.session, lambda: token_version_cache.invalidate(user_id))
+
+
+class CachedUserRepo(UserRepo):
+    """
+    UserRepo с кэшированием пользователя по id (горячий путь get_current_user).
+    У восстановленного из кэша пользователя не загружены колонки USER_CACHE_EXCLUDE:
+    для проверки пароля пользователь читается через UserRepo
+    """
+
+    async def get_user_by_id(self, us_id: int) -> User | None:
+        data = await user_cache.get(us_id, lambda: self._load_snapshot(us_id))
+        if data is None:
+            return None
+        return await restore(self.session, self.model, data)
+
+    async def _load_snapshot(self, us_id: int) -> dict | None:
+        user = await super().get_user_by_id(us_id)
+        return snapshot(user, exclude=USER_CACHE_EXCLUDE) if user else None
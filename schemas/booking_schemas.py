@@ -0,0 +1,38 @@
+import datetime
+from decimal import Decimal
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+from sql_enums import BookingStatus, PaymentStatus
+
+
+class BookingCreate(BaseModel):
+    room_id: int = Field(ge=1, examples=[1])
+    check_in: datetime.date = Field(examples=['2025-07-01'])
+    check_out: datetime.date = Field(examples=['2025-07-05'])
+    guest_cnt: int = Field(ge=1, examples=[2])
+
+    @model_validator(mode="after")
+    def validate_dates(self):
+        if self.check_in < datetime.date.today():
+            raise ValueError("check_in не может быть в прошлом")
+        if self.check_out <= self.check_in:
+            raise ValueError("check_out должен быть позже check_in")
+        return self
+
+
+class BookingResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    booking_number: int
+    property_id: int
+    guest_cnt: int
+    status: BookingStatus
+    check_in: datetime.datetime
+    check_out: datetime.datetime
+    price_per_night: Decimal
+    total_amount: Decimal
+    currency: str
+    payment_status: PaymentStatus
+    expires_at: datetime.datetime
@@ -13,3 +13,26 @@ class ErrorWithJWT(Exception):
 class UserNotFound(Exception):
     pass
 
+
+class RoomNotFound(Exception):
+    pass
+
+
+class BookingConflict(Exception):
+    pass
+
+
+class BookingValidationError(Exception):
+    pass
+
+
+class HashingOverloaded(Exception):
+    pass
+
+
+class BookingNotFound(Exception):
+    pass
+
+
+class CalendarFeedError(Exception):
+    pass
@@ -0,0 +1,21 @@
+import datetime
+import enum
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class ExportFormat(str, enum.Enum):
+    CSV = 'csv'
+    NDJSON = 'ndjson'
+
+
+class ExportParams(BaseModel):
+    format: ExportFormat = ExportFormat.CSV
+    date_from: datetime.date | None = Field(default=None, examples=['2025-01-01'])
+    date_to: datetime.date | None = Field(default=None, examples=['2026-01-01'])
+
+    @model_validator(mode="after")
+    def validate_dates(self):
+        if self.date_from and self.date_to and self.date_to <= self.date_from:
+            raise ValueError("date_to должен быть позже date_from")
+        return self
@@ -0,0 +1,87 @@
+import datetime
+from decimal import Decimal
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+ALL_WEEKDAYS = [1, 2, 3, 4, 5, 6, 7]
+
+
+def weekdays_mask(weekdays: list[int]) -> int:
+    """
+    Битовая маска дней недели: бит isodow - 1
+    """
+    mask = 0
+    for day in weekdays:
+        mask |= 1 << (day - 1)
+    return mask
+
+
+def mask_weekdays(mask: int) -> list[int]:
+    return [day for day in ALL_WEEKDAYS if mask & (1 << (day - 1))]
+
+
+class SeasonUpdate(BaseModel):
+    room_ids: list[int] = Field(min_length=1, max_length=1000,
+                                description='Комнаты владельца, к которым применяется сезон')
+    date_from: datetime.date = Field(examples=['2026-06-01'])
+    date_to: datetime.date = Field(examples=['2026-09-01'], description='Не включается')
+    weekdays: list[int] = Field(default=ALL_WEEKDAYS, min_length=1, max_length=7,
+                                description='Дни недели ISO: 1 - понедельник, 7 - воскресенье')
+    price: Decimal | None = Field(default=None, ge=1, le=100_000_000, max_digits=12, decimal_places=2)
+    multiplier: Decimal | None = Field(default=None, gt=0, le=100, max_digits=6, decimal_places=4,
+                                       examples=[Decimal('1.3000')])
+    priority: int = Field(default=0, ge=-1000, le=1000)
+
+    @model_validator(mode="after")
+    def validate_rule(self):
+        if self.date_to <= self.date_from:
+            raise ValueError("date_to должен быть позже date_from")
+        if any(day not in ALL_WEEKDAYS for day in self.weekdays):
+            raise ValueError("weekdays - числа от 1 до 7")
+        if (self.price is None) == (self.multiplier is None):
+            raise ValueError("Укажите либо price, либо multiplier")
+        return self
+
+
+class StayDiscountItem(BaseModel):
+    min_nights: int = Field(ge=2, le=365, examples=[7])
+    percent: Decimal = Field(gt=0, le=90, max_digits=5, decimal_places=2, examples=[Decimal('10')])
+
+
+class StayDiscountsUpdate(BaseModel):
+    room_ids: list[int] = Field(min_length=1, max_length=1000)
+    discounts: list[StayDiscountItem] = Field(max_length=20, description='Пустой список удаляет скидки')
+
+    @model_validator(mode="after")
+    def validate_discounts(self):
+        if len({item.min_nights for item in self.discounts}) != len(self.discounts):
+            raise ValueError("min_nights скидок не должны повторяться")
+        return self
+
+
+class RatePlanOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    property_id: int
+    name: str
+    date_from: datetime.date
+    date_to: datetime.date
+    weekdays: list[int]
+    price: Decimal | None
+    multiplier: Decimal | None
+    priority: int
+
+    @model_validator(mode="before")
+    @classmethod
+    def unpack_weekdays(cls, data):
+        if not isinstance(data, dict):
+            data = {field: getattr(data, field) for field in cls.model_fields}
+        if isinstance(data.get('weekdays'), int):
+            data = {**data, 'weekdays': mask_weekdays(data['weekdays'])}
+        return data
+
+
+class RatesApplied(BaseModel):
+    rooms: int
+    days_changed: int
@@ -1,8 +1,11 @@
 import datetime
 from decimal import Decimal
+from functools import lru_cache
+from typing import Any, ClassVar
 
-from pydantic import BaseModel, Field, model_validator, condecimal
+from pydantic import BaseModel, ConfigDict, Field, model_validator, condecimal, TypeAdapter, ValidationError
 
+from core.settings import settings
 from sql_enums import RoomType, RoomStatus, Currency
 
 PriceDecimal = condecimal(
@@ -20,6 +23,9 @@ class RoomCreate(BaseModel):
     country: str = Field(min_length=3, max_length=100, examples=['Россия'])
     city: str = Field(min_length=3, max_length=100, examples=['Москва'])
     address: str = Field(min_length=5, max_length=250, examples=['Молодежная улица дом 5 корпус 3'])
+    latitude: float | None = Field(default=None, ge=-90, le=90, examples=[55.7558],
+                                   description='Без координат комната геокодируется по стране и городу')
+    longitude: float | None = Field(default=None, ge=-180, le=180, examples=[37.6173])
 
     property_type: RoomType
 
@@ -46,8 +52,223 @@ class RoomCreate(BaseModel):
     def validate_stay_range(self):
         if self.min_stay > self.max_stay:
             raise ValueError("min_stay не может быть больше max_stay")
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude и longitude указываются вместе")
         return self
 
 
 class RoomUpdate(BaseModel):
-    pass
\ No newline at end of file
+    """
+    Изменение комнаты: меняются только переданные поля. null очищает поля из CLEARABLE_FIELDS
+    (координаты), для остальных полей null означает, что поле не меняется
+    """
+    CLEARABLE_FIELDS: ClassVar[frozenset[str]] = frozenset({'latitude', 'longitude'})
+
+    title: str | None = Field(default=None, min_length=5, max_length=100)
+    description: str | None = Field(default=None, min_length=10, max_length=1000)
+
+    country: str | None = Field(default=None, min_length=3, max_length=100)
+    city: str | None = Field(default=None, min_length=3, max_length=100)
+    address: str | None = Field(default=None, min_length=5, max_length=250)
+    latitude: float | None = Field(default=None, ge=-90, le=90)
+    longitude: float | None = Field(default=None, ge=-180, le=180)
+
+    property_type: RoomType | None = None
+
+    guests_cnt: int | None = Field(default=None, ge=1)
+    bedrooms: int | None = Field(default=None, ge=1)
+    beds: int | None = Field(default=None, ge=1)
+    bathrooms: int | None = Field(default=None, ge=1)
+
+    base_price: PriceDecimal | None = None
+    currency: Currency | None = None
+    cleaning_fee: PriceDecimal | None = None
+    security_deposit: Decimal | None = Field(default=None, ge=1.0, le=100_000_000, max_digits=12, decimal_places=2)
+    weekend_multiplier: Decimal | None = Field(default=None, ge=1.0, le=100_000_000, max_digits=12,
+                                               decimal_places=2)
+
+    min_stay: int | None = Field(default=None, ge=1)
+    max_stay: int | None = Field(default=None, ge=1)
+
+    is_available: bool | None = None
+    status: RoomStatus | None = None
+
+    @model_validator(mode="after")
+    def validate_stay_range(self):
+        if self.min_stay is not None and self.max_stay is not None and self.min_stay > self.max_stay:
+            raise ValueError("min_stay не может быть больше max_stay")
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude и longitude указываются вместе")
+        return self
+
+    def changes(self) -> dict[str, Any]:
+        return {field: value for field, value in self.model_dump(exclude_unset=True).items()
+                if value is not None or field in self.CLEARABLE_FIELDS}
+
+
+class RoomBatchUpdateItem(RoomUpdate):
+    id: int
+
+
+class RoomBatchCreate(BaseModel):
+    rooms: list[dict[str, Any]] = Field(min_length=1, max_length=1000,
+                                        description='Комнаты в формате RoomCreate, проверяются по отдельности')
+
+
+class RoomBatchUpdate(BaseModel):
+    rooms: list[dict[str, Any]] = Field(min_length=1, max_length=1000,
+                                        description='id комнаты и изменяемые поля RoomUpdate')
+
+
+class RoomBatchDelete(BaseModel):
+    room_ids: list[int] = Field(min_length=1, max_length=1000)
+
+
+class RoomBatchResult(BaseModel):
+    index: int = Field(description='Номер элемента в запросе')
+    id: int | None = None
+    ok: bool
+    error: str | None = None
+
+
+class RoomBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: list[RoomBatchResult]
+
+    @classmethod
+    def from_results(cls, results: list[RoomBatchResult]) -> "RoomBatchResponse":
+        results = sorted(results, key=lambda result: result.index)
+        succeeded = sum(result.ok for result in results)
+        return cls(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+
+@lru_cache
+def batch_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+def validate_batch(model: type[BaseModel], items: list[dict[str, Any]]) -> tuple[dict[int, Any], dict[int, str]]:
+    """
+    Проверка элементов пакета одной валидацией списка. Если в пакете есть ошибки,
+    корректные элементы всё равно принимаются, а ошибки возвращаются по номерам элементов
+    :param model:
+    :param items:
+    :return: ({номер: модель}, {номер: текст ошибки})
+    """
+    try:
+        return dict(enumerate(batch_adapter(model).validate_python(items))), {}
+    except ValidationError as e:
+        errors: dict[int, list[str]] = {}
+        for error in e.errors():
+            index, *loc = error['loc']
+            field = '.'.join(str(part) for part in loc)
+            errors.setdefault(index, []).append(f"{field}: {error['msg']}" if field else error['msg'])
+    valid = {index: model.model_validate(item) for index, item in enumerate(items) if index not in errors}
+    return valid, {index: '; '.join(messages) for index, messages in errors.items()}
+
+
+class RoomFilters(BaseModel):
+    q: str | None = Field(default=None, min_length=2, max_length=100, examples=['уютная студия'],
+                          description='Поиск по заголовку и описанию')
+    property_type: RoomType | None = None
+    guests_cnt: int | None = Field(default=None, ge=1, examples=[2])
+    min_price: Decimal | None = Field(default=None, ge=0)
+    max_price: Decimal | None = Field(default=None, ge=0)
+    check_in: datetime.date | None = None
+    check_out: datetime.date | None = None
+
+    @model_validator(mode="after")
+    def validate_dates(self):
+        if (self.check_in is None) != (self.check_out is None):
+            raise ValueError("check_in и check_out указываются вместе")
+        if self.check_in and self.check_out <= self.check_in:
+            raise ValueError("check_out должен быть позже check_in")
+        if self.check_in and (self.check_out - self.check_in).days > settings.CALENDAR_WINDOW_DAYS:
+            raise ValueError(f"Проживание не может быть длиннее {settings.CALENDAR_WINDOW_DAYS} ночей")
+        return self
+
+
+class RoomSearchParams(RoomFilters):
+    city: str | None = Field(default=None, max_length=100, examples=['Москва'])
+    country: str | None = Field(default=None, max_length=100, examples=['Россия'])
+    cursor: str | None = Field(default=None, description='Курсор следующей страницы из next_cursor')
+    limit: int = Field(default=20, ge=1, le=100)
+
+
+class NearbySearchParams(RoomFilters):
+    latitude: float = Field(ge=-90, le=90, examples=[55.7558])
+    longitude: float = Field(ge=-180, le=180, examples=[37.6173])
+    radius_km: float = Field(default=3, gt=0, le=100)
+    cursor: str | None = Field(default=None, description='Курсор продолжения из next_cursor')
+    limit: int = Field(default=50, ge=1, le=500)
+
+
+class RoomCard(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str
+    country: str
+    city: str
+    property_type: RoomType
+    guests_cnt: int
+    bedrooms: int
+    beds: int
+    base_price: Decimal
+    currency: Currency
+    latitude: float | None = None
+    longitude: float | None = None
+    total_price: Decimal | None = None
+    distance_km: float | None = None
+
+
+class RoomSearchPage(BaseModel):
+    items: list[RoomCard]
+    next_cursor: str | None = None
+
+
+class OwnerSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    first_name: str
+    second_name: str
+    is_verified: bool
+    verification_lvl: int
+
+
+class CalendarDay(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    date: datetime.date
+    price: Decimal
+    is_available: bool
+    is_blocked: bool
+
+
+class RoomDetail(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str
+    description: str
+    country: str
+    city: str
+    address: str
+    latitude: float | None
+    longitude: float | None
+    property_type: RoomType
+    guests_cnt: int
+    bedrooms: int
+    beds: int
+    bathrooms: int
+    base_price: Decimal
+    currency: Currency
+    cleaning_fee: Decimal
+    security_deposit: Decimal
+    weekend_multiplier: Decimal
+    min_stay: int
+    max_stay: int
+    owner: OwnerSummary
+    availability: list[CalendarDay]
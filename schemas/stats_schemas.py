@@ -0,0 +1,38 @@
+import datetime
+from decimal import Decimal
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class OwnerStatsParams(BaseModel):
+    date_from: datetime.date | None = Field(default=None, examples=['2025-01-01'])
+    date_to: datetime.date | None = Field(default=None, examples=['2026-01-01'])
+
+    @model_validator(mode="after")
+    def validate_dates(self):
+        if self.date_from and self.date_to and self.date_to <= self.date_from:
+            raise ValueError("date_to должен быть позже date_from")
+        return self
+
+
+class MonthStats(BaseModel):
+    month: datetime.date
+    booked_nights: int
+    available_nights: int
+    occupancy: float
+    revenue: Decimal
+    check_ins: int
+    cancellations: int
+
+
+class DayCheckIns(BaseModel):
+    date: datetime.date
+    check_ins: int
+
+
+class OwnerStats(BaseModel):
+    rooms: int
+    date_from: datetime.date
+    date_to: datetime.date
+    months: list[MonthStats]
+    upcoming_check_ins: list[DayCheckIns]
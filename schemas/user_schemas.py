@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator
+import datetime as dt
+
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 from sql_enums import UserType
 import re
 
@@ -42,6 +44,31 @@ class UserLogin(BaseModel):
     password: str
 
 
+class UserProfile(BaseModel):
+    """
+    Публичные поля профиля пользователя, без пароля и служебных полей
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    first_name: str
+    second_name: str
+    email: str
+    phone: str | None
+    user_type: UserType
+    is_verified: bool
+    verification_lvl: int
+    created_at: dt.datetime
+
+
+class TokenUser(BaseModel):
+    """
+    Пользователь, восстановленный из claims access токена без обращения к базе
+    """
+    id: int
+    role: UserType
+
+
 class AuthResponse(BaseModel):
     access_token: str
     refresh_token: str
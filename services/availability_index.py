@@ -0,0 +1,264 @@
+import datetime as dt
+import logging
+from collections import defaultdict
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import async_session_maker
+from core.settings import settings
+from core.tasks import PeriodicTask
+from models import AvailabilityCalendar, Room
+
+logger = logging.getLogger(__name__)
+FREE_DAY = (AvailabilityCalendar.is_available & ~AvailabilityCalendar.is_blocked
+            & AvailabilityCalendar.booking_id.is_(None))
+
+
+class AvailabilityIndex:
+    """
+    Битовый индекс доступности комнат в памяти процесса.
+    Для каждой комнаты хранятся две маски (int как bitset): свободные и заблокированные дни.
+    Бит i соответствует дате epoch + i, поэтому проверка диапазона дат - это одна операция над масками.
+    Решение о доступности всегда принимает календарь в базе (RoomRepo.free_for_stay), индекс лишь сужает
+    список кандидатов. Индекс видит только изменения своего процесса, а комнату, которую он ошибочно
+    считает занятой, перепроверка уже не вернёт. Поэтому сужение включено, только пока процесс
+    приложения один (WEB_CONCURRENCY = 1), см. prefilter_enabled.
+    Изменения, внесённые в обход процесса (скрипты, другие экземпляры), подтягивает sync по updated_at
+    календаря и комнат, а со сменой дня индекс перестраивается с новым epoch, чтобы маски не росли.
+    """
+
+    def __init__(self, epoch: dt.date | None = None):
+        self.epoch = epoch or dt.date.today()
+        self._free: dict[int, int] = {}
+        self._blocked: dict[int, int] = {}
+        self._room_city: dict[int, str] = {}
+        self._city_rooms: dict[str, set[int]] = defaultdict(set)
+        self.synced_at: dt.datetime | None = None
+        self.loaded = False
+
+    @property
+    def prefilter_enabled(self) -> bool:
+        """
+        Можно ли отбрасывать комнаты, которые индекс считает занятыми: индекс построен и других
+        процессов приложения, чьих изменений он не видит, нет
+        """
+        return self.loaded and settings.WEB_CONCURRENCY == 1
+
+    @staticmethod
+    def _city_key(city: str) -> str:
+        return city.strip().casefold()
+
+    def _span(self, check_in: dt.date, check_out: dt.date) -> int:
+        """
+        Маска ночей проживания [check_in, check_out).
+        Для дат раньше epoch и за окном календаря (CALENDAR_WINDOW_DAYS) возвращается 0 - такие даты
+        индекс не хранит, а маска не растёт до огромных чисел от дат вроде 9999 года.
+        :param check_in:
+        :param check_out:
+        :return: int mask
+        """
+        start = (check_in - self.epoch).days
+        nights = (check_out - check_in).days
+        window = settings.CALENDAR_WINDOW_DAYS
+        if start < 0 or nights <= 0 or start > window or nights > window:
+            return 0
+        return ((1 << nights) - 1) << start
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Построение индекса из таблиц Room и AvailabilityCalendar с epoch = сегодня.
+        Даты агрегируются на стороне базы, чтобы не гонять по сети строку на каждый день.
+        Индекс собирается отдельно и подменяет текущий целиком, поэтому поиск не видит его пустым.
+        Изменения своего процесса, сделанные во время сборки, вернёт следующий sync (synced_at берётся до чтения)
+        :param session:
+        :return: None
+        """
+        synced_at = await session.scalar(select(func.localtimestamp()))
+        fresh = AvailabilityIndex(dt.date.today())
+        rooms = await session.execute(select(Room.id, Room.city))
+        for room_id, city in rooms:
+            fresh.add_room(room_id, city)
+
+        calendar = AvailabilityCalendar
+        rows = await session.stream(
+            select(
+                calendar.property_id,
+                func.array_agg(calendar.date).filter(FREE_DAY),
+                func.array_agg(calendar.date).filter(calendar.is_blocked),
+            )
+            .where(calendar.date >= fresh.epoch)
+            .group_by(calendar.property_id)
+            .execution_options(yield_per=1000)
+        )
+        async for room_id, free_dates, blocked_dates in rows:
+            fresh._free[room_id] = fresh._mask(free_dates or ())
+            fresh._blocked[room_id] = fresh._mask(blocked_dates or ())
+
+        self.epoch = fresh.epoch
+        self._free, self._blocked = fresh._free, fresh._blocked
+        self._room_city, self._city_rooms = fresh._room_city, fresh._city_rooms
+        self.synced_at = synced_at
+        self.loaded = True
+
+    async def sync(self, session: AsyncSession) -> None:
+        """
+        Догрузка изменений, сделанных после прошлой синхронизации: комнаты и дни календаря с updated_at
+        не раньше synced_at - AVAILABILITY_SYNC_OVERLAP_SECONDS. updated_at - время начала транзакции,
+        запас покрывает транзакции, завершившиеся позже. Со сменой дня индекс перестраивается целиком (load)
+        :param session:
+        :return: None
+        """
+        if not self.loaded or self.epoch != dt.date.today():
+            await self.load(session)
+            return
+        since = self.synced_at - dt.timedelta(seconds=settings.AVAILABILITY_SYNC_OVERLAP_SECONDS)
+        synced_at = await session.scalar(select(func.localtimestamp()))
+        rooms = (await session.execute(select(Room.id, Room.city).where(Room.updated_at >= since))).all()
+        calendar = AvailabilityCalendar
+        days = (await session.execute(
+            select(calendar.property_id, calendar.date, FREE_DAY, calendar.is_blocked)
+            .where(calendar.updated_at >= since, calendar.date >= self.epoch)
+        )).all()
+
+        for room_id, city in rooms:
+            self.move_room(room_id, city)
+        for room_id, day, is_free, is_blocked in days:
+            bit = 1 << (day - self.epoch).days
+            if is_free:
+                self._free[room_id] = self._free.get(room_id, 0) | bit
+            else:
+                self._free[room_id] = self._free.get(room_id, 0) & ~bit
+            if is_blocked:
+                self._blocked[room_id] = self._blocked.get(room_id, 0) | bit
+            else:
+                self._blocked[room_id] = self._blocked.get(room_id, 0) & ~bit
+        self.synced_at = synced_at
+
+    def _mask(self, dates) -> int:
+        mask = 0
+        for day in dates:
+            offset = (day - self.epoch).days
+            if offset >= 0:
+                mask |= 1 << offset
+        return mask
+
+    def add_room(self, room_id: int, city: str) -> None:
+        self.remove_room(room_id)
+        key = self._city_key(city)
+        self._room_city[room_id] = key
+        self._city_rooms[key].add(room_id)
+        self._free.setdefault(room_id, 0)
+        self._blocked.setdefault(room_id, 0)
+
+    def move_room(self, room_id: int, city: str) -> None:
+        """
+        Смена города комнаты без сброса её дат
+        """
+        old_key = self._room_city.get(room_id)
+        if old_key is None:
+            self.add_room(room_id, city)
+            return
+        key = self._city_key(city)
+        self._city_rooms[old_key].discard(room_id)
+        self._city_rooms[key].add(room_id)
+        self._room_city[room_id] = key
+
+    def remove_room(self, room_id: int) -> None:
+        city = self._room_city.pop(room_id, None)
+        if city is not None:
+            self._city_rooms[city].discard(room_id)
+        self._free.pop(room_id, None)
+        self._blocked.pop(room_id, None)
+
+    def set_free(self, room_id: int, dates) -> None:
+        """
+        Отметить даты свободными (например, после генерации календаря)
+        :param room_id:
+        :param dates: iterable of date
+        :return: None
+        """
+        self._free[room_id] = self._free.get(room_id, 0) | self._mask(dates)
+
+    def occupy(self, room_id: int, check_in: dt.date, check_out: dt.date) -> None:
+        """
+        Пометить ночи бронирования занятыми
+        """
+        if room_id in self._free:
+            self._free[room_id] &= ~self._span(check_in, check_out)
+
+    def release(self, room_id: int, check_in: dt.date, check_out: dt.date) -> None:
+        """
+        Освободить ночи отменённого или просроченного бронирования.
+        Заблокированные владельцем дни остаются недоступными.
+        """
+        if room_id in self._free:
+            self._free[room_id] |= self._span(check_in, check_out) & ~self._blocked.get(room_id, 0)
+
+    def block(self, room_id: int, check_in: dt.date, check_out: dt.date) -> None:
+        span = self._span(check_in, check_out)
+        self._blocked[room_id] = self._blocked.get(room_id, 0) | span
+        if room_id in self._free:
+            self._free[room_id] &= ~span
+
+    def unblock(self, room_id: int, dates) -> None:
+        """
+        Снять блокировку дней. Свободными дни отмечаются отдельно через set_free,
+        т.к. на них может быть бронь.
+        """
+        if room_id in self._blocked:
+            self._blocked[room_id] &= ~self._mask(dates)
+
+    def is_free(self, room_id: int, check_in: dt.date, check_out: dt.date) -> bool:
+        """
+        Свободна ли комната на все ночи [check_in, check_out)
+        :param room_id:
+        :param check_in:
+        :param check_out:
+        :return: bool
+        """
+        span = self._span(check_in, check_out)
+        return bool(span) and self._free.get(room_id, 0) & span == span
+
+    def free_rooms(self, check_in: dt.date, check_out: dt.date, city: str | None = None) -> list[int]:
+        """
+        Список id комнат (опционально в городе city), свободных на все ночи [check_in, check_out)
+        :param check_in:
+        :param check_out:
+        :param city:
+        :return: list of room ids
+        """
+        span = self._span(check_in, check_out)
+        if not span:
+            return []
+        room_ids = self._city_rooms.get(self._city_key(city), ()) if city else self._free.keys()
+        free = self._free
+        return [room_id for room_id in room_ids if free.get(room_id, 0) & span == span]
+
+
+availability_index = AvailabilityIndex()
+
+
+async def start_availability_index(session: AsyncSession) -> None:
+    """
+    Построение индекса и запуск его синхронизации при старте. При нескольких процессах приложения
+    индекс не строится: поиску он всё равно не доверяет (prefilter_enabled), а память и запросы к базе тратил бы
+    :param session:
+    :return: None
+    """
+    if settings.WEB_CONCURRENCY != 1:
+        logger.warning('WEB_CONCURRENCY=%d: индекс доступности отключён, свободные даты в поиске проверяет только '
+                       'календарь в базе', settings.WEB_CONCURRENCY)
+        return
+    await availability_index.load(session)
+    availability_sync_task.start()
+
+
+async def sync_availability_index() -> None:
+    async with async_session_maker() as session:
+        await availability_index.sync(session)
+
+
+availability_sync_task = PeriodicTask(
+    'availability-index-sync', sync_availability_index, settings.AVAILABILITY_SYNC_INTERVAL_SECONDS
+)
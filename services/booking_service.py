@@ -0,0 +1,113 @@
+import datetime as dt
+import logging
+import time
+
+from core.database import async_session_maker
+from core.metrics import registry
+from core.settings import settings
+from core.tasks import PeriodicTask
+from core.unit_of_work import on_commit
+from models import Booking
+from repositories.booking_repo import BookingRepo
+from repositories.room_repo import RoomRepo
+from schemas.booking_schemas import BookingCreate
+from schemas.exception_schemas import RoomNotFound, BookingConflict, BookingValidationError, BookingNotFound
+from services.availability_index import availability_index
+from sql_enums import RoomStatus
+
+logger = logging.getLogger(__name__)
+
+HOLDS_RELEASED = registry.counter('booking_holds_released_total', 'Количество снятых просроченных броней')
+HOLD_RELEASE_LAG = registry.gauge(
+    'booking_hold_release_lag_seconds', 'Максимальное отставание снятия брони от expires_at в последнем проходе'
+)
+
+
+class BookingService:
+    """
+    Сервис бронирования: проверка условий комнаты, атомарный захват дат и создание брони.
+    Вызывающий код отвечает за commit/rollback транзакции.
+    """
+
+    def __init__(self, booking_repo: BookingRepo, room_repo: RoomRepo):
+        self.booking_repo = booking_repo
+        self.room_repo = room_repo
+
+    async def create_booking(self, guest_id: int, booking_data: BookingCreate) -> Booking:
+        """
+        Создание брони. Все ночи захватываются одним запросом,
+        при конфликте бросается BookingConflict без повторных попыток.
+        Индекс доступности обновляется после commit.
+        :param guest_id:
+        :param booking_data:
+        :return: Booking obj
+        """
+        room = await self.room_repo.get_room_by_id(booking_data.room_id)
+        if not room or room.status != RoomStatus.ACTIVE or not room.is_available:
+            raise RoomNotFound(f'Комната с id: {booking_data.room_id} недоступна')
+
+        nights = (booking_data.check_out - booking_data.check_in).days
+        if booking_data.guest_cnt > room.guests_cnt:
+            raise BookingValidationError(f'Комната рассчитана максимум на {room.guests_cnt} гостей')
+        if not room.min_stay <= nights <= room.max_stay:
+            raise BookingValidationError(f'Длительность проживания должна быть от {room.min_stay} до {room.max_stay} ночей')
+
+        booking = await self.booking_repo.create_booking(
+            room, guest_id, booking_data.guest_cnt, booking_data.check_in, booking_data.check_out,
+            hold=dt.timedelta(minutes=settings.BOOKING_HOLD_MINUTES),
+        )
+        if booking is None:
+            raise BookingConflict('Выбранные даты уже заняты')
+
+        on_commit(self.booking_repo.session, lambda: availability_index.occupy(
+            room.id, booking_data.check_in, booking_data.check_out
+        ))
+        return booking
+
+    async def cancel_booking(self, booking_id: int, user_id: int) -> Booking:
+        """
+        Отмена брони гостем или владельцем комнаты. Освобождённые даты возвращаются в индекс после commit.
+        :param booking_id:
+        :param user_id:
+        :return: Booking obj
+        """
+        booking = await self.booking_repo.cancel_booking(booking_id, user_id)
+        if booking is None:
+            raise BookingNotFound(f'Бронь с id: {booking_id} не найдена или не может быть отменена')
+
+        room_id, check_in, check_out = booking.property_id, booking.check_in.date(), booking.check_out.date()
+        on_commit(self.booking_repo.session, lambda: availability_index.release(room_id, check_in, check_out))
+        return booking
+
+
+async def release_expired_holds(batch_size: int | None = None) -> int:
+    """
+    Снятие всех просроченных неоплаченных броней пачками, каждая пачка в отдельной транзакции.
+    Освобождённые даты возвращаются в индекс доступности после commit.
+    :param batch_size:
+    :return: количество снятых броней
+    """
+    batch_size = batch_size or settings.HOLD_SWEEP_BATCH_SIZE
+    started = time.perf_counter()
+    total, max_lag = 0, 0.0
+    while True:
+        async with async_session_maker() as session:
+            released = await BookingRepo(session).release_expired(batch_size)
+            await session.commit()
+        for _, room_id, check_in, check_out, lag in released:
+            availability_index.release(room_id, check_in.date(), check_out.date())
+            max_lag = max(max_lag, float(lag))
+        total += len(released)
+        if len(released) < batch_size:
+            break
+
+    HOLDS_RELEASED.inc(total)
+    HOLD_RELEASE_LAG.set(max_lag)
+    if total:
+        elapsed = time.perf_counter() - started
+        logger.info('Снято просроченных броней: %d за %.2f с (%.0f броней/с), макс. отставание %.1f с',
+                    total, elapsed, total / elapsed if elapsed else 0, max_lag)
+    return total
+
+
+hold_sweeper_task = PeriodicTask('booking-hold-sweeper', release_expired_holds, settings.HOLD_SWEEP_INTERVAL_SECONDS)
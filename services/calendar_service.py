@@ -0,0 +1,59 @@
+import datetime as dt
+import logging
+import time
+
+from sqlalchemy import select
+
+from core.database import async_session_maker
+from core.settings import settings
+from core.tasks import PeriodicTask
+from models import Room
+from repositories.calendar_repo import CalendarRepo
+from services.availability_index import availability_index
+from services.pricing import invalidate_prices
+
+logger = logging.getLogger(__name__)
+
+
+def calendar_horizon() -> dt.date:
+    """
+    Последняя дата скользящего окна календаря
+    """
+    return dt.date.today() + dt.timedelta(days=settings.CALENDAR_WINDOW_DAYS)
+
+
+async def roll_calendars_forward(batch_size: int | None = None) -> int:
+    """
+    Ночное продление календарей всех комнат до горизонта окна.
+    Комнаты обходятся пачками по id (keyset), каждая пачка - один INSERT и отдельная транзакция.
+    :param batch_size:
+    :return: количество добавленных строк
+    """
+    batch_size = batch_size or settings.CALENDAR_BATCH_SIZE
+    until = calendar_horizon()
+    started = time.perf_counter()
+    total, last_id = 0, 0
+    while True:
+        async with async_session_maker() as session:
+            room_ids = list(await session.scalars(
+                select(Room.id).where(Room.id > last_id).order_by(Room.id).limit(batch_size)
+            ))
+            if not room_ids:
+                break
+            new_dates = await CalendarRepo(session).extend_calendars(room_ids, until)
+            await session.commit()
+        for room_id, dates in new_dates.items():
+            availability_index.set_free(room_id, dates)
+        invalidate_prices(list(new_dates))
+        total += sum(map(len, new_dates.values()))
+        last_id = room_ids[-1]
+
+    elapsed = time.perf_counter() - started
+    logger.info('Календари продлены до %s: %d строк за %.1f с (%.0f строк/с)',
+                until, total, elapsed, total / elapsed if elapsed else 0)
+    return total
+
+
+calendar_roll_task = PeriodicTask(
+    'calendar-roll-forward', roll_calendars_forward, settings.CALENDAR_ROLL_INTERVAL_HOURS * 3600
+)
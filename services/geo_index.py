@@ -0,0 +1,141 @@
+import math
+from collections import defaultdict
+from typing import Iterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Room
+from sql_enums import RoomStatus
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Расстояние по большому кругу (формула гаверсинусов)
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(a), 1.0))
+
+
+class GeoIndex:
+    """
+    Сеточный индекс координат комнат в памяти процесса.
+    Ячейка - cell_deg x cell_deg градусов, запрос по радиусу просматривает только ячейки,
+    пересекающие описанный вокруг круга прямоугольник. Долгота берётся по модулю 360,
+    поэтому круги через антимеридиан не теряют комнаты. В индекс попадают только комнаты,
+    доступные для поиска, - фильтры выдачи всё равно повторно проверяются запросом к базе.
+    """
+
+    def __init__(self, cell_deg: float = 0.02):
+        self.cell_deg = cell_deg
+        self.columns = math.ceil(360 / cell_deg)
+        self._cells: dict[tuple[int, int], dict[int, tuple[float, float, float]]] = defaultdict(dict)
+        self._room_cell: dict[int, tuple[int, int]] = {}
+        self.loaded = False
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg) % self.columns
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Построение индекса из координат активных комнат
+        :param session:
+        :return: None
+        """
+        self._cells.clear()
+        self._room_cell.clear()
+        rows = await session.stream(
+            select(Room.id, Room.latitude, Room.longitude)
+            .where(Room.status == RoomStatus.ACTIVE, Room.is_available, Room.latitude.is_not(None),
+                   Room.longitude.is_not(None))
+            .execution_options(yield_per=5000)
+        )
+        async for room_id, lat, lon in rows:
+            self.add_room(room_id, lat, lon)
+        self.loaded = True
+
+    def add_room(self, room_id: int, lat: float, lon: float) -> None:
+        self.remove_room(room_id)
+        cell = self._cell(lat, lon)
+        self._cells[cell][room_id] = (math.radians(lat), math.radians(lon), math.cos(math.radians(lat)))
+        self._room_cell[room_id] = cell
+
+    def remove_room(self, room_id: int) -> None:
+        cell = self._room_cell.pop(room_id, None)
+        if cell is not None:
+            rooms = self._cells[cell]
+            rooms.pop(room_id, None)
+            if not rooms:
+                del self._cells[cell]
+
+    def _scan(self, lat: float, lon: float, radius_km: float) -> Iterator[tuple[float, int]]:
+        """
+        (расстояние, id) комнат не дальше radius_km от точки, в порядке обхода ячеек.
+        Формула гаверсинусов разложена так, чтобы для отброшенных комнат не считать asin/sqrt:
+        координаты комнат в радианах и косинусы их широт хранятся в ячейках заранее.
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        rows = range(math.floor((lat - dlat) / self.cell_deg), math.floor((lat + dlat) / self.cell_deg) + 1)
+        cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = dlat / cos_lat if cos_lat > 1e-9 else 360.0
+        first = math.floor((lon - dlon) / self.cell_deg)
+        last = math.floor((lon + dlon) / self.cell_deg)
+        columns = range(self.columns) if last - first + 1 >= self.columns else range(first, last + 1)
+
+        phi, lam, cos_phi = math.radians(lat), math.radians(lon), math.cos(math.radians(lat))
+        limit = math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi) / 2) ** 2
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        cells = self._cells
+        for row in rows:
+            for column in columns:
+                rooms = cells.get((row, column % self.columns))
+                if not rooms:
+                    continue
+                for room_id, (room_phi, room_lam, room_cos) in rooms.items():
+                    a = sin((room_phi - phi) / 2) ** 2 + cos_phi * room_cos * sin((room_lam - lam) / 2) ** 2
+                    if a <= limit:
+                        yield 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0))), room_id
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list[tuple[float, int]]:
+        """
+        Комнаты в радиусе radius_km, от ближней к дальней
+        :param lat:
+        :param lon:
+        :param radius_km:
+        :return: список (расстояние в км, id комнаты)
+        """
+        return sorted(self._scan(lat, lon, radius_km))
+
+    def iter_nearest(self, lat: float, lon: float, radius_km: float) -> Iterator[tuple[float, int]]:
+        """
+        Комнаты в радиусе radius_km от ближней к дальней, лениво: радиус поиска удваивается,
+        начиная с размера ячейки, и каждое кольцо сортируется отдельно. Ближайшие N комнат
+        находятся без просмотра всего круга.
+        :param lat:
+        :param lon:
+        :param radius_km:
+        :return: итератор (расстояние в км, id комнаты)
+        """
+        inner, outer = -1.0, min(self.cell_deg * KM_PER_DEGREE, radius_km)
+        while inner < radius_km:
+            yield from sorted(hit for hit in self._scan(lat, lon, outer) if hit[0] > inner)
+            inner, outer = outer, min(outer * 2, radius_km)
+
+    def nearest(self, lat: float, lon: float, count: int, radius_km: float) -> list[tuple[float, int]]:
+        hits = []
+        for hit in self.iter_nearest(lat, lon, radius_km):
+            hits.append(hit)
+            if len(hits) == count:
+                break
+        return hits
+
+    def __len__(self) -> int:
+        return len(self._room_cell)
+
+
+geo_index = GeoIndex()
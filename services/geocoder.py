@@ -0,0 +1,97 @@
+"""
+Геокодирование комнат по локальному справочнику населённых пунктов (таблица geoplaces)
+без обращений к внешним сервисам. Точность - центр города; точные координаты владелец
+может передать при создании комнаты. Загрузка справочника из CSV (country,city,latitude,longitude):
+
+    python -m services.geocoder places.csv
+"""
+import argparse
+import asyncio
+import csv
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import async_session_maker, engine
+from models import GeoPlace
+
+IMPORT_BATCH_SIZE = 5000
+
+
+def place_key(country: str, city: str) -> tuple[str, str]:
+    return country.strip().casefold(), city.strip().casefold()
+
+
+class Geocoder:
+    """
+    Справочник координат в памяти процесса: (страна, город) -> (широта, долгота)
+    """
+
+    def __init__(self):
+        self._places: dict[tuple[str, str], tuple[float, float]] = {}
+
+    async def load(self, session: AsyncSession) -> None:
+        rows = await session.execute(select(GeoPlace.country, GeoPlace.city, GeoPlace.latitude, GeoPlace.longitude))
+        self._places = {place_key(country, city): (lat, lon) for country, city, lat, lon in rows}
+
+    def add(self, country: str, city: str, lat: float, lon: float) -> None:
+        self._places[place_key(country, city)] = (lat, lon)
+
+    def locate(self, country: str, city: str) -> tuple[float, float] | None:
+        """
+        Координаты города
+        :param country:
+        :param city:
+        :return: (широта, долгота) или None, если города нет в справочнике
+        """
+        return self._places.get(place_key(country, city))
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+
+geocoder = Geocoder()
+
+
+async def import_places(session: AsyncSession, places: list[tuple[str, str, float, float]]) -> int:
+    """
+    Загрузка справочника пачками INSERT ... ON CONFLICT: существующие города получают новые координаты
+    :param session:
+    :param places: список (страна, город, широта, долгота)
+    :return: количество загруженных строк
+    """
+    rows = {}
+    for country, city, lat, lon in places:
+        country, city = place_key(country, city)
+        rows[country, city] = {'country': country, 'city': city, 'latitude': lat, 'longitude': lon}
+    values = list(rows.values())
+    for start in range(0, len(values), IMPORT_BATCH_SIZE):
+        query = insert(GeoPlace).values(values[start:start + IMPORT_BATCH_SIZE])
+        await session.execute(query.on_conflict_do_update(
+            index_elements=[GeoPlace.country, GeoPlace.city],
+            set_={'latitude': query.excluded.latitude, 'longitude': query.excluded.longitude,
+                  'updated_at': func.now()},
+        ))
+    return len(rows)
+
+
+def read_places(path: str) -> list[tuple[str, str, float, float]]:
+    with open(path, encoding='utf-8', newline='') as file:
+        return [(row['country'], row['city'], float(row['latitude']), float(row['longitude']))
+                for row in csv.DictReader(file)]
+
+
+async def main(args) -> None:
+    places = read_places(args.path)
+    async with async_session_maker() as session:
+        count = await import_places(session, places)
+        await session.commit()
+    print(f'Загружено населённых пунктов: {count}')
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Загрузка справочника координат населённых пунктов')
+    parser.add_argument('path', help='CSV с колонками country,city,latitude,longitude')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,210 @@
+"""
+Синхронизация календарей с внешними площадками (channel manager) в формате iCalendar (.ics).
+Импорт из локального файла вместо удалённой ленты:
+
+    python -m services.ical_service <room_id> <path.ics>
+"""
+import argparse
+import asyncio
+import datetime as dt
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+
+from core.database import async_session_maker, engine
+from core.unit_of_work import on_commit
+from repositories.calendar_repo import CalendarRepo
+from schemas.exception_schemas import CalendarFeedError
+from services.availability_index import availability_index
+from services.calendar_service import calendar_horizon
+
+UID_DOMAIN = 'booking'
+SKIPPED_STATUSES = {'CANCELLED'}
+
+
+def unfold(text: str) -> list[str]:
+    """
+    Строки iCalendar с объединёнными переносами (RFC 5545, 3.1)
+    """
+    lines: list[str] = []
+    for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        if line[:1] in (' ', '\t') and lines:
+            lines[-1] += line[1:]
+        elif line:
+            lines.append(line)
+    return lines
+
+
+def parse_date(value: str) -> dt.date:
+    """
+    Дата из DTSTART/DTEND: YYYYMMDD или YYYYMMDDTHHMMSS[Z]. Время отбрасывается -
+    выезд в день DTEND оставляет ночь этого дня свободной.
+    """
+    try:
+        return dt.datetime.strptime(value[:8], '%Y%m%d').date()
+    except ValueError:
+        raise CalendarFeedError(f'Некорректная дата в календаре: {value}')
+
+
+def merge_ranges(ranges: list[tuple[dt.date, dt.date]]) -> list[tuple[dt.date, dt.date]]:
+    merged: list[tuple[dt.date, dt.date]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def parse_ics(text: str, date_from: dt.date, date_to: dt.date) -> list[tuple[dt.date, dt.date]]:
+    """
+    Занятые диапазоны дат из ленты .ics, обрезанные по [date_from, date_to) и объединённые.
+    Отменённые события и события из нашей же ленты (UID @booking) пропускаются.
+    :param text:
+    :param date_from:
+    :param date_to:
+    :return: список (start, end), end не включается
+    """
+    lines = unfold(text)
+    if not lines or lines[0].strip().upper() != 'BEGIN:VCALENDAR':
+        raise CalendarFeedError('Файл не является календарём iCalendar')
+
+    ranges, event = [], None
+    for line in lines:
+        name, _, value = line.partition(':')
+        name = name.split(';')[0].strip().upper()
+        value = value.strip()
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event = {}
+        elif name == 'END' and value.upper() == 'VEVENT' and event is not None:
+            if ('DTSTART' in event and event.get('STATUS', '').upper() not in SKIPPED_STATUSES
+                    and not event.get('UID', '').endswith(f'@{UID_DOMAIN}')):
+                start = parse_date(event['DTSTART'])
+                end = parse_date(event['DTEND']) if 'DTEND' in event else start
+                end = max(end, start + dt.timedelta(days=1))
+                start, end = max(start, date_from), min(end, date_to)
+                if start < end:
+                    ranges.append((start, end))
+            event = None
+        elif event is not None:
+            event[name] = value
+    return merge_ranges(ranges)
+
+
+def render_ics(room_id: int, ranges, stamp: dt.datetime) -> str:
+    """
+    Лента .ics комнаты: одно событие на непрерывный диапазон недоступных дней
+    :param room_id:
+    :param ranges: строки (start, end, booked)
+    :param stamp: время последнего изменения календаря (UTC)
+    :return: str
+    """
+    dtstamp = stamp.strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//Booking//Room {room_id}//RU',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+    ]
+    for start, end, booked in ranges:
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:room-{room_id}-{start:%Y%m%d}@{UID_DOMAIN}',
+            f'DTSTAMP:{dtstamp}',
+            f'DTSTART;VALUE=DATE:{start:%Y%m%d}',
+            f'DTEND;VALUE=DATE:{end:%Y%m%d}',
+            f"SUMMARY:{'Забронировано' if booked else 'Недоступно'}",
+            'TRANSP:OPAQUE',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def is_not_modified(headers, etag: str, last_modified: dt.datetime) -> bool:
+    """
+    Проверка условного запроса: If-None-Match имеет приоритет над If-Modified-Since
+    """
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return '*' in tags or etag in tags
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class CalendarSyncService:
+    """
+    Экспорт календаря комнаты в .ics и импорт блокировок из ленты внешней площадки
+    """
+
+    def __init__(self, calendar_repo: CalendarRepo):
+        self.calendar_repo = calendar_repo
+
+    async def feed_version(self, room_id: int) -> tuple[str, dt.datetime] | None:
+        """
+        ETag и Last-Modified ленты комнаты одним агрегирующим запросом, без построения самой ленты
+        :param room_id:
+        :return: (etag, last_modified) или None, если календаря нет
+        """
+        today = dt.date.today()
+        last_modified, days = await self.calendar_repo.feed_version(room_id, today)
+        if not days:
+            return None
+        last_modified = last_modified.replace(tzinfo=dt.timezone.utc)
+        digest = hashlib.sha1(f'{room_id}:{today}:{days}:{last_modified.isoformat()}'.encode()).hexdigest()
+        return f'"{digest[:20]}"', last_modified
+
+    @staticmethod
+    def http_date(value: dt.datetime) -> str:
+        return format_datetime(value, usegmt=True)
+
+    async def render_feed(self, room_id: int, last_modified: dt.datetime) -> str:
+        ranges = await self.calendar_repo.busy_ranges(room_id, dt.date.today())
+        return render_ics(room_id, ranges, last_modified)
+
+    async def import_feed(self, room_id: int, text: str) -> tuple[int, int]:
+        """
+        Применение ленты: дни из её событий блокируются, прежние блокировки вне событий снимаются.
+        Индекс доступности обновляется после commit.
+        :param room_id:
+        :param text: содержимое .ics
+        :return: (заблокировано дней, разблокировано дней)
+        """
+        today = dt.date.today()
+        ranges = parse_ics(text, today, calendar_horizon() + dt.timedelta(days=1))
+        changed = await self.calendar_repo.apply_blocked_ranges(room_id, ranges, today)
+        blocked = [day for day, is_blocked, _ in changed if is_blocked]
+        unblocked = [day for day, is_blocked, _ in changed if not is_blocked]
+        freed = [day for day, is_blocked, is_free in changed if not is_blocked and is_free]
+
+        def update_index():
+            for start, end in ranges:
+                availability_index.block(room_id, start, end)
+            availability_index.unblock(room_id, unblocked)
+            availability_index.set_free(room_id, freed)
+
+        on_commit(self.calendar_repo.session, update_index)
+        return len(blocked), len(unblocked)
+
+
+async def main(args) -> None:
+    with open(args.path, encoding='utf-8') as file:
+        text = file.read()
+    async with async_session_maker() as session:
+        blocked, unblocked = await CalendarSyncService(CalendarRepo(session)).import_feed(args.room_id, text)
+        await session.commit()
+    print(f'Комната {args.room_id}: заблокировано дней {blocked}, разблокировано {unblocked}')
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Импорт блокировок комнаты из файла .ics')
+    parser.add_argument('room_id', type=int)
+    parser.add_argument('path')
+    asyncio.run(main(parser.parse_args()))
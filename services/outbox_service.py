@@ -0,0 +1,215 @@
+"""
+Доставка исходящих событий (transactional outbox). Брони пишут события в таблицу outboxevents
+в своей транзакции, а фоновая задача забирает их пачками с SKIP LOCKED и отправляет в приёмник
+с ограниченной параллельностью и повторными попытками. Запрос бронирования не ждёт доставки.
+Доставка - не реже одного раза: приёмник должен отбрасывать повторы по id события.
+
+Приёмник задаётся OUTBOX_SINK_URL:
+    file:///var/log/booking/events.jsonl - строки JSON в файл
+    memory:// - очередь asyncio.Queue в памяти процесса (для тестов и локального запуска)
+Без OUTBOX_SINK_URL события накапливаются в таблице до настройки приёмника.
+"""
+import asyncio
+import datetime as dt
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from core.database import async_session_maker
+from core.metrics import registry
+from core.settings import settings
+from core.tasks import PeriodicTask
+from repositories.outbox_repo import OutboxRepo
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_SENT = registry.counter('outbox_events_sent_total', 'Доставленные исходящие события')
+OUTBOX_RETRIED = registry.counter('outbox_events_retried_total', 'Отложенные после ошибки доставки события')
+OUTBOX_FAILED = registry.counter('outbox_events_failed_total', 'События, не доставленные за все попытки')
+OUTBOX_SEND_SECONDS = registry.histogram('outbox_send_seconds', 'Длительность отправки события в приёмник')
+ERROR_MAX_LENGTH = 500
+
+
+@dataclass(frozen=True)
+class OutboxMessage:
+    id: int
+    event_type: str
+    aggregate_id: int
+    payload: dict[str, Any]
+    attempts: int
+    created_at: dt.datetime
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'id': self.id,
+            'type': self.event_type,
+            'aggregate_id': self.aggregate_id,
+            'created_at': self.created_at.isoformat(),
+            'payload': self.payload,
+        }, ensure_ascii=False)
+
+
+class OutboxSink(Protocol):
+    """
+    Приёмник событий (почта, вебхуки, брокер). Ошибка send означает, что событие не доставлено
+    """
+
+    async def send(self, message: OutboxMessage) -> None: ...
+
+
+class FileSink:
+    """
+    Приёмник-заглушка: события дописываются строками JSON в файл
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = asyncio.Lock()
+
+    def _write(self, line: str) -> None:
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(line)
+
+    async def send(self, message: OutboxMessage) -> None:
+        line = message.to_json() + '\n'
+        async with self._lock:
+            await asyncio.to_thread(self._write, line)
+
+
+class QueueSink:
+    """
+    Приёмник в памяти процесса. Переполненная очередь - ошибка доставки, событие будет отправлено повторно
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.queue: asyncio.Queue[OutboxMessage] = asyncio.Queue(maxsize)
+
+    async def send(self, message: OutboxMessage) -> None:
+        self.queue.put_nowait(message)
+
+
+def build_sink(url: str | None = None) -> OutboxSink | None:
+    url = url or settings.OUTBOX_SINK_URL
+    if not url:
+        return None
+    if url == 'memory://':
+        return QueueSink()
+    if url.startswith('file://'):
+        return FileSink(url.removeprefix('file://'))
+    raise RuntimeError(f'Неизвестный приёмник событий: {url}')
+
+
+outbox_sink = build_sink()
+
+
+def retry_delay(attempts: int) -> int:
+    """
+    Экспоненциальная задержка перед следующей попыткой
+    :param attempts: номер неудачной попытки, начиная с 1
+    :return: секунды
+    """
+    return min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_SECONDS)
+
+
+async def deliver(sink: OutboxSink, messages: list[OutboxMessage], concurrency: int) -> dict[int, str]:
+    """
+    Параллельная отправка пачки, не больше concurrency событий одновременно.
+    В пачке нет двух событий одной брони (см. OutboxRepo.claim), поэтому порядок между ними не важен
+    :param sink:
+    :param messages:
+    :param concurrency:
+    :return: {id события: текст ошибки} для недоставленных
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    errors: dict[int, str] = {}
+
+    async def send(message: OutboxMessage) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(sink.send(message), settings.OUTBOX_SEND_TIMEOUT_SECONDS)
+            except Exception as e:
+                errors[message.id] = f'{type(e).__name__}: {e}'[:ERROR_MAX_LENGTH]
+            OUTBOX_SEND_SECONDS.observe(time.perf_counter() - started)
+
+    await asyncio.gather(*(send(message) for message in messages))
+    return errors
+
+
+async def dispatch_outbox(sink: OutboxSink | None = None, batch_size: int | None = None) -> int:
+    """
+    Доставка всех готовых событий пачками. Захват пачки и запись результатов - короткие отдельные транзакции,
+    во время отправки строки не заблокированы: от других экземпляров их защищает срок аренды (OUTBOX_LEASE_SECONDS,
+    настройки проверяют, что его хватает на отправку пачки). Результаты пишутся только для событий,
+    аренда которых не перешла к другому экземпляру.
+    Недоставленные события откладываются с экспоненциальной задержкой, после OUTBOX_MAX_ATTEMPTS попыток
+    помечаются failed_at
+    :param sink:
+    :param batch_size:
+    :return: количество доставленных событий
+    """
+    sink = sink or outbox_sink
+    if sink is None:
+        return 0
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    waves = math.ceil(batch_size / settings.OUTBOX_CONCURRENCY)
+    lease = dt.timedelta(seconds=max(settings.OUTBOX_LEASE_SECONDS, waves * settings.OUTBOX_SEND_TIMEOUT_SECONDS))
+    total = 0
+    while True:
+        async with async_session_maker() as session:
+            rows = await OutboxRepo(session).claim(batch_size, lease)
+            await session.commit()
+        if not rows:
+            break
+
+        messages = [OutboxMessage(**row._mapping) for row in rows]
+        errors = await deliver(sink, messages, settings.OUTBOX_CONCURRENCY)
+        sent = [(message.id, message.attempts) for message in messages if message.id not in errors]
+        failures = [
+            (message.id, message.attempts, errors[message.id],
+             retry_delay(message.attempts) if message.attempts < settings.OUTBOX_MAX_ATTEMPTS else None)
+            for message in messages if message.id in errors
+        ]
+        async with async_session_maker() as session:
+            outbox_repo = OutboxRepo(session)
+            marked = await outbox_repo.mark_sent(sent)
+            marked += await outbox_repo.mark_failed(failures)
+            await session.commit()
+        if marked < len(messages):
+            logger.warning('Аренда %d событий outbox истекла до записи результата, их обработает другой экземпляр',
+                           len(messages) - marked)
+
+        given_up = [event_id for event_id, _, _, delay in failures if delay is None]
+        OUTBOX_SENT.inc(len(sent))
+        OUTBOX_RETRIED.inc(len(failures) - len(given_up))
+        OUTBOX_FAILED.inc(len(given_up))
+        if given_up:
+            logger.error('События outbox не доставлены за %d попыток: %s', settings.OUTBOX_MAX_ATTEMPTS, given_up)
+        total += len(sent)
+    return total
+
+
+async def purge_outbox() -> int:
+    """
+    Удаление доставленных событий старше OUTBOX_RETENTION_HOURS пачками
+    :return: количество удалённых событий
+    """
+    older_than = dt.timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    total = 0
+    while True:
+        async with async_session_maker() as session:
+            deleted = await OutboxRepo(session).purge_sent(older_than, settings.OUTBOX_BATCH_SIZE * 10)
+            await session.commit()
+        total += deleted
+        if deleted < settings.OUTBOX_BATCH_SIZE * 10:
+            break
+    if total:
+        logger.info('Удалено доставленных событий outbox: %d', total)
+    return total
+
+
+outbox_dispatch_task = PeriodicTask('outbox-dispatcher', dispatch_outbox, settings.OUTBOX_POLL_INTERVAL_SECONDS)
+outbox_purge_task = PeriodicTask('outbox-purge', purge_outbox, 3600)
@@ -0,0 +1,205 @@
+"""
+Помесячные секции таблицы календаря (RANGE по date). Секции создаются заранее до горизонта календаря,
+секции старше CALENDAR_PARTITION_RETENTION_MONTHS отключаются от таблицы и переносятся в схему archive,
+где остаются доступными для выгрузок, но не раздувают индексы рабочих запросов.
+Перевод существующей несекционированной таблицы:
+
+    python -m services.partition_service --convert
+"""
+import argparse
+import asyncio
+import datetime as dt
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from core.database import engine
+from core.settings import settings
+from core.tasks import PeriodicTask
+from models import AvailabilityCalendar
+from services.calendar_service import calendar_horizon
+
+logger = logging.getLogger(__name__)
+
+PARENT = AvailabilityCalendar.__tablename__
+ARCHIVE_SCHEMA = 'archive'
+LEGACY_SUFFIX = '_legacy'
+# Ключ pg_advisory_xact_lock: секции меняет только один процесс за раз (несколько экземпляров приложения
+# запускают обслуживание одновременно при старте)
+PARTITION_LOCK = 1002
+
+
+def add_months(month: dt.date, count: int) -> dt.date:
+    index = month.year * 12 + month.month - 1 + count
+    return dt.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: dt.date) -> str:
+    return f'{PARENT}_p{month:%Y_%m}'
+
+
+def partition_month(name: str) -> dt.date | None:
+    try:
+        return dt.datetime.strptime(name.removeprefix(f'{PARENT}_p'), '%Y_%m').date()
+    except ValueError:
+        return None
+
+
+def quote(conn: AsyncConnection, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    return bool(await conn.scalar(text("""
+        SELECT count(*) FROM pg_partitioned_table
+        JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+        WHERE pg_class.relname = :parent AND pg_class.relnamespace = 'public'::regnamespace
+    """), {'parent': PARENT}))
+
+
+async def attached_partitions(conn: AsyncConnection) -> dict[dt.date, str]:
+    """
+    Подключённые секции календаря
+    :param conn:
+    :return: {первый день месяца: имя секции}
+    """
+    rows = await conn.execute(text("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :parent AND parent.relnamespace = 'public'::regnamespace
+    """), {'parent': PARENT})
+    partitions = {}
+    for name, in rows:
+        month = partition_month(name)
+        if month is not None:
+            partitions[month] = name
+    return partitions
+
+
+async def lock_partitions(conn: AsyncConnection) -> None:
+    """
+    Блокировка изменения секций до конца транзакции conn
+    """
+    await conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': PARTITION_LOCK})
+
+
+async def create_partition(conn: AsyncConnection, month: dt.date) -> None:
+    await conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS {quote(conn, partition_name(month))} PARTITION OF {quote(conn, PARENT)} '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+
+async def detach_partition(conn: AsyncConnection, name: str) -> None:
+    await conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS {quote(conn, ARCHIVE_SCHEMA)}'))
+    await conn.execute(text(f'ALTER TABLE {quote(conn, PARENT)} DETACH PARTITION {quote(conn, name)}'))
+    await conn.execute(text(f'ALTER TABLE {quote(conn, name)} SET SCHEMA {quote(conn, ARCHIVE_SCHEMA)}'))
+
+
+async def maintain_partitions() -> tuple[list[str], list[str]]:
+    """
+    Создание недостающих секций от текущего месяца до горизонта календаря с запасом
+    и отключение секций старше срока хранения. Каждая секция - отдельная короткая транзакция,
+    чтобы блокировка родительской таблицы держалась как можно меньше. Транзакция берёт PARTITION_LOCK
+    и заново проверяет секцию: если её уже создал или отключил другой процесс, секция пропускается.
+    :return: (созданные секции, отключённые секции)
+    """
+    current = dt.date.today().replace(day=1)
+    last = add_months(calendar_horizon().replace(day=1), settings.CALENDAR_PARTITION_MONTHS_AHEAD)
+    oldest_kept = add_months(current, -settings.CALENDAR_PARTITION_RETENTION_MONTHS)
+
+    async with engine.connect() as conn:
+        if not await is_partitioned(conn):
+            logger.error('Таблица %s не секционирована, выполните python -m services.partition_service --convert',
+                         PARENT)
+            return [], []
+        existing = await attached_partitions(conn)
+
+    created, detached = [], []
+    month = current
+    while month <= last:
+        if month not in existing:
+            async with engine.begin() as conn:
+                await lock_partitions(conn)
+                if month not in await attached_partitions(conn):
+                    await create_partition(conn, month)
+                    created.append(partition_name(month))
+        month = add_months(month, 1)
+
+    for month, name in sorted(existing.items()):
+        if month < oldest_kept:
+            async with engine.begin() as conn:
+                await lock_partitions(conn)
+                if month in await attached_partitions(conn):
+                    await detach_partition(conn, name)
+                    detached.append(name)
+
+    if created or detached:
+        logger.info('Секции календаря: создано %s, перенесено в %s: %s', created, ARCHIVE_SCHEMA, detached)
+    return created, detached
+
+
+async def convert_to_partitioned() -> int:
+    """
+    Перевод несекционированной таблицы календаря на секции в одной транзакции:
+    старая таблица и её индексы переименовываются, новая создаётся по модели, секции покрывают
+    весь диапазон дат, строки копируются с сохранением id. Старая таблица остаётся с суффиксом _legacy.
+    :return: количество перенесённых строк
+    """
+    table = AvailabilityCalendar.__table__
+    legacy = PARENT + LEGACY_SUFFIX
+    async with engine.begin() as conn:
+        await lock_partitions(conn)
+        if await is_partitioned(conn):
+            logger.info('Таблица %s уже секционирована', PARENT)
+            return 0
+        indexes = await conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = :parent"
+        ), {'parent': PARENT})
+        for index, in indexes.all():
+            await conn.execute(text(f'ALTER INDEX {quote(conn, index)} RENAME TO {quote(conn, index + LEGACY_SUFFIX)}'))
+        await conn.execute(text(f'ALTER TABLE {quote(conn, PARENT)} RENAME TO {quote(conn, legacy)}'))
+        await conn.run_sync(table.create)
+
+        first, last = (await conn.execute(text(
+            f'SELECT min(date), max(date) FROM {quote(conn, legacy)}'
+        ))).one()
+        month = (first or dt.date.today()).replace(day=1)
+        last = max(last or dt.date.today(), calendar_horizon())
+        while month <= last:
+            await create_partition(conn, month)
+            month = add_months(month, 1)
+
+        columns = ', '.join(quote(conn, column.name) for column in table.columns)
+        copied = await conn.execute(text(
+            f'INSERT INTO {quote(conn, PARENT)} ({columns}) SELECT {columns} FROM {quote(conn, legacy)}'
+        ))
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{PARENT}', 'id'), "
+            f'(SELECT coalesce(max(id), 0) + 1 FROM {quote(conn, PARENT)}), false)'
+        ))
+    logger.info('Перенесено строк в секционированную таблицу %s: %d, старая таблица: %s',
+                PARENT, copied.rowcount, legacy)
+    return copied.rowcount
+
+
+calendar_partition_task = PeriodicTask(
+    'calendar-partitions', maintain_partitions, settings.CALENDAR_PARTITION_INTERVAL_HOURS * 3600
+)
+
+
+async def main(args) -> None:
+    if args.convert:
+        await convert_to_partitioned()
+    created, detached = await maintain_partitions()
+    print(f'Создано секций: {len(created)}, перенесено в архив: {len(detached)}')
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Обслуживание секций календаря')
+    parser.add_argument('--convert', action='store_true', help='Перевести существующую таблицу на секции')
+    asyncio.run(main(parser.parse_args()))
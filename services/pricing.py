@@ -0,0 +1,277 @@
+import datetime as dt
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import select, cast, func, BigInteger, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.cache import TTLCache, MISSING
+from core.settings import settings
+from models import Room, AvailabilityCalendar, StayDiscount
+from repositories.calendar_repo import WEEKEND_DAYS
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+@dataclass(frozen=True)
+class StayQuote:
+    """
+    Расчёт стоимости проживания.
+    total = стоимость ночей - скидка за длительность + уборка, залог возвращаемый и в total не входит.
+    """
+    room_id: int
+    check_in: dt.date
+    check_out: dt.date
+    nights: int
+    nightly_total: Decimal | None = None
+    discount: Decimal | None = None
+    cleaning_fee: Decimal | None = None
+    security_deposit: Decimal | None = None
+    total: Decimal | None = None
+    error: str | None = None
+
+
+@dataclass
+class TariffTable:
+    """
+    Тарифы комнат в виде столбцов NumPy. Денежные значения хранятся в копейках/центах (int64),
+    weekend_multiplier - в сотых долях, чтобы все вычисления были целочисленными и точными до цента.
+    """
+    room_ids: np.ndarray
+    base_price: np.ndarray
+    weekend_multiplier: np.ndarray
+    cleaning_fee: np.ndarray
+    security_deposit: np.ndarray
+    min_stay: np.ndarray
+    max_stay: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows) -> "TariffTable":
+        rows = list(rows)
+
+        def column(i: int, scale: int = 1) -> np.ndarray:
+            return np.array([int(row[i] * scale) for row in rows], dtype=np.int64)
+
+        return cls(
+            room_ids=column(0),
+            base_price=column(1, 100),
+            weekend_multiplier=column(2, 100),
+            cleaning_fee=column(3, 100),
+            security_deposit=column(4, 100),
+            min_stay=column(5),
+            max_stay=column(6),
+        )
+
+    def positions(self, room_ids: np.ndarray) -> np.ndarray:
+        """
+        Номера строк таблицы для переданных id комнат, -1 для неизвестных
+        """
+        if not len(self.room_ids):
+            return np.full(len(room_ids), -1, dtype=np.int64)
+        order = np.argsort(self.room_ids)
+        sorted_ids = self.room_ids[order]
+        idx = np.clip(np.searchsorted(sorted_ids, room_ids), 0, len(sorted_ids) - 1)
+        found = sorted_ids[idx] == room_ids
+        return np.where(found, order[idx], -1)
+
+
+@dataclass(frozen=True)
+class RoomPrices:
+    """
+    Скомпилированные цены комнаты: cents[i] - цена ночи epoch + i дней из календаря в копейках
+    (0 - строки календаря нет), discounts - пары (min_nights, скидка в сотых долях процента)
+    """
+    epoch: dt.date
+    cents: np.ndarray
+    discounts: tuple[tuple[int, int], ...] = ()
+
+    def discount(self, nights: int) -> int:
+        return max((basis_points for min_nights, basis_points in self.discounts if nights >= min_nights), default=0)
+
+
+price_cache = TTLCache(settings.PRICE_CACHE_MAX_ROOMS, settings.PRICE_CACHE_TTL)
+
+
+def to_days(dates: Sequence[dt.date]) -> np.ndarray:
+    return (np.array(dates, dtype='datetime64[D]') - EPOCH).astype(np.int64)
+
+
+def to_decimal(cents: int) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def nightly_prices(tariffs: TariffTable, start: dt.date, days: int) -> np.ndarray:
+    """
+    Матрица цен ночей [комната, день] начиная с start по базовому тарифу.
+    Цена выходного округляется до цента half-up так же, как round(numeric, 2) в Postgres.
+    :param tariffs:
+    :param start:
+    :param days:
+    :return: np.ndarray int64 (копейки)
+    """
+    day_numbers = to_days([start])[0] + np.arange(days)
+    isodow = (day_numbers + 3) % 7 + 1
+    weekend = np.isin(isodow, WEEKEND_DAYS)
+    weekend_price = (tariffs.base_price * tariffs.weekend_multiplier + 50) // 100
+    return np.where(weekend[np.newaxis, :], weekend_price[:, np.newaxis], tariffs.base_price[:, np.newaxis])
+
+
+def quote_batch(tariffs: TariffTable, prices: np.ndarray, start: dt.date,
+                stays: Sequence[tuple[int, dt.date, dt.date]],
+                discounts: np.ndarray | None = None) -> list[StayQuote]:
+    """
+    Пакетный расчёт стоимости проживаний по матрице цен ночей.
+    Суммы по диапазонам считаются через префиксные суммы - O(1) на проживание без циклов по дням.
+    :param tariffs: тарифы комнат
+    :param prices: матрица цен [строка tariffs, день от start] в копейках
+    :param start: дата первого столбца матрицы
+    :param stays: список (room_id, check_in, check_out)
+    :param discounts: скидка за длительность каждого проживания в сотых долях процента
+    :return: список StayQuote в порядке stays
+    """
+    if not stays:
+        return []
+    room_ids = np.array([stay[0] for stay in stays], dtype=np.int64)
+    first = to_days([stay[1] for stay in stays]) - to_days([start])[0]
+    last = to_days([stay[2] for stay in stays]) - to_days([start])[0]
+    nights = last - first
+    rows = tariffs.positions(room_ids)
+
+    prefix = np.zeros((prices.shape[0], prices.shape[1] + 1), dtype=np.int64)
+    np.cumsum(prices, axis=1, out=prefix[:, 1:])
+
+    known = rows >= 0
+    in_range = (first >= 0) & (last <= prices.shape[1]) & (nights > 0)
+    safe_rows = np.where(known, rows, 0)
+    min_stay, max_stay = tariffs.min_stay[safe_rows], tariffs.max_stay[safe_rows]
+    valid = known & in_range & (nights >= min_stay) & (nights <= max_stay)
+
+    safe_first, safe_last = np.where(valid, first, 0), np.where(valid, last, 0)
+    nightly_total = prefix[safe_rows, safe_last] - prefix[safe_rows, safe_first]
+    cleaning = tariffs.cleaning_fee[safe_rows]
+    deposit = tariffs.security_deposit[safe_rows]
+    if discounts is None:
+        discounts = np.zeros(len(stays), dtype=np.int64)
+    discount = (nightly_total * discounts + 5000) // 10000
+
+    quotes = []
+    for i, (room_id, check_in, check_out) in enumerate(stays):
+        if valid[i]:
+            quotes.append(StayQuote(
+                room_id=room_id, check_in=check_in, check_out=check_out, nights=int(nights[i]),
+                nightly_total=to_decimal(nightly_total[i]),
+                discount=to_decimal(discount[i]),
+                cleaning_fee=to_decimal(cleaning[i]),
+                security_deposit=to_decimal(deposit[i]),
+                total=to_decimal(nightly_total[i] - discount[i] + cleaning[i]),
+            ))
+            continue
+        if not known[i]:
+            error = 'Комната не найдена'
+        elif not in_range[i]:
+            error = 'Некорректный диапазон дат'
+        else:
+            error = f'Длительность проживания должна быть от {min_stay[i]} до {max_stay[i]} ночей'
+        quotes.append(StayQuote(room_id=room_id, check_in=check_in, check_out=check_out,
+                                nights=int(nights[i]), error=error))
+    return quotes
+
+
+async def load_room_prices(session: AsyncSession, room_ids: Sequence[int]) -> dict[int, RoomPrices]:
+    """
+    Скомпилированные цены комнат из price_cache; недостающие комнаты загружаются двумя запросами:
+    цены календаря с сегодняшнего дня одним массивом на комнату и скидки за длительность
+    :param session:
+    :param room_ids:
+    :return: {id комнаты: RoomPrices}
+    """
+    result, missing = {}, []
+    for room_id in room_ids:
+        prices = price_cache.get(room_id)
+        if prices is MISSING:
+            missing.append(room_id)
+        else:
+            result[room_id] = prices
+    if not missing:
+        return result
+
+    today = dt.date.today()
+    calendar = AvailabilityCalendar
+    calendar_rows = await session.execute(
+        select(calendar.property_id, func.array_agg(calendar.date - today),
+               func.array_agg(cast(calendar.price * 100, BigInteger)))
+        .where(calendar.property_id.in_(missing), calendar.date >= today)
+        .group_by(calendar.property_id)
+    )
+    vectors = {}
+    for room_id, offsets, cents in calendar_rows:
+        vector = np.zeros(max(offsets) + 1, dtype=np.int64)
+        vector[np.array(offsets, dtype=np.int64)] = np.array(cents, dtype=np.int64)
+        vectors[room_id] = vector
+    discount_rows = await session.execute(
+        select(StayDiscount.property_id, StayDiscount.min_nights, cast(StayDiscount.percent * 100, Integer))
+        .where(StayDiscount.property_id.in_(missing))
+    )
+    discounts: dict[int, list[tuple[int, int]]] = {}
+    for room_id, min_nights, basis_points in discount_rows:
+        discounts.setdefault(room_id, []).append((min_nights, basis_points))
+
+    for room_id in missing:
+        prices = RoomPrices(
+            epoch=today,
+            cents=vectors.get(room_id, np.zeros(0, dtype=np.int64)),
+            discounts=tuple(discounts.get(room_id, ())),
+        )
+        price_cache.set(room_id, prices)
+        result[room_id] = prices
+    return result
+
+
+def invalidate_prices(room_ids: Sequence[int]) -> None:
+    for room_id in room_ids:
+        price_cache.delete(room_id)
+
+
+async def quote_stays(session: AsyncSession, stays: Sequence[tuple[int, dt.date, dt.date]]) -> list[StayQuote]:
+    """
+    Расчёт стоимости для набора (room_id, check_in, check_out): тарифы комнат одним запросом,
+    цены ночей и скидки - из скомпилированных векторов price_cache. Дни без строки в календаре
+    считаются по базовому тарифу.
+    :param session:
+    :param stays:
+    :return: список StayQuote в порядке stays
+    """
+    if not stays:
+        return []
+    room_ids = sorted({stay[0] for stay in stays})
+    start = min(stay[1] for stay in stays)
+    end = max(stay[2] for stay in stays)
+
+    tariff_rows = await session.execute(
+        select(Room.id, Room.base_price, Room.weekend_multiplier, Room.cleaning_fee,
+               Room.security_deposit, Room.min_stay, Room.max_stay)
+        .where(Room.id.in_(room_ids))
+    )
+    tariffs = TariffTable.from_rows(tariff_rows)
+    days = max((end - start).days, 0)
+    prices = nightly_prices(tariffs, start, days)
+
+    room_prices = await load_room_prices(session, room_ids)
+    for row, room_id in enumerate(tariffs.room_ids.tolist()):
+        compiled = room_prices.get(room_id)
+        if compiled is None:
+            continue
+        shift = (start - compiled.epoch).days
+        first, last = max(shift, 0), min(shift + days, len(compiled.cents))
+        if first < last:
+            segment = compiled.cents[first:last]
+            target = prices[row, first - shift:last - shift]
+            np.copyto(target, segment, where=segment > 0)
+
+    discounts = np.array([
+        room_prices[room_id].discount((check_out - check_in).days) if room_id in room_prices else 0
+        for room_id, check_in, check_out in stays
+    ], dtype=np.int64)
+    return quote_batch(tariffs, prices, start, stays, discounts)
@@ -0,0 +1,77 @@
+from core.unit_of_work import on_commit
+from repositories.calendar_repo import CalendarRepo
+from repositories.rate_repo import RateRepo
+from schemas.exception_schemas import RoomNotFound
+from schemas.rate_schemas import SeasonUpdate, StayDiscountItem, RatesApplied
+from services.pricing import invalidate_prices
+
+
+class RatePlanService:
+    """
+    Сезонные правила цены и скидки за длительность. Правила компилируются в цены календаря
+    в той же транзакции, поэтому бронь всегда берёт цену из календаря. Скомпилированные цены
+    в памяти (price_cache) сбрасываются после commit. Вызывающий код отвечает за commit/rollback.
+    """
+
+    def __init__(self, rate_repo: RateRepo, calendar_repo: CalendarRepo):
+        self.rate_repo = rate_repo
+        self.calendar_repo = calendar_repo
+
+    async def _recompile(self, room_ids: set[int], ranges) -> RatesApplied:
+        if not room_ids:
+            return RatesApplied(rooms=0, days_changed=0)
+        date_from = min(date_from for date_from, _ in ranges)
+        date_to = max(date_to for _, date_to in ranges)
+        changed = await self.calendar_repo.apply_rate_plans(sorted(room_ids), date_from, date_to)
+        on_commit(self.rate_repo.session, lambda: invalidate_prices(list(room_ids)))
+        return RatesApplied(rooms=len(room_ids), days_changed=sum(changed.values()))
+
+    async def replace_season(self, owner_id: int, name: str, season: SeasonUpdate) -> RatesApplied:
+        """
+        Замена сезона name на комнатах season.room_ids: старые правила сезона удаляются со всех комнат владельца,
+        новые вставляются одним запросом, затем цены календаря пересчитываются одним UPDATE
+        на объединении старых и новых комнат и дат
+        :param owner_id:
+        :param name:
+        :param season:
+        :return: RatesApplied
+        """
+        deleted = await self.rate_repo.delete_season(owner_id, name)
+        inserted = await self.rate_repo.insert_season(owner_id, name, season)
+        missing = set(season.room_ids) - set(inserted)
+        if missing:
+            raise RoomNotFound(f'Комнаты с id: {sorted(missing)} не найдены у владельца')
+
+        room_ids = set(inserted) | {room_id for room_id, _, _ in deleted}
+        ranges = [(season.date_from, season.date_to)] + [(date_from, date_to) for _, date_from, date_to in deleted]
+        return await self._recompile(room_ids, ranges)
+
+    async def delete_season(self, owner_id: int, name: str) -> RatesApplied:
+        """
+        Удаление сезона name со всех комнат владельца и возврат цен календаря к оставшимся правилам и тарифу
+        :param owner_id:
+        :param name:
+        :return: RatesApplied
+        """
+        deleted = await self.rate_repo.delete_season(owner_id, name)
+        if not deleted:
+            raise RoomNotFound(f'Сезон {name} не найден')
+        return await self._recompile({room_id for room_id, _, _ in deleted},
+                                     [(date_from, date_to) for _, date_from, date_to in deleted])
+
+    async def replace_discounts(self, owner_id: int, room_ids: list[int],
+                                discounts: list[StayDiscountItem]) -> RatesApplied:
+        """
+        Замена скидок за длительность на комнатах владельца. Цены календаря не меняются:
+        скидка применяется к сумме ночей при расчёте и бронировании
+        :param owner_id:
+        :param room_ids:
+        :param discounts:
+        :return: RatesApplied
+        """
+        owned = await self.rate_repo.replace_discounts(owner_id, room_ids, discounts)
+        missing = set(room_ids) - set(owned)
+        if missing:
+            raise RoomNotFound(f'Комнаты с id: {sorted(missing)} не найдены у владельца')
+        on_commit(self.rate_repo.session, lambda: invalidate_prices(owned))
+        return RatesApplied(rooms=len(owned), days_changed=0)
@@ -0,0 +1,183 @@
+import datetime as dt
+from typing import Any
+
+from core.unit_of_work import on_commit
+from models import Room
+from repositories.calendar_repo import CalendarRepo
+from repositories.room_repo import RoomRepo, room_cache
+from schemas.room_schemas import (RoomCreate, RoomBatchUpdateItem, RoomBatchResult, RoomBatchResponse,
+                                  validate_batch)
+from services.availability_index import availability_index
+from services.calendar_service import calendar_horizon
+from services.geo_index import geo_index
+from services.geocoder import geocoder
+from services.pricing import invalidate_prices
+from sql_enums import RoomStatus
+
+PRICE_FIELDS = {'base_price', 'weekend_multiplier'}
+
+
+def update_geo_index(rows) -> None:
+    """
+    Комнаты в индексе координат по строкам ROOM_INDEX_COLUMNS: доступные для поиска добавляются, остальные удаляются
+    """
+    for room in rows:
+        if room.status == RoomStatus.ACTIVE and room.is_available and room.latitude is not None:
+            geo_index.add_room(room.id, room.latitude, room.longitude)
+        else:
+            geo_index.remove_room(room.id)
+
+
+class RoomService:
+    """
+    Сервис комнат: создание комнаты вместе с календарём доступности и пакетные изменения комнат владельца.
+    Вызывающий код отвечает за commit/rollback транзакции
+    """
+
+    def __init__(self, room_repo: RoomRepo, calendar_repo: CalendarRepo):
+        self.room_repo = room_repo
+        self.calendar_repo = calendar_repo
+
+    async def create_room(self, owner_id: int, room_data: RoomCreate) -> Room:
+        """
+        Создание комнаты и генерация её календаря на всё скользящее окно одним запросом.
+        Комната без координат получает координаты города из справочника.
+        Индексы доступности и координат обновляются после commit
+        :param owner_id:
+        :param room_data:
+        :return: Room obj
+        """
+        room = await self.room_repo.create_room(owner_id, self._geocode(room_data))
+        new_dates = await self.calendar_repo.extend_calendars([room.id], calendar_horizon())
+
+        room_id, city, lat, lon = room.id, room.city, room.latitude, room.longitude
+        searchable = room.status == RoomStatus.ACTIVE and room.is_available and lat is not None
+
+        def update_index():
+            availability_index.add_room(room_id, city)
+            availability_index.set_free(room_id, new_dates.get(room_id, ()))
+            if searchable:
+                geo_index.add_room(room_id, lat, lon)
+
+        on_commit(self.calendar_repo.session, update_index)
+        return room
+
+    async def create_rooms(self, owner_id: int, items: list[dict[str, Any]]) -> RoomBatchResponse:
+        """
+        Пакетное создание комнат: элементы проверяются как RoomCreate, корректные вставляются одним INSERT,
+        календари всех новых комнат строятся одним INSERT ... SELECT. Некорректные элементы
+        возвращаются с ошибкой и не мешают остальным
+        :param owner_id:
+        :param items:
+        :return: RoomBatchResponse
+        """
+        valid, errors = validate_batch(RoomCreate, items)
+        results = [RoomBatchResult(index=index, ok=False, error=error) for index, error in errors.items()]
+        indexes = list(valid)
+        rooms = [self._geocode(valid[index]) for index in indexes]
+        created = await self.room_repo.create_rooms(owner_id, rooms)
+        new_dates = {}
+        if created:
+            new_dates = await self.calendar_repo.extend_calendars([room.id for room in created], calendar_horizon())
+        results.extend(RoomBatchResult(index=index, id=room.id, ok=True) for index, room in zip(indexes, created))
+
+        def update_index():
+            for room in created:
+                availability_index.add_room(room.id, room.city)
+                availability_index.set_free(room.id, new_dates.get(room.id, ()))
+            update_geo_index(created)
+
+        on_commit(self.calendar_repo.session, update_index)
+        return RoomBatchResponse.from_results(results)
+
+    async def update_rooms(self, owner_id: int, items: list[dict[str, Any]]) -> RoomBatchResponse:
+        """
+        Пакетное изменение комнат владельца одним UPDATE. Для min_stay/max_stay проверяется итоговая пара значений,
+        при смене города без координат комната геокодируется заново. При смене тарифа цены свободных дней
+        календаря пересчитываются одним запросом
+        :param owner_id:
+        :param items:
+        :return: RoomBatchResponse
+        """
+        valid, errors = validate_batch(RoomBatchUpdateItem, items)
+        results = [RoomBatchResult(index=index, ok=False, error=error) for index, error in errors.items()]
+        current = await self.room_repo.get_owned_rooms(owner_id, [item.id for item in valid.values()])
+
+        accepted: dict[int, tuple[int, RoomBatchUpdateItem]] = {}
+        for index, item in valid.items():
+            room = current.get(item.id)
+            error = None
+            if room is None:
+                error = 'Комната не найдена'
+            elif item.id in accepted:
+                error = 'Комната уже изменяется другим элементом запроса'
+            elif (item.min_stay or room.min_stay) > (item.max_stay or room.max_stay):
+                error = 'min_stay не может быть больше max_stay'
+            if error:
+                results.append(RoomBatchResult(index=index, id=item.id, ok=False, error=error))
+                continue
+            if 'latitude' not in item.model_fields_set and (item.country or item.city):
+                location = geocoder.locate(item.country or room.country, item.city or room.city)
+                if location is not None:
+                    item = item.model_copy(update={'latitude': location[0], 'longitude': location[1]})
+            accepted[item.id] = index, item
+
+        changed = await self.room_repo.update_rooms(owner_id, [item for _, item in accepted.values()])
+        results.extend(RoomBatchResult(index=index, id=room_id, ok=True) for room_id, (index, _) in accepted.items())
+
+        repriced = [room_id for room_id, (_, item) in accepted.items() if PRICE_FIELDS & item.changes().keys()]
+        if repriced:
+            await self.calendar_repo.apply_rate_plans(repriced, dt.date.today(),
+                                                      calendar_horizon() + dt.timedelta(days=1))
+        moved = {room.id: room.city for room in changed if accepted[room.id][1].city}
+        room_ids = list(accepted)
+
+        async def update_index():
+            for room_id, city in moved.items():
+                availability_index.move_room(room_id, city)
+            update_geo_index(changed)
+            invalidate_prices(repriced)
+            await room_cache.invalidate(*room_ids)
+
+        on_commit(self.room_repo.session, update_index)
+        return RoomBatchResponse.from_results(results)
+
+    async def delete_rooms(self, owner_id: int, room_ids: list[int]) -> RoomBatchResponse:
+        """
+        Пакетное удаление комнат владельца одним DELETE. Комнаты с действующими бронями не удаляются
+        :param owner_id:
+        :param room_ids:
+        :return: RoomBatchResponse
+        """
+        owned = await self.room_repo.get_owned_rooms(owner_id, room_ids)
+        deleted = set(await self.room_repo.delete_rooms(owner_id, list(owned)))
+        results, seen = [], set()
+        for index, room_id in enumerate(room_ids):
+            if room_id in deleted and room_id not in seen:
+                results.append(RoomBatchResult(index=index, id=room_id, ok=True))
+            elif room_id in seen:
+                results.append(RoomBatchResult(index=index, id=room_id, ok=False, error='Комната указана повторно'))
+            elif room_id in owned:
+                results.append(RoomBatchResult(index=index, id=room_id, ok=False,
+                                               error='У комнаты есть действующие брони'))
+            else:
+                results.append(RoomBatchResult(index=index, id=room_id, ok=False, error='Комната не найдена'))
+            seen.add(room_id)
+
+        async def update_index():
+            for room_id in deleted:
+                availability_index.remove_room(room_id)
+                geo_index.remove_room(room_id)
+            invalidate_prices(list(deleted))
+            await room_cache.invalidate(*deleted)
+
+        on_commit(self.room_repo.session, update_index)
+        return RoomBatchResponse.from_results(results)
+
+    @staticmethod
+    def _geocode(room_data: RoomCreate) -> RoomCreate:
+        if room_data.latitude is None:
+            location = geocoder.locate(room_data.country, room_data.city)
+            if location is not None:
+                return room_data.model_copy(update={'latitude': location[0], 'longitude': location[1]})
+        return room_data
@@ -0,0 +1,157 @@
+"""
+Сводки для кабинета владельца. Таблица RoomDailyStat обновляется инкрементально в BookingRepo,
+фоновая задача сверяет её с бронированиями. Первичное заполнение по всей истории:
+
+    python -m services.stats_service --backfill
+"""
+import argparse
+import asyncio
+import datetime as dt
+import logging
+import time
+
+from sqlalchemy import select, func
+
+from core.database import async_session_maker, engine
+from core.metrics import registry
+from core.settings import settings
+from core.tasks import PeriodicTask
+from models import Booking, Room
+from repositories.stats_repo import RoomStatsRepo
+from schemas.stats_schemas import OwnerStats, MonthStats, DayCheckIns
+from services.calendar_service import calendar_horizon
+
+logger = logging.getLogger(__name__)
+
+STATS_DRIFT = registry.counter('room_stats_drift_rows_total', 'Строки сводок, исправленные при сверке с бронированиями')
+UPCOMING_CHECK_INS_DAYS = 30
+
+
+def month_days(month: dt.date, date_from: dt.date, date_to: dt.date) -> int:
+    """
+    Количество дней месяца month, попадающих в [date_from, date_to)
+    """
+    next_month = (month.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+    return max((min(next_month, date_to) - max(month, date_from)).days, 0)
+
+
+class OwnerStatsService:
+    """
+    Статистика владельца по всем его комнатам. Читает только сводки RoomDailyStat,
+    поэтому стоимость запроса зависит от длины периода, а не от истории бронирований.
+    """
+
+    def __init__(self, stats_repo: RoomStatsRepo):
+        self.stats_repo = stats_repo
+
+    async def get_owner_stats(self, owner_id: int, date_from: dt.date | None = None,
+                              date_to: dt.date | None = None) -> OwnerStats:
+        """
+        Загрузка, выручка, заезды и отмены по месяцам за [date_from, date_to) и ближайшие заезды.
+        По умолчанию - год до конца текущего месяца.
+        :param owner_id:
+        :param date_from:
+        :param date_to:
+        :return: OwnerStats
+        """
+        today = dt.date.today()
+        date_to = date_to or (today.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+        date_from = date_from or date_to - dt.timedelta(days=365)
+
+        rooms = await self.stats_repo.count_owner_rooms(owner_id)
+        months = []
+        for month, booked_nights, revenue, check_ins, cancellations in await self.stats_repo.owner_months(
+                owner_id, date_from, date_to):
+            available_nights = rooms * month_days(month, date_from, date_to)
+            months.append(MonthStats(
+                month=month,
+                booked_nights=booked_nights,
+                available_nights=available_nights,
+                occupancy=round(booked_nights / available_nights, 4) if available_nights else 0.0,
+                revenue=revenue,
+                check_ins=check_ins,
+                cancellations=cancellations,
+            ))
+        upcoming = await self.stats_repo.owner_check_ins(
+            owner_id, today, today + dt.timedelta(days=UPCOMING_CHECK_INS_DAYS)
+        )
+        return OwnerStats(
+            rooms=rooms,
+            date_from=date_from,
+            date_to=date_to,
+            months=months,
+            upcoming_check_ins=[DayCheckIns(date=day, check_ins=count) for day, count in upcoming],
+        )
+
+
+async def reconcile_room_stats(date_from: dt.date | None = None, date_to: dt.date | None = None,
+                               batch_size: int | None = None) -> int:
+    """
+    Сверка сводок с бронированиями за [date_from, date_to). Комнаты обходятся пачками по id (keyset),
+    каждая пачка - отдельная транзакция. По умолчанию сверяется окно от STATS_RECONCILE_DAYS назад
+    до горизонта календаря.
+    :param date_from:
+    :param date_to:
+    :param batch_size:
+    :return: количество исправленных строк
+    """
+    batch_size = batch_size or settings.STATS_BATCH_SIZE
+    date_from = date_from or dt.date.today() - dt.timedelta(days=settings.STATS_RECONCILE_DAYS)
+    date_to = date_to or calendar_horizon()
+    started = time.perf_counter()
+    total, last_id = 0, 0
+    while True:
+        async with async_session_maker() as session:
+            room_ids = list(await session.scalars(
+                select(Room.id).where(Room.id > last_id).order_by(Room.id).limit(batch_size)
+            ))
+            if not room_ids:
+                break
+            total += await RoomStatsRepo(session).reconcile(room_ids, date_from, date_to)
+            await session.commit()
+        last_id = room_ids[-1]
+
+    STATS_DRIFT.inc(total)
+    elapsed = time.perf_counter() - started
+    if total:
+        logger.warning('Сверка сводок за %s - %s: исправлено строк %d за %.1f с', date_from, date_to, total, elapsed)
+    else:
+        logger.info('Сверка сводок за %s - %s: расхождений нет (%.1f с)', date_from, date_to, elapsed)
+    return total
+
+
+async def backfill_room_stats(batch_size: int | None = None) -> int:
+    """
+    Заполнение сводок по всей истории бронирований
+    :param batch_size:
+    :return: количество записанных строк
+    """
+    async with async_session_maker() as session:
+        first, last = (await session.execute(select(func.min(Booking.check_in), func.max(Booking.check_out)))).one()
+    if first is None:
+        return 0
+    return await reconcile_room_stats(first.date(), last.date() + dt.timedelta(days=1), batch_size)
+
+
+stats_reconcile_task = PeriodicTask(
+    'room-stats-reconcile', reconcile_room_stats, settings.STATS_RECONCILE_INTERVAL_HOURS * 3600
+)
+
+
+async def main(args) -> None:
+    if args.backfill:
+        rows = await backfill_room_stats(args.batch_size)
+    else:
+        rows = await reconcile_room_stats(args.date_from, args.date_to, args.batch_size)
+    print(f'Записано строк сводок: {rows}')
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Заполнение и сверка сводок владельцев')
+    parser.add_argument('--backfill', action='store_true', help='Пересчитать всю историю бронирований')
+    parser.add_argument('--date-from', type=dt.date.fromisoformat)
+    parser.add_argument('--date-to', type=dt.date.fromisoformat)
+    parser.add_argument('--batch-size', type=int)
+    asyncio.run(main(parser.parse_args()))
@@ -1,16 +1,21 @@
 from typing import Tuple, Any
-from passlib.context import CryptContext
 from authx.exceptions import InvalidToken
 from fastapi import Cookie
 from jose import ExpiredSignatureError
 from jwt import InvalidTokenError
-from jwt_functions import create_access_token, create_refresh_token, decode_access_token, decode_refresh_token
+from sqlalchemy.exc import IntegrityError
+from core.hashing import password_hasher
+from jwt_functions import (create_access_token, create_refresh_token, decode_access_token, decode_refresh_token,
+                           token_store)
 from repositories.user_repo import UserRepo
 from schemas.user_schemas import UserRegister, UserLogin, AuthResponse, UserUpdate
 from schemas.exception_schemas import UserAlreadyExist, UserDidntExist, UserNotFound
 from models import User
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+UNIQUE_CONSTRAINT_MESSAGES = {
+    'ix_users_email': 'Email уже зарегистрирован',
+    'ix_users_phone': 'Номер телефона уже зарегистрирован',
+}
 
 
 class UserService:
@@ -22,25 +27,45 @@ class UserService:
     def __init__(self, user_repo: UserRepo):
         self.user_repo = user_repo
 
+    @staticmethod
+    def _check_unique(existing_users: list[User], email: str | None, phone: str | None) -> None:
+        """
+        Проверка результата поиска по почте/телефону и выбор сообщения об ошибке
+        """
+        for existing_user in existing_users:
+            if email and existing_user.email == email:
+                raise UserAlreadyExist('Email уже зарегистрирован')
+        for existing_user in existing_users:
+            if phone and existing_user.phone == phone:
+                raise UserAlreadyExist('Номер телефона уже зарегистрирован')
+
+    @staticmethod
+    def _unique_violation(error: IntegrityError) -> Exception:
+        """
+        Преобразование нарушения уникального индекса (гонка параллельных регистраций) в UserAlreadyExist
+        """
+        constraint = getattr(error.orig.__cause__, 'constraint_name', None)
+        if constraint in UNIQUE_CONSTRAINT_MESSAGES:
+            return UserAlreadyExist(UNIQUE_CONSTRAINT_MESSAGES[constraint])
+        return error
+
     async def register(self, user_data: UserRegister) -> User:
         """
         Регистрация пользователя, проверка почты и телефона, хэширование пароля и добавление в бд
         :param user_data:
         :return: User object
         """
-        existing_email = await self.user_repo.get_user_by_email(user_data.email)
-        if existing_email:
-            raise UserAlreadyExist('Email уже зарегистрирован')
-        if user_data.phone:
-            existing_phone = await self.user_repo.get_user_by_phone(user_data.phone)
-            if existing_phone:
-                raise UserAlreadyExist('Номер телефона уже зарегистрирован')
+        existing_users = await self.user_repo.get_users_by_email_or_phone(user_data.email, user_data.phone)
+        self._check_unique(existing_users, user_data.email, user_data.phone)
         password_bytes = user_data.password.encode('utf-8')
-        hashed_password = pwd_context.hash(password_bytes)
+        hashed_password = await password_hasher.hash(password_bytes)
         user_dict = user_data.model_dump(exclude={"password"})
         user_dict['password'] = hashed_password
 
-        user = await self.user_repo.create_user(user_data=UserRegister(**user_dict))
+        try:
+            user = await self.user_repo.create_user(user_data=UserRegister(**user_dict))
+        except IntegrityError as e:
+            raise self._unique_violation(e)
         return user
 
     async def login(self, user_log: UserLogin) -> Tuple[Any, Any]:
@@ -55,12 +80,18 @@ class UserService:
         )
         """
         existing_user = await self.user_repo.get_user_by_email(user_log.email)
+        if not existing_user:
+            raise UserDidntExist('Неправильная почта или пароль')
         password_bytes = user_log.password.encode('utf-8')
-        if not existing_user or pwd_context.verify(password_bytes, existing_user.password):
+        is_valid, new_hash = await password_hasher.verify_and_update(password_bytes, existing_user.password)
+        if not is_valid:
             raise UserDidntExist('Неправильная почта или пароль')
+        if new_hash:
+            await self.user_repo.update_password(existing_user, new_hash)
 
-        access_token = create_access_token({'sub': str(existing_user.id), 'role': existing_user.user_type})
-        refresh_token = create_refresh_token({'sub': str(existing_user.id), 'role': existing_user.user_type})
+        claims = {'sub': str(existing_user.id), 'role': existing_user.user_type, 'ver': existing_user.token_version}
+        access_token = create_access_token(claims)
+        refresh_token = create_refresh_token(claims)
 
         return access_token, refresh_token
 
@@ -106,27 +137,28 @@ class UserService:
         user = await self.user_repo.get_user_by_id(user_id)
         if not user:
             raise UserNotFound(f'Пользователь с id: {user_id} не найден')
-        if user_data.email and user_data.email != user.email:
-            existing_email = await self.user_repo.get_user_by_email(user_data.email)
-            if existing_email:
-                raise UserAlreadyExist("Данный адрес электронной почты уже зарегистрирован")
-        if user_data.phone and user_data.phone != user.phone:
-            existing_phone = await self.user_repo.get_user_by_phone(user_data.phone)
-            if existing_phone:
-                raise UserAlreadyExist("Данный номер телефона уже зарегистрирован")
-
-        updated_user = await self.user_repo.update(user, user_data)
+        email = user_data.email if user_data.email != user.email else None
+        phone = user_data.phone if user_data.phone != user.phone else None
+        existing_users = await self.user_repo.get_users_by_email_or_phone(email, phone, exclude_id=user_id)
+        self._check_unique(existing_users, email, phone)
+        if user_data.password:
+            user_data.password = await password_hasher.hash(user_data.password.encode('utf-8'))
 
-        return updated_user
+        return await self.user_repo.update(user, user_data)
 
     async def refresh_access_token(self, refresh_token: str) -> str:
         payload = decode_refresh_token(refresh_token)
+        if await token_store.is_denied(payload):
+            raise ValueError('Refresh токен отозван')
         user_id = payload.get('sub')
         user = await self.user_repo.get_user_by_id(int(user_id))
         if not user:
             raise UserNotFound("Пользователь не найден")
+        if payload.get('ver', 0) < user.token_version:
+            raise ValueError('Refresh токен отозван')
         new_access_token = create_access_token({
             'sub': str(user.id),
-            'role': user.user_type
+            'role': user.user_type,
+            'ver': user.token_version,
         })
         return new_access_token
@@ -11,6 +11,11 @@ class BookingStatus(str, enum.Enum):
     CREATED = 'created'
     REJECTED = 'rejected'
     CONFIRMED = "confirmed"
+    EXPIRED = "expired"
+    CANCELLED = "cancelled"
+
+
+ACTIVE_BOOKING_STATUSES = (BookingStatus.CREATED, BookingStatus.CONFIRMED)
 
 
 class RoomStatus(str, enum.Enum):
@@ -43,3 +48,12 @@ class PaymentStatus(str, enum.Enum):
     PENDING = "pending"
     PAID = "paid"
     FAILED = "failed"
+
+
+class BookingEvent(str, enum.Enum):
+    """
+    Типы событий брони в outbox. Хранятся строкой, новые типы не требуют изменения схемы
+    """
+    CREATED = 'booking.created'
+    CANCELLED = 'booking.cancelled'
+    EXPIRED = 'booking.expired'
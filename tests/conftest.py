@@ -0,0 +1,160 @@
+"""
+Общие фикстуры тестов. Тесты с базой работают с Postgres из настроек приложения (.env или переменные окружения)
+и пропускаются, если база недоступна. Тесты без базы запускаются и без .env.
+Модули приложения импортируются в фикстурах: настройки читаются при импорте, а значения по умолчанию
+задаются ниже.
+"""
+import asyncio
+import os
+import uuid
+from contextlib import contextmanager
+
+import httpx
+import pytest
+from dotenv import dotenv_values
+from sqlalchemy import text, delete
+from sqlalchemy.exc import DBAPIError
+
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.env')
+# Значения для импорта приложения без .env; заданные в .env или окружении не переопределяются
+TEST_SETTINGS = {
+    'DB_HOST': 'localhost',
+    'DB_PORT': '5432',
+    'DB_NAME': 'booking',
+    'DB_PASSWORD': 'postgres',
+    'DB_USER': 'postgres',
+    'ACCESS_TOKEN_LIFETIME': '15',
+    'REFRESH_TOKEN_LIFETIME': '1440',
+    'SECRET_KEY': 'test-secret',
+    'ALGORITHM': 'HS256',
+}
+configured = dotenv_values(ENV_FILE) if os.path.exists(ENV_FILE) else {}
+for key, value in TEST_SETTINGS.items():
+    if key not in os.environ and key not in configured:
+        os.environ[key] = value
+
+
+@pytest.fixture(scope='session')
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture(scope='session')
+async def database():
+    """
+    Схема базы как при старте приложения. Если Postgres недоступен, тест пропускается
+    """
+    from core.database import engine, Base
+    from services.partition_service import maintain_partitions
+
+    async def probe():
+        async with engine.connect() as conn:
+            await conn.execute(text('SELECT 1'))
+
+    try:
+        await asyncio.wait_for(probe(), timeout=5)
+    except (OSError, asyncio.TimeoutError, DBAPIError) as e:
+        pytest.skip(f'Postgres недоступен: {e}')
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await maintain_partitions()
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client(database):
+    from main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        yield client
+
+
+@pytest.fixture
+def count_queries():
+    """
+    Подсчёт SQL запросов вне HTTP запроса тем же хуком after_cursor_execute, что и в MetricsMiddleware:
+    with count_queries() as stats: ...; stats.queries
+    """
+    from core.instrumentation import RequestStats, current_request, install_query_hooks
+    from core.database import engine
+
+    install_query_hooks(engine)
+
+    @contextmanager
+    def counter():
+        stats = RequestStats({})
+        token = current_request.set(stats)
+        try:
+            yield stats
+        finally:
+            current_request.reset(token)
+
+    return counter
+
+
+@pytest.fixture
+def request_queries():
+    """
+    Сумма SQL запросов всех обработанных HTTP запросов (метрика http_request_db_queries).
+    Тесты шлют запросы по одному, поэтому разница до и после запроса - его количество запросов
+    """
+    from core.instrumentation import QUERIES_PER_REQUEST
+
+    return lambda: sum(QUERIES_PER_REQUEST.sums.values())
+
+
+def room_item(**fields) -> dict:
+    from sql_enums import RoomType, RoomStatus, Currency
+
+    item = {
+        'title': 'Тестовая студия', 'description': 'Комната для тестов количества запросов',
+        'country': 'Россия', 'city': 'Тестоград', 'address': 'Тестовая улица дом 1',
+        'property_type': RoomType.STUDIO.value, 'guests_cnt': 2, 'bedrooms': 1, 'beds': 1, 'bathrooms': 1,
+        'base_price': '3000', 'currency': Currency.RUB.value, 'cleaning_fee': '500', 'security_deposit': '1000',
+        'weekend_multiplier': '1.25', 'min_stay': 1, 'max_stay': 30, 'is_available': True,
+        'status': RoomStatus.ACTIVE.value,
+    }
+    item.update(fields)
+    return item
+
+
+async def create_user(session, user_type) -> int:
+    from models import User
+
+    return await session.scalar(
+        User.__table__.insert().values(
+            first_name='Тест', second_name='Тестов', password='-', email=f'{uuid.uuid4().hex}@example.com',
+            user_type=user_type,
+        ).returning(User.id)
+    )
+
+
+@pytest.fixture
+async def owner_room(database):
+    """
+    Владелец, гость и активная комната владельца с календарём. Удаляются после теста вместе с бронями
+    :return: (id владельца, id гостя, id комнаты)
+    """
+    from core.database import async_session_maker
+    from core.unit_of_work import UnitOfWork
+    from models import User
+    from repositories.calendar_repo import CalendarRepo
+    from repositories.room_repo import RoomRepo
+    from services.room_service import RoomService
+    from sql_enums import UserType
+
+    async with async_session_maker() as session:
+        uow = UnitOfWork(session)
+        owner_id = await create_user(session, UserType.OWNER)
+        guest_id = await create_user(session, UserType.GUEST)
+        room_service = RoomService(RoomRepo(session), CalendarRepo(session))
+        created = await room_service.create_rooms(owner_id, [room_item()])
+        await uow.commit()
+    yield owner_id, guest_id, created.results[0].id
+
+    async with async_session_maker() as session:
+        # комнаты владельца удаляются каскадом вместе с бронями и календарём, после них - гость
+        await session.execute(delete(User).where(User.id == owner_id))
+        await session.execute(delete(User).where(User.id == guest_id))
+        await session.commit()
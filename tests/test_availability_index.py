@@ -0,0 +1,76 @@
+"""
+Индекс доступности в памяти процесса: маски дат и синхронизация с календарём в базе
+"""
+import datetime as dt
+
+import pytest
+
+from services.availability_index import AvailabilityIndex
+
+EPOCH = dt.date(2030, 1, 1)
+
+
+def d(day: int) -> dt.date:
+    return EPOCH + dt.timedelta(days=day)
+
+
+def test_occupy_release_and_block():
+    index = AvailabilityIndex(EPOCH)
+    index.add_room(1, 'Москва')
+    index.set_free(1, [d(day) for day in range(10)])
+    assert index.free_rooms(d(2), d(5), ' москва ') == [1]
+
+    index.occupy(1, d(3), d(4))
+    index.block(1, d(6), d(7))
+    assert index.free_rooms(d(2), d(5), 'Москва') == []
+    assert not index.is_free(1, d(5), d(8))
+    # освобождение брони не снимает блокировку владельца
+    index.release(1, d(3), d(7))
+    assert index.is_free(1, d(2), d(6))
+    assert not index.is_free(1, d(6), d(7))
+
+
+def test_span_outside_calendar_window():
+    index = AvailabilityIndex(EPOCH)
+    index.add_room(1, 'Москва')
+    index.set_free(1, [d(day) for day in range(10)])
+    # даты за окном календаря не строят маску на тысячи лет вперёд
+    assert index._span(d(2), dt.date(9999, 12, 31)) == 0
+    assert not index.is_free(1, d(2), dt.date(9999, 12, 31))
+    index.occupy(1, dt.date(9999, 1, 1), dt.date(9999, 1, 5))
+    assert index.is_free(1, d(0), d(10))
+
+
+@pytest.mark.anyio
+async def test_sync_picks_up_changes_of_other_processes(owner_room):
+    from sqlalchemy import update
+
+    from core.database import async_session_maker
+    from models import AvailabilityCalendar
+
+    _, _, room_id = owner_room
+    today = dt.date.today()
+    day = today + dt.timedelta(days=5)
+    index = AvailabilityIndex()
+    async with async_session_maker() as session:
+        await index.load(session)
+        assert index.is_free(room_id, day, day + dt.timedelta(days=1))
+
+        # блокировка и новая комната мимо индекса: так пишут другие процессы и скрипты
+        await session.execute(
+            update(AvailabilityCalendar)
+            .where(AvailabilityCalendar.property_id == room_id, AvailabilityCalendar.date == day)
+            .values(is_blocked=True)
+        )
+        await session.commit()
+        index.remove_room(room_id)
+        await index.sync(session)
+        assert room_id in index.free_rooms(today + dt.timedelta(days=1), day, 'Тестоград')
+        assert not index.is_free(room_id, day, day + dt.timedelta(days=1))
+
+        # со сменой дня индекс перестраивается от нового epoch
+        index.epoch = today - dt.timedelta(days=3)
+        await index.sync(session)
+        assert index.epoch == today
+        assert index.is_free(room_id, today + dt.timedelta(days=1), day)
+        assert not index.is_free(room_id, day, day + dt.timedelta(days=1))
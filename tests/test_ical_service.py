@@ -0,0 +1,146 @@
+"""
+Синхронизация календарей .ics: разбор ленты внешней площадки, построение своей ленты,
+условные запросы и применение блокировок к календарю комнаты
+"""
+import datetime as dt
+import os
+
+import pytest
+
+from schemas.exception_schemas import CalendarFeedError
+from services.ical_service import parse_ics, render_ics, is_not_modified, unfold
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'room.ics')
+STAMP = dt.datetime(2030, 1, 1, 12, 30, 15, 250000, tzinfo=dt.timezone.utc)
+ETAG = '"0123456789abcdef0123"'
+
+
+def d(day: str) -> dt.date:
+    return dt.date.fromisoformat(day)
+
+
+def external_feed(ranges) -> str:
+    """
+    Лента другой площадки: события с чужими UID, которые импорт не пропускает
+    """
+    return render_ics(1, [(start, end, False) for start, end in ranges], STAMP).replace('@booking', '@channel.example')
+
+
+@pytest.fixture
+def feed() -> str:
+    with open(FIXTURE, encoding='utf-8', newline='') as file:
+        return file.read()
+
+
+def test_unfold_joins_continuation_lines(feed):
+    lines = unfold(feed)
+    assert 'DTSTART;VALUE=DATE:20300125' in lines
+    assert 'UID:1418fb94e984-1f3a64a0b2a5a0c1fb4d6c2e0b2a@airbnb.com' in lines
+    assert not any(line.startswith(' ') for line in lines)
+
+
+def test_parse_fixture(feed):
+    # отменённое событие и событие нашей ленты пропущены, пересекающиеся объединены, края обрезаны по окну
+    assert parse_ics(feed, d('2030-01-01'), d('2030-03-01')) == [
+        (d('2030-01-01'), d('2030-01-03')),
+        (d('2030-01-05'), d('2030-01-12')),
+        (d('2030-01-25'), d('2030-01-26')),
+        (d('2030-02-27'), d('2030-03-01')),
+    ]
+
+
+def test_parse_window_without_events(feed):
+    assert parse_ics(feed, d('2030-01-13'), d('2030-01-25')) == []
+
+
+def test_parse_rejects_invalid_feed():
+    with pytest.raises(CalendarFeedError):
+        parse_ics('<html></html>', d('2030-01-01'), d('2030-03-01'))
+    with pytest.raises(CalendarFeedError):
+        parse_ics(external_feed([(d('2030-01-05'), d('2030-01-07'))]).replace('20300105', '2030-1-5'),
+                  d('2030-01-01'), d('2030-03-01'))
+
+
+def test_render_round_trip():
+    ranges = [(d('2030-01-05'), d('2030-01-08'), True), (d('2030-01-08'), d('2030-01-10'), False)]
+    text = render_ics(7, ranges, STAMP)
+
+    assert text.startswith('BEGIN:VCALENDAR\r\n') and text.endswith('END:VCALENDAR\r\n')
+    assert 'UID:room-7-20300105@booking' in text
+    assert text.count('DTSTAMP:20300101T123015Z') == 2
+    # своя лента при обратном импорте не блокирует дни повторно
+    assert parse_ics(text, d('2030-01-01'), d('2030-03-01')) == []
+    assert parse_ics(text.replace('@booking', '@channel.example'), d('2030-01-01'), d('2030-03-01')) == [
+        (d('2030-01-05'), d('2030-01-10')),
+    ]
+
+
+@pytest.mark.parametrize('headers, expected', [
+    ({}, False),
+    ({'if-none-match': ETAG}, True),
+    ({'if-none-match': f'W/{ETAG}'}, True),
+    ({'if-none-match': f'"other", {ETAG}'}, True),
+    ({'if-none-match': '*'}, True),
+    # If-None-Match важнее If-Modified-Since
+    ({'if-none-match': '"other"', 'if-modified-since': 'Tue, 01 Jan 2030 12:30:15 GMT'}, False),
+    ({'if-modified-since': 'Tue, 01 Jan 2030 12:30:15 GMT'}, True),
+    ({'if-modified-since': 'Wed, 02 Jan 2030 00:00:00 GMT'}, True),
+    ({'if-modified-since': 'Tue, 01 Jan 2030 12:30:14 GMT'}, False),
+    ({'if-modified-since': 'вчера'}, False),
+    ({'if-modified-since': 'Tue, 01 Jan 2030 12:30:15'}, False),
+])
+def test_is_not_modified(headers, expected):
+    assert is_not_modified(headers, ETAG, STAMP) is expected
+
+
+@pytest.mark.anyio
+async def test_import_and_export_round_trip(owner_room):
+    from core.database import async_session_maker
+    from core.unit_of_work import UnitOfWork
+    from repositories.calendar_repo import CalendarRepo
+    from services.ical_service import CalendarSyncService
+
+    _, _, room_id = owner_room
+    today = dt.date.today()
+    ranges = [(today + dt.timedelta(days=3), today + dt.timedelta(days=6)),
+              (today + dt.timedelta(days=8), today + dt.timedelta(days=9))]
+
+    async with async_session_maker() as session:
+        uow = UnitOfWork(session)
+        calendar_repo = CalendarRepo(session)
+        service = CalendarSyncService(calendar_repo)
+        assert await service.import_feed(room_id, external_feed(ranges)) == (4, 0)
+        await uow.commit()
+
+        assert await calendar_repo.busy_ranges(room_id, today) == [(start, end, False) for start, end in ranges]
+        feed = await service.render_feed(room_id, STAMP)
+        assert parse_ics(feed, today, today + dt.timedelta(days=30)) == []
+        assert parse_ics(feed.replace('@booking', '@channel.example'), today, today + dt.timedelta(days=30)) == ranges
+
+        # повторный импорт той же ленты ничего не меняет, снятое событие освобождает свои дни
+        assert await service.import_feed(room_id, external_feed(ranges)) == (0, 0)
+        assert await service.import_feed(room_id, external_feed(ranges[:1])) == (0, 1)
+        await uow.commit()
+        assert await calendar_repo.busy_ranges(room_id, today) == [(*ranges[0], False)]
+
+
+@pytest.mark.anyio
+async def test_feed_version_is_utc(owner_room):
+    from sqlalchemy import text, update
+
+    from core.database import async_session_maker
+    from models import AvailabilityCalendar
+    from repositories.calendar_repo import CalendarRepo
+    from services.ical_service import CalendarSyncService
+
+    _, _, room_id = owner_room
+    async with async_session_maker() as session:
+        # updated_at пишется во времени сессии; Last-Modified всё равно должен быть в UTC
+        await session.execute(text("SET LOCAL TIME ZONE 'Asia/Vladivostok'"))
+        await session.execute(
+            update(AvailabilityCalendar).where(AvailabilityCalendar.property_id == room_id)
+            .values(updated_at=text('now()'))
+        )
+        _, last_modified = await CalendarSyncService(CalendarRepo(session)).feed_version(room_id)
+        await session.rollback()
+    assert abs(dt.datetime.now(dt.timezone.utc) - last_modified) < dt.timedelta(minutes=1)
@@ -0,0 +1,73 @@
+"""
+Количество SQL запросов на ключевых маршрутах. Запросы считает хук after_cursor_execute
+из core.instrumentation, тот же, что пишет метрику http_request_db_queries
+"""
+import datetime as dt
+import random
+import uuid
+
+import pytest
+from sqlalchemy import delete
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_register_queries(client, request_queries):
+    from core.database import async_session_maker
+    from models import User
+
+    email = f'{uuid.uuid4().hex}@example.com'
+    before = request_queries()
+    response = await client.post('/api/auth/reg', json={
+        'first_name': 'Тест', 'second_name': 'Тестов', 'password': 'password123', 'user_type': 'guest',
+        'email': email, 'phone': f'+7{random.randrange(10 ** 10):010d}',
+    })
+    assert response.status_code == 200, response.text
+    # проверка почты и телефона одним SELECT и INSERT ... RETURNING
+    assert request_queries() - before == 2
+
+    async with async_session_maker() as session:
+        await session.execute(delete(User).where(User.email == email))
+        await session.commit()
+
+
+async def test_create_booking_queries(client, request_queries, owner_room):
+    from jwt_functions import create_access_token
+    from sql_enums import UserType
+
+    _, guest_id, room_id = owner_room
+    client.cookies.set('access_token', create_access_token({'sub': str(guest_id), 'role': UserType.GUEST.value}))
+    check_in = dt.date.today() + dt.timedelta(days=3)
+
+    async def book(days: int):
+        before = request_queries()
+        response = await client.post('/api/bookings', json={
+            'room_id': room_id, 'check_in': check_in.isoformat(),
+            'check_out': (check_in + dt.timedelta(days=days)).isoformat(), 'guest_cnt': 1,
+        })
+        assert response.status_code == 201, response.text
+        return request_queries() - before
+
+    # версия токена и комната из базы, бронь с календарём, сводка владельца, событие outbox
+    assert await book(2) == 5
+    check_in += dt.timedelta(days=5)
+    # версия токена и комната уже в кэше
+    assert await book(2) == 3
+
+
+async def test_room_detail_queries(owner_room, count_queries):
+    from sqlalchemy.exc import InvalidRequestError
+
+    from core.database import async_session_maker
+    from repositories.room_repo import RoomRepo
+
+    owner_id, _, room_id = owner_room
+    async with async_session_maker() as session:
+        with count_queries() as stats:
+            room = await RoomRepo(session).get_room_detail(room_id, 30)
+        # комната с владельцем одним JOIN и календарь вторым SELECT ... IN
+        assert stats.queries == 2
+        assert room.owner_id == owner_id and room.owner.first_name == 'Тест'
+        assert len(room.availability) == 30
+        with pytest.raises(InvalidRequestError):
+            room.bookings
@@ -0,0 +1,30 @@
+"""
+Корзины токенов ограничителя частоты в памяти процесса
+"""
+from core.rate_limit import TokenBuckets
+
+
+def test_take_until_empty():
+    buckets = TokenBuckets(10)
+    assert [buckets.take('ip', 2, 1, now=0.0) for _ in range(3)] == [0, 0, 1.0]
+    assert buckets.take('ip', 2, 1, now=1.0) == 0
+
+
+def test_evicts_least_recently_used_at_capacity():
+    buckets = TokenBuckets(3)
+    for key in ('a', 'b', 'c'):
+        buckets.take(key, 2, 0.001, now=0.0)
+    buckets.take('a', 2, 0.001, now=1.0)
+    buckets.take('d', 2, 0.001, now=2.0)
+    # вытеснена самая давняя по обращению корзина b, a сохранила потраченные токены
+    assert len(buckets) == 3
+    assert buckets.take('a', 2, 0.001, now=3.0) > 0
+    assert buckets.take('b', 2, 0.001, now=3.0) == 0
+
+
+def test_drops_refilled_buckets():
+    buckets = TokenBuckets(100)
+    buckets.take('old', 2, 1, now=0.0)
+    buckets.take('new', 2, 1, now=10.0)
+    # корзина old восстановилась и равносильна отсутствующей
+    assert len(buckets) == 1
@@ -0,0 +1,89 @@
+"""
+Поиск комнат по датам: свободные даты решает календарь в базе, а не индекс доступности процесса
+"""
+import datetime as dt
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def search_ids(client, check_in: dt.date, nights: int) -> list[int]:
+    response = await client.get('/api/rooms/search', params={
+        'city': 'Тестоград', 'check_in': check_in.isoformat(),
+        'check_out': (check_in + dt.timedelta(days=nights)).isoformat(), 'limit': 100,
+    })
+    assert response.status_code == 200, response.text
+    return [item['id'] for item in response.json()['items']]
+
+
+async def test_dated_search_with_several_workers(client, owner_room, monkeypatch):
+    from core.settings import settings
+    from jwt_functions import create_access_token
+    from services.availability_index import availability_index
+    from sql_enums import UserType
+
+    _, guest_id, room_id = owner_room
+    # комнату создал другой процесс: в индексе этого процесса её нет
+    availability_index.remove_room(room_id)
+    monkeypatch.setattr(availability_index, 'loaded', True)
+    monkeypatch.setattr(settings, 'WEB_CONCURRENCY', 2)
+    check_in = dt.date.today() + dt.timedelta(days=4)
+    assert room_id in await search_ids(client, check_in, 3)
+
+    client.cookies.set('access_token', create_access_token({'sub': str(guest_id), 'role': UserType.GUEST.value}))
+    response = await client.post('/api/bookings', json={
+        'room_id': room_id, 'check_in': check_in.isoformat(),
+        'check_out': (check_in + dt.timedelta(days=1)).isoformat(), 'guest_cnt': 1,
+    })
+    assert response.status_code == 201, response.text
+    assert room_id not in await search_ids(client, check_in, 3)
+    assert room_id in await search_ids(client, check_in + dt.timedelta(days=1), 3)
+
+
+async def test_nearby_search_is_bounded(client, owner_room, request_queries, monkeypatch):
+    import api.rooms
+    from core.database import async_session_maker
+    from core.unit_of_work import UnitOfWork
+    from repositories.calendar_repo import CalendarRepo
+    from repositories.room_repo import RoomRepo
+    from services.room_service import RoomService
+    from conftest import room_item
+
+    owner_id, _, _ = owner_room
+    # точка в океане, рядом с ней нет комнат других тестов; подходит только самая дальняя комната
+    latitude, longitude = -48.5, -123.4
+    items = [room_item(latitude=latitude + index / 1000, longitude=longitude, guests_cnt=2) for index in range(29)]
+    items.append(room_item(latitude=latitude + 0.029, longitude=longitude, guests_cnt=6))
+    async with async_session_maker() as session:
+        uow = UnitOfWork(session)
+        created = await RoomService(RoomRepo(session), CalendarRepo(session)).create_rooms(owner_id, items)
+        await uow.commit()
+    target_id = created.results[-1].id
+    monkeypatch.setattr(api.rooms, 'NEARBY_MAX_BATCHES', 2)
+
+    async def nearby(**extra):
+        before = request_queries()
+        response = await client.get('/api/rooms/nearby', params={
+            'latitude': latitude, 'longitude': longitude, 'radius_km': 10, 'guests_cnt': 6, 'limit': 1, **extra,
+        })
+        assert response.status_code == 200, response.text
+        return response.json(), request_queries() - before
+
+    # две пачки по 4 и 16 кандидатов: страница пустая, но с курсором продолжения
+    page, queries = await nearby()
+    assert page['items'] == [] and page['next_cursor'] and queries == 2
+    page, _ = await nearby(cursor=page['next_cursor'])
+    assert [item['id'] for item in page['items']] == [target_id]
+
+
+async def test_search_rejects_too_long_stay(client):
+    from core.settings import settings
+
+    check_in = dt.date.today() + dt.timedelta(days=1)
+    for check_out in (check_in + dt.timedelta(days=settings.CALENDAR_WINDOW_DAYS + 1), dt.date(9999, 12, 31)):
+        for path, extra in (('/api/rooms/search', {}), ('/api/rooms/nearby', {'latitude': 55.75, 'longitude': 37.61})):
+            response = await client.get(path, params={
+                'check_in': check_in.isoformat(), 'check_out': check_out.isoformat(), **extra,
+            })
+            assert response.status_code == 422, response.text